@@ -1,13 +1,24 @@
 from __future__ import annotations as _annotations
 
+import json
 from typing import Any, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel, Field
 
-from db import fetch, fetchrow, execute
-from domain import RECOMMENDED_PROMPT_PREFIX, TOOL_REGISTRY, TOOL_TEST_INVOKERS
-from loader import build_dynamic_registry, DynamicRegistry
+from db import SCHEMA_VERSION, config_mutation, fetch, fetchrow, fetchrow_prepared
+from domain import CONTEXT_TOOLS, RECOMMENDED_PROMPT_PREFIX, TOOL_REGISTRY, TOOL_TEST_INVOKERS
+from loader import build_dynamic_registry, reload_registry, DynamicRegistry
+from config_io import ConfigDocument, ConfigImportError, export_config, import_config
+from instruction_templates import compile_template
+import faq
+import flight_status
+from tool_cache import tool_cache
+import metrics
+from admission import admission_state
+from services.adaptive_limiter import limiter_states
+from seat_inventory import inventory as seat_inventory
+from services.circuit_breaker import breaker_states, reset_breakers
 
 
 class AgentCreate(BaseModel):
@@ -33,6 +44,9 @@ class ToolCreate(BaseModel):
     description: Optional[str] = None
     test_arguments: Optional[dict[str, Any]] = None
     agent_ref_name: Optional[str] = None
+    # Result cache policy; a TTL of 0 disables caching for the tool
+    cache_ttl_seconds: float = Field(default=0, ge=0)
+    cache_max_entries: int = Field(default=256, ge=0)
 
 
 class ToolUpdate(BaseModel):
@@ -40,6 +54,8 @@ class ToolUpdate(BaseModel):
     description: Optional[str] = None
     test_arguments: Optional[dict[str, Any]] = None
     agent_ref_name: Optional[str] = None
+    cache_ttl_seconds: Optional[float] = Field(default=None, ge=0)
+    cache_max_entries: Optional[int] = Field(default=None, ge=0)
 
 
 class GuardrailCreate(BaseModel):
@@ -91,55 +107,81 @@ async def _agent_id(name: str) -> int:
     return int(row["id"])  # type: ignore
 
 
-@router.get("/state")
-async def state() -> dict[str, Any]:
-    agents = [dict(r) for r in await fetch("select * from agents order by id")]  # type: ignore
-    tools = [dict(r) for r in await fetch("select * from tools order by name")]  # type: ignore
-    guardrails = [dict(r) for r in await fetch("select * from guardrails order by name")]  # type: ignore
-    handoffs = [dict(r) for r in await fetch(
-        """
+# Whole admin view of the config in one round trip, with the config version it reflects
+_STATE_SQL = """
+select
+    (select coalesce(max(id), 0) from config_changes) as version,
+    (select coalesce(jsonb_agg(to_jsonb(a) order by a.id), '[]'::jsonb) from agents a) as agents,
+    (select coalesce(jsonb_agg(to_jsonb(t) order by t.name), '[]'::jsonb) from tools t) as tools,
+    (select coalesce(jsonb_agg(to_jsonb(g) order by g.name), '[]'::jsonb) from guardrails g) as guardrails,
+    (select coalesce(jsonb_agg(x order by x.source, x.target), '[]'::jsonb) from (
         select s.name as source, t.name as target, h.on_handoff_callback
         from handoffs h
         join agents s on s.id=h.source_agent_id
         join agents t on t.id=h.target_agent_id
-        order by s.name, t.name
-        """
-    )]
-    agent_tools = [dict(r) for r in await fetch(
-        """
+    ) x) as handoffs,
+    (select coalesce(jsonb_agg(x order by x.agent, x.sort_order), '[]'::jsonb) from (
         select a.name as agent, at.tool_name, at.sort_order
         from agent_tools at
         join agents a on a.id = at.agent_id
-        order by a.name, at.sort_order
-        """
-    )]
-    agent_guardrails = [dict(r) for r in await fetch(
-        """
+    ) x) as agent_tools,
+    (select coalesce(jsonb_agg(x order by x.agent, x.guardrail_name), '[]'::jsonb) from (
         select a.name as agent, ag.guardrail_name
         from agent_guardrails ag
         join agents a on a.id = ag.agent_id
-        order by a.name, ag.guardrail_name
-        """
-    )]
-    triage_agents = [a["name"] for a in agents if a.get("is_triage")]
-    return {
-        "agents": agents,
-        "tools": tools,
-        "guardrails": guardrails,
-        "handoffs": handoffs,
-        "agent_tools": agent_tools,
-        "agent_guardrails": agent_guardrails,
-        "triage_agents": triage_agents,
-    }
+    ) x) as agent_guardrails
+"""
+
+
+def _state_etag(version: int) -> str:
+    # Every config write (admin, import, seed, migration) is logged, so the version moves with
+    # the payload; the schema version is part of the tag because a migration changes its shape
+    return f'"cfg-{SCHEMA_VERSION}-{version}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+@router.get("/state")
+async def state(request: Request, response: Response) -> Any:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Revalidation costs one index lookup instead of the full config query
+        row = await fetchrow_prepared("config_version")
+        etag = _state_etag(int(row["version"]) if row else 0)
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    row = await fetchrow(_STATE_SQL, label="admin_state")
+    state_json = {key: json.loads(row[key]) if row else [] for key in (
+        "agents", "tools", "guardrails", "handoffs", "agent_tools", "agent_guardrails",
+    )}
+    state_json["triage_agents"] = [a["name"] for a in state_json["agents"] if a.get("is_triage")]
+    response.headers["ETag"] = _state_etag(int(row["version"]) if row else 0)
+    response.headers["Cache-Control"] = "no-cache"
+    return state_json
+
+
+def _instruction_warnings(instruction_type: Optional[str], instruction_value: Optional[str]) -> dict[str, Any]:
+    # Surface template problems when instructions are saved rather than when they are first used
+    if instruction_value is None or instruction_type == "provider":
+        return {}
+    problems = compile_template(instruction_value).problems
+    return {"warnings": problems} if problems else {}
 
 
 @router.post("/agents")
 async def create_agent(body: AgentCreate) -> dict[str, Any]:
-    await execute(
-        "insert into agents(name, model, handoff_description, instruction_type, instruction_value, is_triage) values($1,$2,$3,$4,$5,$6)",
-        body.name, body.model, body.handoff_description, body.instruction_type, body.instruction_value, body.is_triage,
-    )
-    return {"ok": True}
+    async with config_mutation("agent", body.name) as conn:
+        await conn.execute(
+            "insert into agents(name, model, handoff_description, instruction_type, instruction_value, is_triage) values($1,$2,$3,$4,$5,$6)",
+            body.name, body.model, body.handoff_description, body.instruction_type, body.instruction_value, body.is_triage,
+        )
+    return {"ok": True, **_instruction_warnings(body.instruction_type, body.instruction_value)}
 
 
 @router.patch("/agents/{name}")
@@ -165,24 +207,34 @@ async def update_agent(name: str, body: AgentUpdate) -> dict[str, Any]:
         return {"ok": True}
     args.append(name)
     set_sql = ", ".join(fields)
-    await execute(f"update agents set {set_sql} where name=$%d" % (len(args)), *args)
-    return {"ok": True}
+    async with config_mutation("agent", name) as conn:
+        await conn.execute(f"update agents set {set_sql} where name=$%d" % (len(args)), *args)
+    return {"ok": True, **_instruction_warnings(body.instruction_type, body.instruction_value)}
 
 
 @router.delete("/agents/{name}")
 async def delete_agent(name: str) -> dict[str, Any]:
-    await execute("delete from agents where name=$1", name)
+    async with config_mutation("agent", name) as conn:
+        await conn.execute("delete from agents where name=$1", name)
     return {"ok": True}
 
 
+def _check_cache_policy(code_name: Optional[str], ttl_seconds: Optional[float]) -> None:
+    if ttl_seconds and code_name in CONTEXT_TOOLS:
+        raise HTTPException(status_code=400, detail=f"Tool '{code_name}' uses the conversation context and cannot be cached")
+
+
 @router.post("/tools")
 async def create_tool(body: ToolCreate) -> dict[str, Any]:
     import json
+    _check_cache_policy(body.code_name, body.cache_ttl_seconds)
     test_args = json.dumps(body.test_arguments) if body.test_arguments is not None else None
-    await execute(
-        "insert into tools(name, code_name, description, test_arguments, agent_ref_name) values($1,$2,$3,$4,$5)",
-        body.name, body.code_name, body.description, test_args, (body.agent_ref_name or None),
-    )
+    async with config_mutation("tool", body.name) as conn:
+        await conn.execute(
+            "insert into tools(name, code_name, description, test_arguments, agent_ref_name, cache_ttl_seconds, cache_max_entries) values($1,$2,$3,$4,$5,$6,$7)",
+            body.name, body.code_name, body.description, test_args, (body.agent_ref_name or None),
+            body.cache_ttl_seconds, body.cache_max_entries,
+        )
     return {"ok": True}
 
 
@@ -204,26 +256,52 @@ async def update_tool(name: str, body: ToolUpdate) -> dict[str, Any]:
         fields.append("agent_ref_name=$%d" % (len(args) + 1))
         # Treat empty string as NULL to allow clearing via UI
         args.append(body.agent_ref_name or None)
+    if body.cache_ttl_seconds is not None:
+        fields.append("cache_ttl_seconds=$%d" % (len(args) + 1))
+        args.append(body.cache_ttl_seconds)
+    if body.cache_max_entries is not None:
+        fields.append("cache_max_entries=$%d" % (len(args) + 1))
+        args.append(body.cache_max_entries)
     if not fields:
         return {"ok": True}
+    if body.cache_ttl_seconds:
+        row = await fetchrow("select code_name from tools where name=$1", name)
+        _check_cache_policy(body.code_name or (row["code_name"] if row else None), body.cache_ttl_seconds)
+    elif body.code_name in CONTEXT_TOOLS:
+        row = await fetchrow("select cache_ttl_seconds from tools where name=$1", name)
+        _check_cache_policy(body.code_name, row["cache_ttl_seconds"] if row else None)
     args.append(name)
     set_sql = ", ".join(fields)
-    await execute(f"update tools set {set_sql} where name=$%d" % (len(args)), *args)
+    async with config_mutation("tool", name) as conn:
+        await conn.execute(f"update tools set {set_sql} where name=$%d" % (len(args)), *args)
+    return {"ok": True}
+
+
+@router.get("/tools/cache")
+async def tool_cache_stats() -> dict[str, Any]:
+    return {"tools": tool_cache.stats()}
+
+
+@router.delete("/tools/cache")
+async def clear_tool_cache(code_name: Optional[str] = None) -> dict[str, Any]:
+    tool_cache.clear(code_name)
     return {"ok": True}
 
 
 @router.delete("/tools/{name}")
 async def delete_tool(name: str) -> dict[str, Any]:
-    await execute("delete from tools where name=$1", name)
+    async with config_mutation("tool", name) as conn:
+        await conn.execute("delete from tools where name=$1", name)
     return {"ok": True}
 
 
 @router.post("/guardrails")
 async def create_guardrail(body: GuardrailCreate) -> dict[str, Any]:
-    await execute(
-        "insert into guardrails(name, code_name, model, instruction_value) values($1,$2,$3,$4)",
-        body.name, body.code_name, body.model, body.instruction_value,
-    )
+    async with config_mutation("guardrail", body.name) as conn:
+        await conn.execute(
+            "insert into guardrails(name, code_name, model, instruction_value) values($1,$2,$3,$4)",
+            body.name, body.code_name, body.model, body.instruction_value,
+        )
     return {"ok": True}
 
 
@@ -246,47 +324,53 @@ async def update_guardrail(name: str, body: GuardrailUpdate) -> dict[str, Any]:
         return {"ok": True}
     args.append(name)
     set_sql = ", ".join(fields)
-    await execute(f"update guardrails set {set_sql} where name=$%d" % (len(args)), *args)
+    async with config_mutation("guardrail", name) as conn:
+        await conn.execute(f"update guardrails set {set_sql} where name=$%d" % (len(args)), *args)
     return {"ok": True}
 
 
 @router.delete("/guardrails/{name}")
 async def delete_guardrail(name: str) -> dict[str, Any]:
-    await execute("delete from guardrails where name=$1", name)
+    async with config_mutation("guardrail", name) as conn:
+        await conn.execute("delete from guardrails where name=$1", name)
     return {"ok": True}
 
 
 @router.post("/agent-tools")
 async def attach_tool(body: AgentToolLink) -> dict[str, Any]:
     aid = await _agent_id(body.agent_name)
-    await execute(
-        "insert into agent_tools(agent_id, tool_name, sort_order) values($1,$2,$3) on conflict (agent_id, tool_name) do update set sort_order=excluded.sort_order",
-        aid, body.tool_name, body.sort_order,
-    )
+    async with config_mutation("agent", body.agent_name) as conn:
+        await conn.execute(
+            "insert into agent_tools(agent_id, tool_name, sort_order) values($1,$2,$3) on conflict (agent_id, tool_name) do update set sort_order=excluded.sort_order",
+            aid, body.tool_name, body.sort_order,
+        )
     return {"ok": True}
 
 
 @router.delete("/agent-tools")
 async def detach_tool(agent_name: str, tool_name: str) -> dict[str, Any]:
     aid = await _agent_id(agent_name)
-    await execute("delete from agent_tools where agent_id=$1 and tool_name=$2", aid, tool_name)
+    async with config_mutation("agent", agent_name) as conn:
+        await conn.execute("delete from agent_tools where agent_id=$1 and tool_name=$2", aid, tool_name)
     return {"ok": True}
 
 
 @router.post("/agent-guardrails")
 async def attach_guardrail(body: AgentGuardrailLink) -> dict[str, Any]:
     aid = await _agent_id(body.agent_name)
-    await execute(
-        "insert into agent_guardrails(agent_id, guardrail_name) values($1,$2) on conflict do nothing",
-        aid, body.guardrail_name,
-    )
+    async with config_mutation("agent", body.agent_name) as conn:
+        await conn.execute(
+            "insert into agent_guardrails(agent_id, guardrail_name) values($1,$2) on conflict do nothing",
+            aid, body.guardrail_name,
+        )
     return {"ok": True}
 
 
 @router.delete("/agent-guardrails")
 async def detach_guardrail(agent_name: str, guardrail_name: str) -> dict[str, Any]:
     aid = await _agent_id(agent_name)
-    await execute("delete from agent_guardrails where agent_id=$1 and guardrail_name=$2", aid, guardrail_name)
+    async with config_mutation("agent", agent_name) as conn:
+        await conn.execute("delete from agent_guardrails where agent_id=$1 and guardrail_name=$2", aid, guardrail_name)
     return {"ok": True}
 
 
@@ -294,10 +378,11 @@ async def detach_guardrail(agent_name: str, guardrail_name: str) -> dict[str, An
 async def create_handoff(body: HandoffCreate) -> dict[str, Any]:
     sid = await _agent_id(body.source_agent)
     tid = await _agent_id(body.target_agent)
-    await execute(
-        "insert into handoffs(source_agent_id, target_agent_id, on_handoff_callback) values($1,$2,$3) on conflict do nothing",
-        sid, tid, body.on_handoff_callback,
-    )
+    async with config_mutation("agent", body.source_agent) as conn:
+        await conn.execute(
+            "insert into handoffs(source_agent_id, target_agent_id, on_handoff_callback) values($1,$2,$3) on conflict do nothing",
+            sid, tid, body.on_handoff_callback,
+        )
     return {"ok": True}
 
 
@@ -305,10 +390,11 @@ async def create_handoff(body: HandoffCreate) -> dict[str, Any]:
 async def update_handoff(body: HandoffUpdate) -> dict[str, Any]:
     sid = await _agent_id(body.source_agent)
     tid = await _agent_id(body.target_agent)
-    await execute(
-        "update handoffs set on_handoff_callback=$3 where source_agent_id=$1 and target_agent_id=$2",
-        sid, tid, body.on_handoff_callback,
-    )
+    async with config_mutation("agent", body.source_agent) as conn:
+        await conn.execute(
+            "update handoffs set on_handoff_callback=$3 where source_agent_id=$1 and target_agent_id=$2",
+            sid, tid, body.on_handoff_callback,
+        )
     return {"ok": True}
 
 
@@ -316,13 +402,77 @@ async def update_handoff(body: HandoffUpdate) -> dict[str, Any]:
 async def delete_handoff(source_agent: str, target_agent: str) -> dict[str, Any]:
     sid = await _agent_id(source_agent)
     tid = await _agent_id(target_agent)
-    await execute("delete from handoffs where source_agent_id=$1 and target_agent_id=$2", sid, tid)
+    async with config_mutation("agent", source_agent) as conn:
+        await conn.execute("delete from handoffs where source_agent_id=$1 and target_agent_id=$2", sid, tid)
     return {"ok": True}
 
 
+@router.get("/export")
+async def export_full_config() -> ConfigDocument:
+    return await export_config()
+
+
+@router.post("/import")
+async def import_full_config(body: ConfigDocument, replace: bool = False) -> dict[str, Any]:
+    """Upsert a whole exported config (replace=true wipes the current one first)."""
+    try:
+        counts = await import_config(body, replace=replace)
+    except ConfigImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Rebuild here once; the NOTIFY-triggered reload in this worker then finds nothing new
+    reg = await reload_registry()
+    return {"ok": True, "imported": counts, "version": reg.version}
+
+
 # Note: reload is handled in api.py to ensure the global registry is actually rebuilt.
 
 
+@router.get("/metrics")
+async def get_metrics() -> dict[str, Any]:
+    return metrics.snapshot()
+
+
+@router.get("/admission")
+async def get_admission() -> dict[str, Any]:
+    return admission_state()
+
+
+@router.get("/model-limits")
+async def get_model_limits() -> dict[str, Any]:
+    return {"models": limiter_states()}
+
+
+@router.get("/seats")
+async def get_seats() -> dict[str, Any]:
+    return seat_inventory.state()
+
+
+@router.get("/flight-status")
+async def get_flight_status_index() -> dict[str, Any]:
+    return flight_status.index_state()
+
+
+@router.post("/flight-status/ingest")
+async def ingest_flight_status(request: Request) -> dict[str, Any]:
+    """COPY a CSV schedule/status feed sent as the raw request body (header row required)."""
+    try:
+        count = await flight_status.ingest(request.stream())
+    except flight_status.FlightStatusImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"ok": True, "ingested": count, **flight_status.index_state()}
+
+
+@router.get("/breakers")
+async def get_breakers() -> dict[str, Any]:
+    return {"breakers": breaker_states()}
+
+
+@router.post("/breakers/reset")
+async def reset_circuit_breakers(provider: Optional[str] = None) -> dict[str, Any]:
+    reset_breakers(provider)
+    return {"ok": True}
+
+
 class AppContext(BaseModel):
     triage_name: str
     defaults: dict[str, Any]
@@ -345,10 +495,13 @@ async def get_context_defaults(triage_name: str = "__global__") -> dict[str, Any
 
 @router.put("/context")
 async def update_context_defaults(body: AppContext) -> dict[str, Any]:
-    # store as json text
+    # asyncpg sends jsonb parameters as JSON text
     import json
     text = json.dumps(body.defaults)
-    await execute("insert into app_contexts(triage_name, defaults) values($1,$2) on conflict (triage_name) do update set defaults=excluded.defaults", body.triage_name, text)
+    async with config_mutation("context", body.triage_name) as conn:
+        await conn.execute("insert into app_contexts(triage_name, defaults) values($1,$2) on conflict (triage_name) do update set defaults=excluded.defaults", body.triage_name, text)
+    # Other workers pick the change up via NOTIFY; no agents are rebuilt for context changes
+    await reload_registry()
     return {"ok": True}
 
 
@@ -392,23 +545,107 @@ async def migrate_instructions_provider_to_text() -> dict[str, Any]:
         "If the customer asks anything else, transfer back to the triage agent."
     )
 
-    # Update all provider-based instructions to text templates
-    await execute("update agents set instruction_type='text', instruction_value=$1 where instruction_type='provider' and instruction_value='triage'", triage_text)
-    await execute("update agents set instruction_type='text', instruction_value=$1 where instruction_type='provider' and instruction_value='faq'", faq_text)
-    await execute("update agents set instruction_type='text', instruction_value=$1 where instruction_type='provider' and instruction_value='seat_booking'", seat_booking_text)
-    await execute("update agents set instruction_type='text', instruction_value=$1 where instruction_type='provider' and instruction_value='flight_status'", flight_status_text)
-    await execute("update agents set instruction_type='text', instruction_value=$1 where instruction_type='provider' and instruction_value='cancellation'", cancellation_text)
+    # Update all provider-based instructions to text templates; touches any number of agents
+    async with config_mutation("agent") as conn:
+        await conn.execute("update agents set instruction_type='text', instruction_value=$1 where instruction_type='provider' and instruction_value='triage'", triage_text)
+        await conn.execute("update agents set instruction_type='text', instruction_value=$1 where instruction_type='provider' and instruction_value='faq'", faq_text)
+        await conn.execute("update agents set instruction_type='text', instruction_value=$1 where instruction_type='provider' and instruction_value='seat_booking'", seat_booking_text)
+        await conn.execute("update agents set instruction_type='text', instruction_value=$1 where instruction_type='provider' and instruction_value='flight_status'", flight_status_text)
+        await conn.execute("update agents set instruction_type='text', instruction_value=$1 where instruction_type='provider' and instruction_value='cancellation'", cancellation_text)
+
+    return {"ok": True}
+
+
+class FaqEntryCreate(BaseModel):
+    question: str
+    answer: str
+    keywords: str = ""
+
+
+class FaqEntryUpdate(BaseModel):
+    question: Optional[str] = None
+    answer: Optional[str] = None
+    keywords: Optional[str] = None
+
+
+class FaqImport(BaseModel):
+    entries: list[FaqEntryCreate]
+    # Replace the whole knowledge base instead of appending to it
+    replace: bool = False
 
+
+@router.get("/faq")
+async def list_faq() -> dict[str, Any]:
+    rows = await fetch("select id, question, answer, keywords from faq_entries order by id")
+    return {"entries": [dict(r) for r in rows]}
+
+
+@router.get("/faq/search")
+async def search_faq(q: str, top_k: int = 3) -> dict[str, Any]:
+    entries = await faq.lookup(q, top_k=top_k)
+    return {"entries": [e.__dict__ for e in entries]}
+
+
+@router.post("/faq")
+async def create_faq(body: FaqEntryCreate) -> dict[str, Any]:
+    async with config_mutation("faq") as conn:
+        row = await conn.fetchrow(
+            "insert into faq_entries(question, answer, keywords) values($1,$2,$3) returning id",
+            body.question, body.answer, body.keywords,
+        )
+    # Rebuilds this worker's FAQ index now; the others do on the NOTIFY
+    await reload_registry()
+    return {"ok": True, "id": int(row["id"]) if row else None}
+
+
+@router.patch("/faq/{entry_id}")
+async def update_faq(entry_id: int, body: FaqEntryUpdate) -> dict[str, Any]:
+    fields: list[str] = []
+    args: list[Any] = []
+    if body.question is not None:
+        fields.append("question=$%d" % (len(args) + 1))
+        args.append(body.question)
+    if body.answer is not None:
+        fields.append("answer=$%d" % (len(args) + 1))
+        args.append(body.answer)
+    if body.keywords is not None:
+        fields.append("keywords=$%d" % (len(args) + 1))
+        args.append(body.keywords)
+    if not fields:
+        return {"ok": True}
+    args.append(entry_id)
+    set_sql = ", ".join(fields)
+    async with config_mutation("faq", str(entry_id)) as conn:
+        await conn.execute(f"update faq_entries set {set_sql} where id=$%d" % (len(args)), *args)
+    await reload_registry()
     return {"ok": True}
 
 
+@router.delete("/faq/{entry_id}")
+async def delete_faq(entry_id: int) -> dict[str, Any]:
+    async with config_mutation("faq", str(entry_id)) as conn:
+        await conn.execute("delete from faq_entries where id=$1", entry_id)
+    await reload_registry()
+    return {"ok": True}
+
+
+@router.post("/faq/import")
+async def import_faq(body: FaqImport) -> dict[str, Any]:
+    count = await faq.import_entries([e.model_dump() for e in body.entries], replace=body.replace)
+    await reload_registry()
+    return {"ok": True, "imported": count}
+
+
 @router.post("/tools/test", response_model=ToolTestResponse)
 async def test_tool(body: ToolTestRequest) -> ToolTestResponse:
     """Invoke a tool directly by code name with provided arguments."""
     import inspect
 
     # Prefer explicit test invoker if available to bypass wrappers
-    impl = TOOL_TEST_INVOKERS.get(body.tool_code_name) or TOOL_REGISTRY.get(body.tool_code_name)
+    try:
+        impl = TOOL_TEST_INVOKERS.get(body.tool_code_name) or TOOL_REGISTRY.get(body.tool_code_name)
+    except ImportError as e:
+        return ToolTestResponse(ok=False, output=None, error=f"Tool '{body.tool_code_name}' could not be imported: {e}")
     if not impl:
         return ToolTestResponse(ok=False, output=None, error=f"Tool '{body.tool_code_name}' not found")
 
@@ -0,0 +1,208 @@
+from __future__ import annotations as _annotations
+
+import asyncio
+import collections
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+import metrics
+from settings import env_float
+
+
+# Agent runs allowed at once per worker, and how many more may wait for a slot
+MAX_IN_FLIGHT = int(env_float("CHAT_MAX_IN_FLIGHT", 32))
+MAX_QUEUE = int(env_float("CHAT_MAX_QUEUE", 64))
+QUEUE_TIMEOUT = env_float("CHAT_QUEUE_TIMEOUT", 5.0)
+# Token buckets (requests per second, burst); a rate of 0 disables the bucket
+CLIENT_RATE = env_float("CHAT_CLIENT_RATE", 1.0)
+CLIENT_BURST = env_float("CHAT_CLIENT_BURST", 10)
+TRIAGE_RATE = env_float("CHAT_TRIAGE_RATE", 20.0)
+TRIAGE_BURST = env_float("CHAT_TRIAGE_BURST", 40)
+# Header identifying the client when behind a trusted proxy (e.g. x-forwarded-for)
+CLIENT_ID_HEADER = os.getenv("CHAT_CLIENT_ID_HEADER", "").lower()
+_MAX_BUCKETS = 10000
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float) -> None:
+        self.reason = reason
+        self.retry_after = max(retry_after, 0.0)
+        super().__init__(f"chat request rejected ({reason}); retry in {self.retry_after:.1f}s")
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Spend one token; returns 0 on success, else seconds until one is available."""
+        self._refill(time.monotonic())
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def refund(self) -> None:
+        self.tokens = min(self.burst, self.tokens + 1.0)
+
+
+class TokenBuckets:
+    """Buckets by key; the least recently used are dropped past _MAX_BUCKETS (a fresh bucket is full anyway)."""
+
+    def __init__(self, scope: str, rate: float, burst: float) -> None:
+        self.scope = scope
+        self.rate = rate
+        self.burst = burst
+        self._buckets: collections.OrderedDict[str, TokenBucket] = collections.OrderedDict()
+
+    def take(self, key: str) -> float:
+        if self.rate <= 0:
+            return 0.0
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > _MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take()
+
+    def refund(self, key: str) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.refund()
+
+
+class ConcurrencyLimiter:
+    """In-flight limit with a bounded FIFO wait queue; a full queue rejects immediately."""
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float) -> None:
+        self.limit = max(limit, 1)
+        self.max_queue = max(max_queue, 0)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: collections.deque[asyncio.Future[None]] = collections.deque()
+        # Smoothed run time, used to tell rejected clients when a slot is likely free
+        self._avg_hold = 1.0
+
+    def _publish(self) -> None:
+        metrics.set_gauge("chat_in_flight", self.in_flight)
+        metrics.set_gauge("chat_queue_depth", len(self._waiters))
+
+    def retry_after(self) -> float:
+        return self._avg_hold * (len(self._waiters) + 1) / self.limit
+
+    async def acquire(self) -> None:
+        started = time.perf_counter()
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self._publish()
+            metrics.observe("chat_admission_wait_seconds", 0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise AdmissionRejected("queue_full", self.retry_after())
+        fut: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        self._publish()
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=self.queue_timeout)
+        except BaseException as e:
+            if fut.done() and not fut.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                fut.cancel()
+                try:
+                    self._waiters.remove(fut)
+                except ValueError:
+                    pass
+            self._publish()
+            if isinstance(e, asyncio.TimeoutError):
+                raise AdmissionRejected("queue_timeout", self.retry_after()) from None
+            raise
+        metrics.observe("chat_admission_wait_seconds", time.perf_counter() - started)
+
+    def release(self, held: Optional[float] = None) -> None:
+        if held is not None:
+            self._avg_hold += 0.1 * (held - self._avg_hold)
+        # Hand the slot straight to the oldest waiter so newcomers cannot jump the queue
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                self._publish()
+                return
+        self.in_flight -= 1
+        self._publish()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "avg_run_seconds": round(self._avg_hold, 3),
+        }
+
+
+limiter = ConcurrencyLimiter(MAX_IN_FLIGHT, MAX_QUEUE, QUEUE_TIMEOUT)
+client_buckets = TokenBuckets("client", CLIENT_RATE, CLIENT_BURST)
+triage_buckets = TokenBuckets("triage", TRIAGE_RATE, TRIAGE_BURST)
+
+
+def client_key(request: Any) -> str:
+    if CLIENT_ID_HEADER:
+        value = request.headers.get(CLIENT_ID_HEADER)
+        if value:
+            return value.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _reject(reason: str, retry_after: float) -> AdmissionRejected:
+    metrics.inc("chat_admission_rejections_total", reason=reason)
+    return AdmissionRejected(reason, retry_after)
+
+
+@asynccontextmanager
+async def admit(client: str, triage: str) -> AsyncIterator[None]:
+    """Hold a chat run slot; raises AdmissionRejected when rate limited or overloaded."""
+    wait = client_buckets.take(client)
+    if wait:
+        raise _reject("client_rate", wait)
+    wait = triage_buckets.take(triage)
+    if wait:
+        client_buckets.refund(client)
+        raise _reject("triage_rate", wait)
+    try:
+        await limiter.acquire()
+    except AdmissionRejected as e:
+        client_buckets.refund(client)
+        triage_buckets.refund(triage)
+        raise _reject(e.reason, e.retry_after) from None
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        limiter.release(time.monotonic() - started)
+
+
+def admission_state() -> dict[str, Any]:
+    return {
+        "concurrency": limiter.to_dict(),
+        "client_rate": {"rate": client_buckets.rate, "burst": client_buckets.burst, "tracked": len(client_buckets._buckets)},
+        "triage_rate": {"rate": triage_buckets.rate, "burst": triage_buckets.burst, "tracked": len(triage_buckets._buckets)},
+    }
@@ -1,7 +1,7 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Awaitable, Callable
 from uuid import uuid4
 import os
 from dotenv import load_dotenv
@@ -10,14 +10,27 @@ load_dotenv()
 
 import time
 import asyncio
+import json
 import logging
 
 from domain import (
     CONTEXT_CLASS,
 )
-from loader import build_dynamic_registry, DynamicRegistry
-from db import init_schema, fetchrow
-from seed import seed_if_empty
+from loader import build_dynamic_registry, build_registry_from_snapshot, reload_registry, current_registry, active_registry, use_registry
+import registry_sync
+from model_provider import RUN_CONFIG, finish_turn, track_turn_usage
+from db import init_schema, close_pool
+from seed import seed_if_empty, seed_faq_if_empty
+import faq
+import flight_status
+import admission
+import chat_sessions
+import metrics
+from seat_inventory import inventory as seat_inventory
+from conversation_store import TieredConversationStore
+from settings import env_float
+from tool_cache import tool_cache
+from services import http_pool
 from admin import router as admin_router
 
 from agents import (
@@ -28,7 +41,6 @@ from agents import (
     ToolCallItem,
     ToolCallOutputItem,
     InputGuardrailTripwireTriggered,
-    Handoff,
 )
 
 # Configure logging
@@ -40,7 +52,6 @@ if not os.getenv("OPENAI_LOG"):
     os.environ["OPENAI_LOG"] = "debug"
 
 app = FastAPI()
-_registry: DynamicRegistry | None = None
 
 # CORS configuration (adjust as needed for deployment)
 app.add_middleware(
@@ -91,40 +102,29 @@ class ChatResponse(BaseModel):
     agents: List[Dict[str, Any]]
     guardrails: List[GuardrailCheck] = []
 
+class SeatHoldRequest(BaseModel):
+    seat: str
+    holder: str
+
 # =========================
-# In-memory store for conversation state
+# Conversation state store (memory, idle ones spilled to local disk)
 # =========================
 
-class ConversationStore:
-    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
-        pass
-
-    def save(self, conversation_id: str, state: Dict[str, Any]):
-        pass
-
-class InMemoryConversationStore(ConversationStore):
-    _conversations: Dict[str, Dict[str, Any]] = {}
-
-    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
-        return self._conversations.get(conversation_id)
-
-    def save(self, conversation_id: str, state: Dict[str, Any]):
-        self._conversations[conversation_id] = state
-
 # TODO: when deploying this app in scale, switch to your own production-ready implementation
-conversation_store = InMemoryConversationStore()
+conversation_store = TieredConversationStore()
 
 # =========================
 # Helpers / Initialization
 # =========================
 
 def _get_agent_by_name(name: str):
-    assert _registry is not None, "Registry not initialized"
+    reg = active_registry()
+    assert reg is not None, "Registry not initialized"
     try:
-        return _registry.get(name)
+        return reg.get(name)
     except KeyError:
         # Default to triage if not found
-        return _registry.get("Triage Agent")
+        return reg.get("Triage Agent")
 
 def _get_guardrail_name(g) -> str:
     """Extract a friendly guardrail name."""
@@ -141,7 +141,8 @@ def _get_guardrail_name(g) -> str:
 
 def _build_agents_list() -> List[Dict[str, Any]]:
     """Build a list of all available agents and their metadata."""
-    assert _registry is not None, "Registry not initialized"
+    reg = active_registry()
+    assert reg is not None, "Registry not initialized"
     def make_agent_dict(agent):
         # Map tool names to agent refs if available
         tool_names = [getattr(t, "name", getattr(t, "__name__", "")) for t in getattr(agent, "tools", [])]
@@ -157,74 +158,313 @@ def _build_agents_list() -> List[Dict[str, Any]]:
             "tools": tools,
             "input_guardrails": [_get_guardrail_name(g) for g in getattr(agent, "input_guardrails", [])],
         }
-    return [make_agent_dict(a) for a in _registry.list_all()]
+    return [make_agent_dict(a) for a in reg.list_all()]
 
 
-@app.on_event("startup")
-async def _on_startup():
-    global _registry
+_startup_tasks: List[asyncio.Task] = []
+
+
+async def _prepare_database() -> None:
     await init_schema()
     await seed_if_empty()
-    _registry = await build_dynamic_registry()
+    await seed_faq_if_empty()
+    await faq.refresh_index()
+
+
+async def _reconcile_with_database() -> None:
+    """Warm start: bring the snapshot-built registry up to date once Postgres is reachable."""
+    delay = 1.0
+    while True:
+        try:
+            await _prepare_database()
+            await reload_registry()
+            break
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("Database not ready; serving the registry snapshot, retrying in %.0fs", delay, exc_info=True)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+    await registry_sync.start()
+
+
+@app.on_event("startup")
+async def _on_startup():
+    await http_pool.start()
+    conversation_store.start()
+    seat_inventory.start()
+    flight_status.start()
+    if await build_registry_from_snapshot() is not None:
+        # Serve immediately from the local snapshot; schema, seeding and the DB diff run in the background
+        _startup_tasks.append(asyncio.create_task(_reconcile_with_database()))
+        return
+    await _prepare_database()
+    await build_dynamic_registry()
+    # Follow config changes made through any worker
+    await registry_sync.start()
+
+
+@app.on_event("shutdown")
+async def _on_shutdown():
+    for task in _startup_tasks:
+        task.cancel()
+    await asyncio.gather(*_startup_tasks, return_exceptions=True)
+    await registry_sync.stop()
+    await conversation_store.stop()
+    await seat_inventory.stop()
+    await flight_status.stop()
+    await http_pool.aclose()
+    await close_pool()
 
 
 @app.post("/admin/reload")
-async def _admin_reload():
-    global _registry
-    _registry = await build_dynamic_registry()
-    return {"ok": True}
+async def _admin_reload(full: bool = False):
+    """Rebuild the agents changed since the current registry version (all of them with full=true)."""
+    reg = await reload_registry(full=full)
+    return {"ok": True, "version": reg.version, "rebuilt": reg.rebuilt, "template_problems": reg.template_problems}
 
 # =========================
 # Main Chat Endpoint
 # =========================
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(req: ChatRequest):
+async def chat_endpoint(req: ChatRequest, request: Request):
     """
     Main chat endpoint for agent orchestration.
     Handles conversation state, agent routing, and guardrail checks.
     """
+    # Shed load before it reaches the model provider: rate limits, then a run slot
+    try:
+        async with admission.admit(admission.client_key(request), req.triage_name or "Triage Agent"):
+            return await _until_disconnected(request, _chat_turn(req))
+    except admission.AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many requests ({e.reason}); please retry shortly.",
+            headers={"Retry-After": e.retry_after_header},
+        )
+
+
+class _TurnOutput:
+    """Messages and events produced by one turn, and the agent it ended on."""
+
+    def __init__(self, current_agent: Any) -> None:
+        self.messages: List[MessageResponse] = []
+        self.events: List[AgentEvent] = []
+        self.current_agent = current_agent
+        self.last_tool_name: str | None = None
+
+    def add_item(self, item: Any) -> None:
+        if isinstance(item, MessageOutputItem):
+            text = ItemHelpers.text_message_output(item)
+            self.messages.append(MessageResponse(content=text, agent=item.agent.name))
+            self.events.append(AgentEvent(id=uuid4().hex, type="message", agent=item.agent.name, content=text))
+            logger.debug("Message from agent=%s content=%s", item.agent.name, text)
+        # Handle handoff output and agent switching
+        elif isinstance(item, HandoffOutputItem):
+            logger.info("Handoff → %s → %s", item.source_agent.name, item.target_agent.name)
+            # Record the handoff event
+            self.events.append(
+                AgentEvent(
+                    id=uuid4().hex,
+                    type="handoff",
+                    agent=item.source_agent.name,
+                    content=f"{item.source_agent.name} -> {item.target_agent.name}",
+                    metadata={"source_agent": item.source_agent.name, "target_agent": item.target_agent.name},
+                )
+            )
+            # If there is an on_handoff callback defined for this handoff, show it as a tool call
+            from_agent = item.source_agent
+            to_agent = item.target_agent
+            # The loader records callback names per target on the source agent
+            cb_name = (getattr(from_agent, "_handoff_callbacks", {}) or {}).get(to_agent.name)
+            if cb_name:
+                self.events.append(
+                    AgentEvent(
+                        id=uuid4().hex,
+                        type="tool_call",
+                        agent=to_agent.name,
+                        content=cb_name,
+                    )
+                )
+            self.current_agent = item.target_agent
+        elif isinstance(item, ToolCallItem):
+            tool_name = getattr(item.raw_item, "name", None)
+            raw_args = getattr(item.raw_item, "arguments", None)
+            tool_args: Any = raw_args
+            if isinstance(raw_args, str):
+                try:
+                    import json
+                    tool_args = json.loads(raw_args)
+                except Exception:
+                    pass
+            self.last_tool_name = tool_name or None
+            self.events.append(
+                AgentEvent(
+                    id=uuid4().hex,
+                    type="tool_call",
+                    agent=item.agent.name,
+                    content=tool_name or "",
+                    metadata={"tool_args": tool_args},
+                )
+            )
+            logger.info("Tool call → agent=%s tool=%s args=%s", item.agent.name, tool_name, tool_args)
+            # If the tool is display_seat_map, send a special message so the UI can render the seat selector.
+            if tool_name == "display_seat_map":
+                self.messages.append(
+                    MessageResponse(
+                        content="DISPLAY_SEAT_MAP",
+                        agent=item.agent.name,
+                    )
+                )
+        elif isinstance(item, ToolCallOutputItem):
+            output_metadata: Dict[str, Any] = {"tool_result": item.output}
+            raw_output = item.raw_item
+            call_id = raw_output.get("call_id") if isinstance(raw_output, dict) else getattr(raw_output, "call_id", None)
+            cache_status = tool_cache.pop_call_status(call_id)
+            if cache_status is not None:
+                output_metadata["cache"] = cache_status
+            self.events.append(
+                AgentEvent(
+                    id=uuid4().hex,
+                    type="tool_output",
+                    agent=item.agent.name,
+                    content=str(item.output),
+                    metadata=output_metadata,
+                )
+            )
+            logger.info("Tool output ← agent=%s output=%s", item.agent.name, item.output)
+            # Surface agent-as-tool outputs (manager pattern) or known web-search tools as user-visible messages
+            agent_tool_refs = getattr(self.current_agent, "_tool_agent_refs", {}) or {}
+            is_agent_tool = self.last_tool_name in agent_tool_refs if self.last_tool_name else False
+            is_known_web_tool = self.last_tool_name in {"perplexity_web_search", "modern_web_search", "web_search", "meta_web_search"}
+            if isinstance(item.output, str) and (is_agent_tool or is_known_web_tool):
+                # Prefer agent-as-tool labeling if this tool name is a wrapper around another agent
+                prefix: str | None = None
+                if is_agent_tool:
+                    try:
+                        ref_name = agent_tool_refs.get(self.last_tool_name or "")
+                        if ref_name:
+                            prefix = f"[Agent Tool: {ref_name}] "
+                        else:
+                            prefix = "[Agent Tool] "
+                    except Exception:
+                        prefix = "[Agent Tool] "
+                elif self.last_tool_name == "perplexity_web_search":
+                    prefix = "[Perplexity] "
+                elif self.last_tool_name == "modern_web_search":
+                    prefix = "[OpenAI Web Search] "
+                elif self.last_tool_name == "web_search":
+                    prefix = "[Web Search] "
+                elif self.last_tool_name == "meta_web_search":
+                    prefix = "[Meta Web Search] "
+                content_with_prefix = f"{prefix or ''}{item.output}"
+                self.messages.append(
+                    MessageResponse(
+                        content=content_with_prefix,
+                        agent=item.agent.name,
+                    )
+                )
+                self.last_tool_name = None
+
+
+async def _until_disconnected(request: Request, turn: Awaitable[Any]) -> Any:
+    """Await the turn, cancelling it (model calls, guardrails, tools) if the client goes away first."""
+    task = asyncio.ensure_future(turn)
+
+    async def _wait_disconnect() -> None:
+        # The body has been read, so the next ASGI message is the disconnect
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+
+    watcher = asyncio.create_task(_wait_disconnect())
+    try:
+        await asyncio.wait((task, watcher), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        if not task.done():
+            task.cancel()
+        watcher.cancel()
+        await asyncio.gather(task, watcher, return_exceptions=True)
+    if task.cancelled():
+        metrics.inc("chat_runs_cancelled_total", transport="http")
+        logger.info("Client disconnected; cancelled the chat turn")
+        # Nobody is listening; 499 is the conventional "client closed request" status
+        return Response(status_code=499)
+    return task.result()
+
+
+def _new_state(triage_name: Optional[str]) -> Dict[str, Any]:
+    # Defaults come parsed with the registry config; no DB round trip per new conversation
+    reg = current_registry()
+    tn = triage_name or "__global__"
+    ctx_defaults: Dict[str, Any] = reg.context_defaults.get(tn, {}) if reg is not None else {}
+    return {
+        "input_items": [],
+        "context": CONTEXT_CLASS(**ctx_defaults),
+        "current_agent": triage_name or "Triage Agent",
+    }
+
+
+async def _chat_turn(req: ChatRequest) -> ChatResponse:
     # Initialize or retrieve conversation state
-    is_new = not req.conversation_id or conversation_store.get(req.conversation_id) is None
-    if is_new:
+    stored = await conversation_store.get(req.conversation_id) if req.conversation_id else None
+    if stored is None:
         conversation_id: str = uuid4().hex
-        # Load defaults from DB and construct context dynamically
-        ctx_defaults: Dict[str, Any] = {}
-        try:
-            tn = req.triage_name or "__global__"
-            row = await fetchrow("select defaults from app_contexts where triage_name=$1", tn)
-            if row and row.get("defaults"):
-                import json
-                raw = row["defaults"]
-                ctx_defaults = json.loads(raw) if isinstance(raw, str) else raw
-        except Exception:
-            ctx_defaults = {}
-        ctx = CONTEXT_CLASS(**ctx_defaults)
-        current_agent_name = req.triage_name or "Triage Agent"
-        state: Dict[str, Any] = {
-            "input_items": [],
-            "context": ctx,
-            "current_agent": current_agent_name,
-        }
+        state = _new_state(req.triage_name)
         if req.message.strip() == "":
             conversation_store.save(conversation_id, state)
             return ChatResponse(
                 conversation_id=conversation_id,
-                current_agent=current_agent_name,
+                current_agent=state["current_agent"],
                 messages=[],
                 events=[],
-                context=ctx.model_dump(),
+                context=state["context"].model_dump(),
                 agents=_build_agents_list(),
                 guardrails=[],
             )
     else:
         conversation_id = req.conversation_id  # type: ignore
-        state = conversation_store.get(conversation_id)
+        state = stored
+    return await _run_turn(conversation_id, state, req.message)
+
+
+PushFn = Callable[[str, Any], Awaitable[None]]
 
+
+async def _stream_items(result: Any, out: _TurnOutput, push: PushFn) -> None:
+    async for ev in result.stream_events():
+        if ev.type != "run_item_stream_event":
+            continue
+        n_messages, n_events = len(out.messages), len(out.events)
+        out.add_item(ev.item)
+        for e in out.events[n_events:]:
+            await push("event", e)
+        for m in out.messages[n_messages:]:
+            await push("message", m)
+
+
+async def _run_turn(
+    conversation_id: str,
+    state: Dict[str, Any],
+    message: str,
+    push: Optional[PushFn] = None,
+    include_agents: bool = True,
+) -> ChatResponse:
+    """Run one user message against the conversation state, updating and saving it.
+
+    With `push`, the run is streamed and each message/event is pushed as it is produced.
+    """
+    # The whole turn, handoffs included, runs against the snapshot it started with even if
+    # a rebuild publishes a newer one meanwhile
+    use_registry(current_registry())
     current_agent = _get_agent_by_name(state["current_agent"])
-    state["input_items"].append({"content": req.message, "role": "user"})
+    n_items = len(state["input_items"])
+    state["input_items"].append({"content": message, "role": "user"})
     old_context = state["context"].model_dump().copy()
+    usage = track_turn_usage()
+    seat_changes = seat_inventory.track_turn()
     guardrail_checks: List[GuardrailCheck] = []
+    out = _TurnOutput(current_agent)
 
     try:
         # Debug: log outgoing agent call
@@ -241,15 +481,25 @@ async def chat_endpoint(req: ChatRequest):
         logger.debug("Input items=%s", state["input_items"])
 
         # Enforce an overall timeout for the agent run to prevent 500s on long calls
-        result = await asyncio.wait_for(
-            Runner.run(current_agent, state["input_items"], context=state["context"]),
-            timeout=30.0,
-        )
+        if push is None:
+            result = await asyncio.wait_for(
+                Runner.run(current_agent, state["input_items"], context=state["context"], run_config=RUN_CONFIG),
+                timeout=30.0,
+            )
+            for item in result.new_items:
+                out.add_item(item)
+        else:
+            result = Runner.run_streamed(current_agent, state["input_items"], context=state["context"], run_config=RUN_CONFIG)
+            try:
+                await asyncio.wait_for(_stream_items(result, out, push), timeout=30.0)
+            except BaseException:
+                result.cancel()
+                raise
     except InputGuardrailTripwireTriggered as e:
         failed = e.guardrail_result.guardrail
         gr_output = e.guardrail_result.output.output_info
         gr_reasoning = getattr(gr_output, "reasoning", "")
-        gr_input = req.message
+        gr_input = message
         gr_timestamp = time.time() * 1000
         try:
             logger.warning(
@@ -269,182 +519,73 @@ async def chat_endpoint(req: ChatRequest):
             ))
         refusal = "Sorry, I can only answer questions related to airline travel."
         state["input_items"].append({"role": "assistant", "content": refusal})
+        conversation_store.save(conversation_id, state)
         return ChatResponse(
             conversation_id=conversation_id,
             current_agent=current_agent.name,
             messages=[MessageResponse(content=refusal, agent=current_agent.name)],
             events=[],
             context=state["context"].model_dump(),
-            agents=_build_agents_list(),
+            agents=_build_agents_list() if include_agents else [],
             guardrails=guardrail_checks,
         )
     except asyncio.TimeoutError:
         apology = "Sorry, this request is taking longer than expected. Please try again."
         state["input_items"].append({"role": "assistant", "content": apology})
+        conversation_store.save(conversation_id, state)
         return ChatResponse(
             conversation_id=conversation_id,
             current_agent=current_agent.name,
             messages=[MessageResponse(content=apology, agent=current_agent.name)],
             events=[],
             context=state["context"].model_dump(),
-            agents=_build_agents_list(),
+            agents=_build_agents_list() if include_agents else [],
             guardrails=[],
         )
-    except Exception as e:
+    except asyncio.CancelledError:
+        # Client went away: leave the conversation exactly as it was before this message
+        del state["input_items"][n_items:]
+        state["context"] = CONTEXT_CLASS(**old_context)
+        # The seat inventory lives outside the conversation state; undo its changes too
+        seat_inventory.undo_turn(seat_changes)
+        finish_turn(usage, cancelled=True)
+        raise
+    except Exception:
         logger.exception("Unhandled error in chat endpoint")
         error_msg = "Sorry, something went wrong while generating a response."
         state["input_items"].append({"role": "assistant", "content": error_msg})
+        conversation_store.save(conversation_id, state)
         return ChatResponse(
             conversation_id=conversation_id,
             current_agent=current_agent.name,
             messages=[MessageResponse(content=error_msg, agent=current_agent.name)],
             events=[],
             context=state["context"].model_dump(),
-            agents=_build_agents_list(),
+            agents=_build_agents_list() if include_agents else [],
             guardrails=[],
         )
 
-    messages: List[MessageResponse] = []
-    events: List[AgentEvent] = []
-
-    last_tool_name: str | None = None
-    for item in result.new_items:
-        if isinstance(item, MessageOutputItem):
-            text = ItemHelpers.text_message_output(item)
-            messages.append(MessageResponse(content=text, agent=item.agent.name))
-            events.append(AgentEvent(id=uuid4().hex, type="message", agent=item.agent.name, content=text))
-            logger.debug("Message from agent=%s content=%s", item.agent.name, text)
-        # Handle handoff output and agent switching
-        elif isinstance(item, HandoffOutputItem):
-            logger.info("Handoff → %s → %s", item.source_agent.name, item.target_agent.name)
-            # Record the handoff event
-            events.append(
-                AgentEvent(
-                    id=uuid4().hex,
-                    type="handoff",
-                    agent=item.source_agent.name,
-                    content=f"{item.source_agent.name} -> {item.target_agent.name}",
-                    metadata={"source_agent": item.source_agent.name, "target_agent": item.target_agent.name},
-                )
-            )
-            # If there is an on_handoff callback defined for this handoff, show it as a tool call
-            from_agent = item.source_agent
-            to_agent = item.target_agent
-            # Find the Handoff object on the source agent matching the target
-            ho = next(
-                (h for h in getattr(from_agent, "handoffs", [])
-                 if isinstance(h, Handoff) and getattr(h, "agent_name", None) == to_agent.name),
-                None,
-            )
-            if ho:
-                fn = ho.on_invoke_handoff
-                fv = fn.__code__.co_freevars
-                cl = fn.__closure__ or []
-                if "on_handoff" in fv:
-                    idx = fv.index("on_handoff")
-                    if idx < len(cl) and cl[idx].cell_contents:
-                        cb = cl[idx].cell_contents
-                        cb_name = getattr(cb, "__name__", repr(cb))
-                        events.append(
-                            AgentEvent(
-                                id=uuid4().hex,
-                                type="tool_call",
-                                agent=to_agent.name,
-                                content=cb_name,
-                            )
-                        )
-            current_agent = item.target_agent
-        elif isinstance(item, ToolCallItem):
-            tool_name = getattr(item.raw_item, "name", None)
-            raw_args = getattr(item.raw_item, "arguments", None)
-            tool_args: Any = raw_args
-            if isinstance(raw_args, str):
-                try:
-                    import json
-                    tool_args = json.loads(raw_args)
-                except Exception:
-                    pass
-            last_tool_name = tool_name or None
-            events.append(
-                AgentEvent(
-                    id=uuid4().hex,
-                    type="tool_call",
-                    agent=item.agent.name,
-                    content=tool_name or "",
-                    metadata={"tool_args": tool_args},
-                )
-            )
-            logger.info("Tool call → agent=%s tool=%s args=%s", item.agent.name, tool_name, tool_args)
-            # If the tool is display_seat_map, send a special message so the UI can render the seat selector.
-            if tool_name == "display_seat_map":
-                messages.append(
-                    MessageResponse(
-                        content="DISPLAY_SEAT_MAP",
-                        agent=item.agent.name,
-                    )
-                )
-        elif isinstance(item, ToolCallOutputItem):
-            events.append(
-                AgentEvent(
-                    id=uuid4().hex,
-                    type="tool_output",
-                    agent=item.agent.name,
-                    content=str(item.output),
-                    metadata={"tool_result": item.output},
-                )
-            )
-            logger.info("Tool output ← agent=%s output=%s", item.agent.name, item.output)
-            # Surface agent-as-tool outputs (manager pattern) or known web-search tools as user-visible messages
-            agent_tool_refs = getattr(current_agent, "_tool_agent_refs", {}) or {}
-            is_agent_tool = last_tool_name in agent_tool_refs if last_tool_name else False
-            is_known_web_tool = last_tool_name in {"perplexity_web_search", "modern_web_search", "web_search"}
-            if isinstance(item.output, str) and (is_agent_tool or is_known_web_tool):
-                # Prefer agent-as-tool labeling if this tool name is a wrapper around another agent
-                prefix: str | None = None
-                if is_agent_tool:
-                    try:
-                        ref_name = agent_tool_refs.get(last_tool_name or "")
-                        if ref_name:
-                            prefix = f"[Agent Tool: {ref_name}] "
-                        else:
-                            prefix = "[Agent Tool] "
-                    except Exception:
-                        prefix = "[Agent Tool] "
-                elif last_tool_name == "perplexity_web_search":
-                    prefix = "[Perplexity] "
-                elif last_tool_name == "modern_web_search":
-                    prefix = "[OpenAI Web Search] "
-                elif last_tool_name == "web_search":
-                    prefix = "[Web Search] "
-                content_with_prefix = f"{prefix or ''}{item.output}"
-                messages.append(
-                    MessageResponse(
-                        content=content_with_prefix,
-                        agent=item.agent.name,
-                    )
-                )
-                last_tool_name = None
-
     new_context = state["context"].dict()
     changes = {k: new_context[k] for k in new_context if old_context.get(k) != new_context[k]}
     if changes:
-        events.append(
+        out.events.append(
             AgentEvent(
                 id=uuid4().hex,
                 type="context_update",
-                agent=current_agent.name,
+                agent=out.current_agent.name,
                 content="",
                 metadata={"changes": changes},
             )
         )
 
     state["input_items"] = result.to_input_list()
-    state["current_agent"] = current_agent.name
+    state["current_agent"] = out.current_agent.name
     conversation_store.save(conversation_id, state)
+    finish_turn(usage)
 
     # Build guardrail results: mark failures (if any), and any others as passed
     final_guardrails: List[GuardrailCheck] = []
-    for g in getattr(current_agent, "input_guardrails", []):
+    for g in getattr(out.current_agent, "input_guardrails", []):
         name = _get_guardrail_name(g)
         failed = next((gc for gc in guardrail_checks if gc.name == name), None)
         if failed:
@@ -453,7 +594,7 @@ async def chat_endpoint(req: ChatRequest):
             final_guardrails.append(GuardrailCheck(
                 id=uuid4().hex,
                 name=name,
-                input=req.message,
+                input=message,
                 reasoning="",
                 passed=True,
                 timestamp=time.time() * 1000,
@@ -461,10 +602,165 @@ async def chat_endpoint(req: ChatRequest):
 
     return ChatResponse(
         conversation_id=conversation_id,
-        current_agent=current_agent.name,
-        messages=messages,
-        events=events,
+        current_agent=out.current_agent.name,
+        messages=out.messages,
+        events=out.events,
         context=state["context"].dict(),
-        agents=_build_agents_list(),
+        agents=_build_agents_list() if include_agents else [],
         guardrails=final_guardrails,
     )
+
+
+# =========================
+# Seat map
+# =========================
+
+@app.get("/seats/{flight_number}")
+async def get_seat_map(flight_number: str):
+    """Occupancy snapshot plus the layout needed to map its bits to seat labels."""
+    try:
+        snapshot = await seat_inventory.snapshot(flight_number)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {**snapshot, "seat_layout": seat_inventory.layout.to_dict()}
+
+
+@app.post("/seats/{flight_number}/hold")
+async def hold_seat(flight_number: str, req: SeatHoldRequest):
+    """Reserve a seat picked on the seat map until the agent assigns it (or the hold expires)."""
+    try:
+        held = await seat_inventory.hold(flight_number, req.seat, req.holder)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    snapshot = await seat_inventory.snapshot(flight_number)
+    if not held:
+        raise HTTPException(status_code=409, detail={"reason": "seat_unavailable", **snapshot})
+    return {"ok": True, **snapshot}
+
+
+# =========================
+# WebSocket chat
+# =========================
+
+WS_PING_INTERVAL = env_float("WS_PING_INTERVAL", 20.0)
+# A client silent for this long (no frames, no pongs) is treated as dead and closed
+WS_IDLE_TIMEOUT = env_float("WS_IDLE_TIMEOUT", 60.0)
+
+
+async def _socket_keepalive(session: chat_sessions.ChatSession) -> None:
+    while not session.closed:
+        await asyncio.sleep(WS_PING_INTERVAL)
+        if time.monotonic() - session.last_seen > WS_IDLE_TIMEOUT:
+            logger.info("Closing idle chat socket for conversation %s", session.conversation_id)
+            metrics.inc("ws_idle_closed_total")
+            session.closed = True
+            try:
+                await session.websocket.close(code=1001)
+            except Exception:
+                pass
+            return
+        await session.send({"type": "ping", "ts": time.time() * 1000})
+
+
+async def _socket_turn(session: chat_sessions.ChatSession, message: str, client: str, triage_name: Optional[str]) -> None:
+    pushed: set[int] = set()
+
+    async def _push(kind: str, obj: Any) -> None:
+        pushed.add(id(obj))
+        await session.send({"type": kind, kind: obj.model_dump()})
+
+    try:
+        async with admission.admit(client, triage_name or "Triage Agent"):
+            # Re-read every turn: HTTP /chat or another tab may have moved the conversation on
+            state = await conversation_store.get(session.conversation_id) or _new_state(triage_name)
+            resp = await _run_turn(session.conversation_id, state, message, push=_push, include_agents=False)
+        session.flight_number = resp.context.get("flight_number")
+        frame: Dict[str, Any] = {
+            "type": "turn_complete",
+            "current_agent": resp.current_agent,
+            "context": resp.context,
+            "guardrails": [g.model_dump() for g in resp.guardrails],
+            # Anything not already pushed while streaming (refusals, errors, context updates)
+            "messages": [m.model_dump() for m in resp.messages if id(m) not in pushed],
+            "events": [e.model_dump() for e in resp.events if id(e) not in pushed],
+        }
+        reg = current_registry()
+        version = reg.version if reg is not None else 0
+        if session.registry_version != version:
+            frame["agents"] = _build_agents_list()
+            session.registry_version = version
+    except admission.AdmissionRejected as e:
+        await session.send({"type": "error", "reason": e.reason, "retry_after": e.retry_after})
+        return
+    except Exception:
+        # The client waits for a frame to end the turn; never leave it hanging
+        logger.exception("Unhandled error in chat socket turn")
+        await session.send({"type": "error", "reason": "internal_error"})
+        return
+    await session.send(frame)
+
+
+@app.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket):
+    """
+    Persistent chat session: `?conversation_id=&triage_name=` on connect, then
+    {"type": "message", "message": "..."} frames. Messages and agent events are
+    pushed as they happen, followed by one "turn_complete" frame per message.
+    Seat changes on the conversation's flight arrive as "seat_map" frames.
+    The server pings every WS_PING_INTERVAL seconds; clients answer with "pong".
+    """
+    await websocket.accept()
+    triage_name = websocket.query_params.get("triage_name") or None
+    conversation_id = websocket.query_params.get("conversation_id") or ""
+    # Only the opening frame uses this copy; each turn re-reads the store
+    state = await conversation_store.get(conversation_id) if conversation_id else None
+    if state is None:
+        conversation_id = uuid4().hex
+        state = _new_state(triage_name)
+        conversation_store.save(conversation_id, state)
+    session = chat_sessions.ChatSession(websocket, conversation_id)
+    session.flight_number = getattr(state["context"], "flight_number", None)
+    chat_sessions.register(session)
+    client = admission.client_key(websocket)
+    reg = current_registry()
+    session.registry_version = reg.version if reg is not None else 0
+    await session.send({
+        "type": "session",
+        "conversation_id": conversation_id,
+        "current_agent": state["current_agent"],
+        "context": state["context"].model_dump(),
+        "agents": _build_agents_list(),
+    })
+    keepalive = asyncio.create_task(_socket_keepalive(session))
+    turn: Optional[asyncio.Task] = None
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            session.last_seen = time.monotonic()
+            try:
+                frame = json.loads(raw)
+            except ValueError:
+                frame = None
+            kind = frame.get("type") if isinstance(frame, dict) else None
+            if kind == "pong":
+                continue
+            if kind == "ping":
+                await session.send({"type": "pong"})
+            elif kind == "message":
+                if turn is not None and not turn.done():
+                    await session.send({"type": "error", "reason": "turn_in_progress"})
+                    continue
+                text = str(frame.get("message") or "")
+                turn = asyncio.create_task(_socket_turn(session, text, client, triage_name))
+            else:
+                await session.send({"type": "error", "reason": "unknown_frame"})
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        chat_sessions.unregister(session)
+        keepalive.cancel()
+        if turn is not None and not turn.done():
+            # Nobody will read the answer; stop paying for it
+            turn.cancel()
+            metrics.inc("chat_runs_cancelled_total", transport="ws")
+        await asyncio.gather(keepalive, *(t for t in (turn,) if t is not None), return_exceptions=True)
@@ -0,0 +1,98 @@
+"""Simulate the adaptive model concurrency limit against a provider with fixed capacity.
+
+Run from the python-backend folder:
+
+    python -m benchmarks.bench_adaptive_limiter [--capacity 12] [--clients 40] [--seconds 20]
+
+A fake provider serves at most `capacity` concurrent calls and answers any call
+beyond that with a 429; latency grows gently as it fills up. `clients` tasks
+call it in a loop through one AdaptiveLimiter. After a warm-up, the limit is
+sampled and reported with the share of calls the provider rejected.
+"""
+from __future__ import annotations as _annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+import openai
+
+from services.adaptive_limiter import AdaptiveLimiter
+
+
+class FakeProvider:
+    def __init__(self, capacity: int, latency: float, rng: random.Random) -> None:
+        self.capacity = capacity
+        self.latency = latency
+        self.rng = rng
+        self.in_flight = 0
+        self.calls = 0
+        self.rejected = 0
+
+    async def call(self) -> None:
+        self.calls += 1
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            # A 429 comes back quickly, without using a slot
+            await asyncio.sleep(self.latency * 0.1)
+            response = httpx.Response(429, request=httpx.Request("POST", "https://provider.invalid/v1/responses"))
+            raise openai.RateLimitError("rate limited", response=response, body=None)
+        self.in_flight += 1
+        try:
+            load = self.in_flight / self.capacity
+            await asyncio.sleep(self.latency * (1 + 0.5 * load) * self.rng.uniform(0.8, 1.2))
+        finally:
+            self.in_flight -= 1
+
+
+async def _client(limiter: AdaptiveLimiter, provider: FakeProvider, stop_at: float) -> None:
+    while time.monotonic() < stop_at:
+        try:
+            async with limiter.slot():
+                await provider.call()
+        except openai.RateLimitError:
+            pass
+
+
+async def _run(capacity: int, clients: int, seconds: float, warmup: float, latency: float, seed: int) -> None:
+    provider = FakeProvider(capacity, latency, random.Random(seed))
+    limiter = AdaptiveLimiter("bench", initial=capacity / 2)
+    started = time.monotonic()
+    stop_at = started + seconds
+    tasks = [asyncio.ensure_future(_client(limiter, provider, stop_at)) for _ in range(clients)]
+
+    samples: list[float] = []
+    calls_at_warmup = rejected_at_warmup = 0
+    while time.monotonic() < stop_at:
+        await asyncio.sleep(latency / 4)
+        if time.monotonic() - started < warmup:
+            calls_at_warmup, rejected_at_warmup = provider.calls, provider.rejected
+            continue
+        samples.append(limiter.limit)
+    await asyncio.gather(*tasks)
+
+    calls = provider.calls - calls_at_warmup
+    rejected = provider.rejected - rejected_at_warmup
+    print(f"capacity {capacity}, {clients} clients, {seconds - warmup:.0f}s measured after {warmup:.0f}s warm-up")
+    print(f"{'limit min / median / max':<26} {min(samples):6.1f} / {statistics.median(samples):.1f} / {max(samples):.1f}")
+    print(f"{'calls':<26} {calls:6d} ({calls / (seconds - warmup):,.0f}/s)")
+    print(f"{'rejected (429)':<26} {rejected:6d} ({rejected / max(calls, 1):.1%})")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--capacity", type=int, default=12, help="concurrent calls the fake provider serves")
+    ap.add_argument("--clients", type=int, default=40)
+    ap.add_argument("--seconds", type=float, default=20.0)
+    ap.add_argument("--warmup", type=float, default=5.0)
+    ap.add_argument("--latency", type=float, default=0.05, help="base call latency in seconds")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    asyncio.run(_run(args.capacity, args.clients, args.seconds, args.warmup, args.latency, args.seed))
+
+
+if __name__ == "__main__":
+    main()
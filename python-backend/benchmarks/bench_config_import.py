@@ -0,0 +1,120 @@
+"""Benchmark /admin/import style bulk config import against per-row admin inserts.
+
+Run from the python-backend folder (needs DATABASE_URL):
+
+    python -m benchmarks.bench_config_import [--agents 1000]
+
+The synthetic config is imported into a scratch schema (bench_config_import,
+dropped afterwards), once through config_io.import_config and once with the
+statement-per-row inserts the individual admin endpoints issue.
+"""
+from __future__ import annotations as _annotations
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_SCHEMA = "bench_config_import"
+
+
+def synthetic_document(n: int) -> Any:
+    from benchmarks.bench_registry_reload import synthetic_rows
+    from config_io import ConfigDocument
+
+    rows = synthetic_rows(n)
+    names = {a["id"]: a["name"] for a in rows["agents"]}
+    return ConfigDocument(
+        agents=[{k: a[k] for k in ("name", "model", "handoff_description", "instruction_type", "instruction_value")}
+                for a in rows["agents"]],
+        tools=[{"name": c, "code_name": c, "description": c}
+               for c in ("faq_lookup_tool", "flight_status_tool", "baggage_tool")],
+        guardrails=[{"name": "Relevance Guardrail", "code_name": "relevance_guardrail", "model": "gpt-4.1-mini"},
+                    {"name": "Jailbreak Guardrail", "code_name": "jailbreak_guardrail", "model": "gpt-4.1-mini"}],
+        agent_tools=[{"agent": names[t["agent_id"]], "tool_name": t["tool_name"], "sort_order": t["sort_order"]}
+                     for t in rows["tool_links"]],
+        agent_guardrails=[{"agent": names[g["agent_id"]], "guardrail_name": g["name"]} for g in rows["guardrail_links"]],
+        handoffs=[{"source": h["source_name"], "target": h["target_name"]} for h in rows["handoffs"]],
+    )
+
+
+async def _per_row_import(doc: Any) -> None:
+    # What the UI does today: one admin call (one acquire + autocommit) per row, with id lookups
+    from db import execute, fetchrow
+
+    async def _agent_id(name: str) -> int:
+        return int((await fetchrow("select id from agents where name=$1", name))["id"])
+
+    for t in doc.tools:
+        await execute("insert into tools(name, code_name, description) values($1,$2,$3)", t.name, t.code_name, t.description)
+    for g in doc.guardrails:
+        await execute("insert into guardrails(name, code_name, model) values($1,$2,$3)", g.name, g.code_name, g.model)
+    for a in doc.agents:
+        await execute(
+            "insert into agents(name, model, handoff_description, instruction_type, instruction_value) values($1,$2,$3,$4,$5)",
+            a.name, a.model, a.handoff_description, a.instruction_type, a.instruction_value,
+        )
+    for l in doc.agent_tools:
+        await execute("insert into agent_tools(agent_id, tool_name, sort_order) values($1,$2,$3)",
+                      await _agent_id(l.agent), l.tool_name, l.sort_order)
+    for l in doc.agent_guardrails:
+        await execute("insert into agent_guardrails(agent_id, guardrail_name) values($1,$2)",
+                      await _agent_id(l.agent), l.guardrail_name)
+    for h in doc.handoffs:
+        await execute("insert into handoffs(source_agent_id, target_agent_id) values($1,$2)",
+                      await _agent_id(h.source), await _agent_id(h.target))
+
+
+async def _run(n: int) -> None:
+    import asyncpg
+
+    dsn = os.environ["DATABASE_URL"]
+    admin = await asyncpg.connect(dsn)
+    await admin.execute(f"drop schema if exists {_SCHEMA} cascade; create schema {_SCHEMA}")
+    sep = "&" if "?" in dsn else "?"
+    os.environ["DATABASE_URL"] = f"{dsn}{sep}search_path={_SCHEMA}"
+    try:
+        import db
+        from config_io import export_config, import_config
+
+        await db.init_schema()
+        doc = synthetic_document(n)
+        print(f"{n} agents, {len(doc.agent_tools)} tool links, {len(doc.agent_guardrails)} guardrail links, "
+              f"{len(doc.handoffs)} handoffs")
+
+        t0 = time.perf_counter()
+        await import_config(doc, replace=True)
+        print(f"{'bulk import (replace)':<24} {(time.perf_counter() - t0) * 1000:9.1f} ms")
+        t0 = time.perf_counter()
+        exported = await export_config()
+        print(f"{'export':<24} {(time.perf_counter() - t0) * 1000:9.1f} ms ({len(exported.agents)} agents)")
+        t0 = time.perf_counter()
+        await import_config(doc)
+        print(f"{'bulk import (upsert)':<24} {(time.perf_counter() - t0) * 1000:9.1f} ms")
+
+        await db.execute("delete from agents; delete from tools; delete from guardrails")
+        t0 = time.perf_counter()
+        await _per_row_import(doc)
+        print(f"{'per-row admin inserts':<24} {(time.perf_counter() - t0) * 1000:9.1f} ms")
+        await db.close_pool()
+    finally:
+        await admin.execute(f"drop schema if exists {_SCHEMA} cascade")
+        await admin.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--agents", type=int, default=1000)
+    args = ap.parse_args()
+    if not os.getenv("DATABASE_URL"):
+        raise SystemExit("DATABASE_URL is required")
+    asyncio.run(_run(args.agents))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark memory per stored conversation and encode/decode cost of conversation_codec.
+
+Run from the python-backend folder:
+
+    python -m benchmarks.bench_conversation_codec [--conversations 300] [--turns 20]
+
+Synthetic conversations mix user/assistant messages, tool calls with JSON
+arguments and long web-search outputs, roughly what a long support chat leaves
+in input_items. Memory is measured with tracemalloc for the live dict states
+and for the encoded blobs.
+"""
+from __future__ import annotations as _annotations
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from typing import Any
+
+import conversation_codec
+from conversation_codec import decode_state, encode_state
+from domain import CONTEXT_CLASS
+
+
+_WORDS = (
+    "flight seat baggage delay gate boarding passenger refund policy connection terminal "
+    "upgrade fare loyalty itinerary weather crew aircraft schedule airport lounge"
+).split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def synthetic_state(turns: int, seed: int = 0) -> dict[str, Any]:
+    rng = random.Random(seed)
+    items: list[dict[str, Any]] = []
+    for turn in range(turns):
+        items.append({"role": "user", "content": _text(rng, 20)})
+        if turn % 3 == 0:
+            call_id = f"call_{seed}_{turn}"
+            items.append({
+                "arguments": json.dumps({"query": _text(rng, 6), "max_results": 5}),
+                "call_id": call_id, "name": "web_search", "type": "function_call",
+                "id": f"fc_{seed}_{turn}", "status": "completed",
+            })
+            results = "\n".join(
+                f"{i}. {_text(rng, 8)} - https://example.com/{rng.randrange(10**6)}\n   {_text(rng, 40)}"
+                for i in range(1, 6)
+            )
+            items.append({"call_id": call_id, "output": results, "type": "function_call_output"})
+        items.append({
+            "id": f"msg_{seed}_{turn}",
+            "content": [{"annotations": [], "text": _text(rng, 60), "type": "output_text", "logprobs": []}],
+            "role": "assistant", "status": "completed", "type": "message",
+        })
+    context = CONTEXT_CLASS(
+        passenger_name="Ann Example", confirmation_number=f"C{seed:05d}", seat_number="12A",
+        flight_number="FLT-123", account_number=str(10**8 + seed),
+    )
+    return {"input_items": items, "context": context, "current_agent": "Triage Agent"}
+
+
+def _measure(build) -> tuple[Any, int]:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, after - before
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--conversations", type=int, default=300)
+    ap.add_argument("--turns", type=int, default=20)
+    ap.add_argument("--no-zstd", action="store_true", help="measure msgpack without compression")
+    args = ap.parse_args()
+    if args.no_zstd:
+        conversation_codec.ZSTD_MIN_BYTES = 0
+
+    n = args.conversations
+    states, live_bytes = _measure(lambda: [synthetic_state(args.turns, seed) for seed in range(n)])
+    json_bytes = sum(len(json.dumps({**s, "context": s["context"].model_dump()})) for s in states)
+    blobs, encoded_bytes = _measure(lambda: [encode_state(s) for s in states])
+
+    t0 = time.perf_counter()
+    for s in states:
+        encode_state(s)
+    encode_us = (time.perf_counter() - t0) / n * 1e6
+    t0 = time.perf_counter()
+    for b in blobs:
+        decode_state(b)
+    decode_us = (time.perf_counter() - t0) / n * 1e6
+    assert decode_state(blobs[0])["input_items"] == states[0]["input_items"]
+
+    zstd = "off" if args.no_zstd or conversation_codec._zstd is None else "on"
+    print(f"{n} conversations x {args.turns} turns ({len(states[0]['input_items'])} items each), zstd {zstd}")
+    print(f"{'live dict state':<22} {live_bytes / n / 1024:9.1f} KiB/conversation")
+    print(f"{'json text (reference)':<22} {json_bytes / n / 1024:9.1f} KiB/conversation")
+    print(f"{'encoded':<22} {encoded_bytes / n / 1024:9.1f} KiB/conversation "
+          f"({live_bytes / max(encoded_bytes, 1):.1f}x smaller than live)")
+    print(f"{'encode':<22} {encode_us:9.1f} us/conversation")
+    print(f"{'decode':<22} {decode_us:9.1f} us/conversation")
+
+
+if __name__ == "__main__":
+    main()
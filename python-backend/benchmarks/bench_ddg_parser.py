@@ -0,0 +1,76 @@
+"""Benchmark the streaming DuckDuckGo parser against the previous full-page regex parse.
+
+Run from the python-backend folder:
+
+    python -m benchmarks.bench_ddg_parser [--iterations 2000] [--chunk-size 4096]
+"""
+from __future__ import annotations as _annotations
+
+import argparse
+import re
+import time
+from pathlib import Path
+
+from services.web_search import DdgResultParser
+
+
+FIXTURE = Path(__file__).parent / "fixtures" / "ddg_results.html"
+
+_LEGACY_RE = re.compile(
+    r'<a[^>]*class="[^\"]*result__a[^\"]*"[^>]*href="([^"]+)"[^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL
+)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def legacy_parse(text: str) -> list[dict[str, str]]:
+    results = []
+    for m in _LEGACY_RE.finditer(text):
+        title = _TAG_RE.sub("", m.group(2)).strip()
+        if m.group(1) and title:
+            results.append({"title": title, "url": m.group(1), "snippet": ""})
+    return results
+
+
+def streaming_parse(chunks: list[str], max_results: int) -> tuple[list[dict[str, str]], int]:
+    parser = DdgResultParser(max_results)
+    consumed = 0
+    for chunk in chunks:
+        parser.feed(chunk)
+        consumed += len(chunk)
+        if parser.done:
+            break
+    parser.close()
+    return parser.results, consumed
+
+
+def _time(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iterations", type=int, default=2000)
+    ap.add_argument("--chunk-size", type=int, default=4096)
+    args = ap.parse_args()
+
+    text = FIXTURE.read_text(encoding="utf-8")
+    chunks = [text[i : i + args.chunk_size] for i in range(0, len(text), args.chunk_size)]
+
+    legacy_us = _time(lambda: legacy_parse(text), args.iterations)
+    print(f"fixture: {len(text)} chars in {len(chunks)} chunks of {args.chunk_size}")
+    print(f"legacy regex (full page, titles only): {legacy_us:8.1f} us/page, {len(legacy_parse(text))} results")
+    for max_results in (3, 5, 10, 30):
+        results, consumed = streaming_parse(chunks, max_results)
+        us = _time(lambda: streaming_parse(chunks, max_results), args.iterations)
+        with_snippets = sum(1 for r in results if r["snippet"])
+        print(
+            f"streaming max_results={max_results:<3} {us:8.1f} us/page, {len(results)} results "
+            f"({with_snippets} with snippets), read {consumed / len(text):.0%} of body"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Benchmark flight-status feed ingest, index refresh and tool lookups.
+
+Run from the python-backend folder:
+
+    python -m benchmarks.bench_flight_status_ingest [--flights 40000] [--days 3]
+
+A synthetic schedule feed (every flight of every day) and a status feed
+(gate/status/estimated times for a third of today's flights) are written as CSV.
+The in-memory index build and lookups always run. With DATABASE_URL set, the
+feeds are also COPY-ingested into a scratch schema (bench_flight_status, dropped
+afterwards) and compared with executemany inserts of one day's schedule.
+"""
+from __future__ import annotations as _annotations
+
+import argparse
+import asyncio
+import csv
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_SCHEMA = "bench_flight_status"
+_AIRPORTS = "ATL DFW DEN ORD LAX JFK LAS MCO MIA CLT SEA PHX EWR SFO IAH BOS FLL MSP LGA DTW".split()
+_STATUSES = ("on time", "delayed", "boarding", "departed", "cancelled")
+
+
+def synthetic_schedule(flights: int, days: int, start: date, seed: int = 0) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    base = []
+    for i in range(flights):
+        origin, destination = rng.sample(_AIRPORTS, 2)
+        base.append((f"{rng.choice(('AA', 'DL', 'UA', 'WN', 'B6'))}{i + 100}", origin, destination,
+                     timedelta(minutes=rng.randrange(5 * 60, 23 * 60, 5)), timedelta(minutes=rng.randrange(60, 360, 5))))
+    rows = []
+    for d in range(days):
+        day = start + timedelta(days=d)
+        midnight = datetime.combine(day, datetime.min.time())
+        for number, origin, destination, dep, duration in base:
+            rows.append({
+                "flight_number": number, "flight_date": day.isoformat(), "origin": origin, "destination": destination,
+                "scheduled_departure": (midnight + dep).isoformat(sep=" "),
+                "scheduled_arrival": (midnight + dep + duration).isoformat(sep=" "),
+                "terminal": str(rng.randint(1, 5)), "status": "scheduled",
+            })
+    return rows
+
+
+def synthetic_status(schedule: list[dict[str, Any]], day: date, share: float, seed: int = 1) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    rows = []
+    for row in schedule:
+        if row["flight_date"] != day.isoformat() or rng.random() >= share:
+            continue
+        dep = datetime.fromisoformat(row["scheduled_departure"]) + timedelta(minutes=rng.choice((0, 0, 0, 15, 40, 90)))
+        rows.append({
+            "flight_number": row["flight_number"], "flight_date": row["flight_date"],
+            "gate": f"{rng.choice('ABCDE')}{rng.randint(1, 40)}", "status": rng.choice(_STATUSES),
+            "estimated_departure": dep.isoformat(sep=" "),
+        })
+    return rows
+
+
+def _write_csv(path: Path, rows: list[dict[str, Any]]) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _bench_index(schedule: list[dict[str, Any]], today: date) -> None:
+    from flight_status import COLUMNS, FlightStatusIndex
+
+    parsed = []
+    for seq, row in enumerate(schedule, start=1):
+        record: dict[str, Any] = {c: None for c in COLUMNS}
+        record.update(row, flight_date=date.fromisoformat(row["flight_date"]))
+        for c in ("scheduled_departure", "scheduled_arrival"):
+            record[c] = datetime.fromisoformat(row[c])
+        parsed.append(tuple(record[c] for c in COLUMNS) + (seq,))
+    index = FlightStatusIndex()
+    t0 = time.perf_counter()
+    index.apply(parsed)
+    build = time.perf_counter() - t0
+    numbers = [r["flight_number"] for r in schedule[:10000]]
+    t0 = time.perf_counter()
+    for number in numbers:
+        index.nearest(number, today)
+    per_lookup = (time.perf_counter() - t0) / len(numbers)
+    assert index.nearest(numbers[0], today) is not None
+    print(f"{'index build':<26} {build * 1000:9.1f} ms ({len(index)} flights)")
+    print(f"{'index lookup (nearest)':<26} {per_lookup * 1e6:9.2f} us")
+    print(f"{'describe':<26} {index.nearest(numbers[0], today).describe()}")
+
+
+async def _bench_db(schedule_path: Path, status_path: Path, schedule: list[dict[str, Any]], today: date) -> None:
+    import asyncpg
+
+    dsn = os.environ["DATABASE_URL"]
+    admin = await asyncpg.connect(dsn)
+    await admin.execute(f"drop schema if exists {_SCHEMA} cascade; create schema {_SCHEMA}")
+    sep = "&" if "?" in dsn else "?"
+    os.environ["DATABASE_URL"] = f"{dsn}{sep}search_path={_SCHEMA}"
+    try:
+        import db
+        import flight_status
+
+        await db.init_schema()
+        t0 = time.perf_counter()
+        written = await flight_status.ingest(schedule_path)
+        elapsed = time.perf_counter() - t0
+        print(f"{'COPY schedule feed':<26} {elapsed * 1000:9.1f} ms ({written} flights, {written / elapsed:,.0f}/s, incl. refresh)")
+
+        flight_status.index = flight_status.FlightStatusIndex()
+        t0 = time.perf_counter()
+        await flight_status.refresh_index()
+        print(f"{'full index load':<26} {(time.perf_counter() - t0) * 1000:9.1f} ms ({len(flight_status.index)} flights)")
+
+        t0 = time.perf_counter()
+        updated = await flight_status.ingest(status_path)
+        print(f"{'COPY status feed':<26} {(time.perf_counter() - t0) * 1000:9.1f} ms ({updated} flights, incl. incremental refresh)")
+        t0 = time.perf_counter()
+        await flight_status.refresh_index()
+        print(f"{'refresh, nothing new':<26} {(time.perf_counter() - t0) * 1000:9.1f} ms")
+
+        one_day = [r for r in schedule if r["flight_date"] == today.isoformat()]
+        await db.execute("truncate flight_status")
+        t0 = time.perf_counter()
+        async with db.acquire() as conn:
+            await conn.executemany(
+                """
+                insert into flight_status (flight_number, flight_date, origin, destination,
+                    scheduled_departure, scheduled_arrival, terminal, status)
+                values ($1, $2, $3, $4, $5, $6, $7, $8)
+                on conflict (flight_number, flight_date) do nothing
+                """,
+                [(r["flight_number"], date.fromisoformat(r["flight_date"]), r["origin"], r["destination"],
+                  datetime.fromisoformat(r["scheduled_departure"]), datetime.fromisoformat(r["scheduled_arrival"]),
+                  r["terminal"], r["status"]) for r in one_day],
+            )
+        elapsed = time.perf_counter() - t0
+        print(f"{'executemany, one day':<26} {elapsed * 1000:9.1f} ms ({len(one_day)} flights, {len(one_day) / elapsed:,.0f}/s)")
+        await db.close_pool()
+    finally:
+        await admin.execute(f"drop schema if exists {_SCHEMA} cascade")
+        await admin.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--flights", type=int, default=40000, help="flights per day")
+    ap.add_argument("--days", type=int, default=3)
+    ap.add_argument("--status-share", type=float, default=0.33, help="share of today's flights in the status feed")
+    args = ap.parse_args()
+
+    today = date.today()
+    schedule = synthetic_schedule(args.flights, args.days, today)
+    status = synthetic_status(schedule, today, args.status_share)
+    with tempfile.TemporaryDirectory() as tmp:
+        schedule_path, status_path = Path(tmp) / "schedule.csv", Path(tmp) / "status.csv"
+        _write_csv(schedule_path, schedule)
+        _write_csv(status_path, status)
+        print(f"{args.flights} flights/day x {args.days} days: schedule feed {schedule_path.stat().st_size / 1e6:.1f} MB, "
+              f"status feed {len(status)} rows")
+        _bench_index(schedule, today)
+        if os.getenv("DATABASE_URL"):
+            asyncio.run(_bench_db(schedule_path, status_path, schedule, today))
+        else:
+            print("DATABASE_URL not set; skipping the COPY ingest")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Benchmark registry reload time with thousands of synthetic agents.
+
+Run from the python-backend folder:
+
+    python -m benchmarks.bench_registry_reload [--agents 3000]
+
+The in-memory build from synthetic rows always runs. When DATABASE_URL is
+set, the synthetic config is also written to a scratch schema
+(bench_registry, dropped afterwards) and the per-agent loading that
+build_dynamic_registry used to do (2N+2 queries) is timed against the
+single-query bulk load. An incremental rebuild after a one-agent change is
+timed against the full in-memory build.
+"""
+from __future__ import annotations as _annotations
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_SCHEMA = "bench_registry"
+
+
+def synthetic_rows(n: int) -> dict[str, list[dict[str, Any]]]:
+    agents = [
+        {
+            "id": i,
+            "name": "Triage Agent" if i == 1 else f"Agent {i}",
+            "model": "gpt-4.1",
+            "handoff_description": f"Synthetic agent {i}",
+            "instruction_type": "text",
+            "instruction_value": "You handle {flight_number} for {confirmation_number}.",
+        }
+        for i in range(1, n + 1)
+    ]
+    tool_links = []
+    guardrail_links = []
+    handoffs = []
+    for a in agents:
+        aid = a["id"]
+        for order, code in enumerate(("faq_lookup_tool", "flight_status_tool", "baggage_tool"), start=1):
+            tool_links.append({
+                "agent_id": aid, "sort_order": order, "code_name": code, "description": code,
+                "tool_name": code, "agent_ref_name": None, "cache_ttl_seconds": 0, "cache_max_entries": 256,
+            })
+        for name, code in (("Relevance Guardrail", "relevance_guardrail"), ("Jailbreak Guardrail", "jailbreak_guardrail")):
+            guardrail_links.append({
+                "agent_id": aid, "name": name, "code_name": code, "model": "gpt-4.1-mini", "instruction_value": None,
+            })
+        if aid != 1:
+            handoffs.append({"source_agent_id": 1, "source_name": "Triage Agent", "target_agent_id": aid,
+                             "target_name": a["name"], "on_handoff_callback": None})
+            handoffs.append({"source_agent_id": aid, "source_name": a["name"], "target_agent_id": 1,
+                             "target_name": "Triage Agent", "on_handoff_callback": None})
+    return {"agents": agents, "tool_links": tool_links, "guardrail_links": guardrail_links, "handoffs": handoffs}
+
+
+async def _populate(conn: Any, rows: dict[str, list[dict[str, Any]]]) -> None:
+    await conn.execute(
+        "insert into tools(name, code_name, description) values"
+        " ('faq_lookup_tool','faq_lookup_tool','faq'),"
+        " ('flight_status_tool','flight_status_tool','status'),"
+        " ('baggage_tool','baggage_tool','bags')"
+    )
+    await conn.execute(
+        "insert into guardrails(name, code_name, model) values"
+        " ('Relevance Guardrail','relevance_guardrail','gpt-4.1-mini'),"
+        " ('Jailbreak Guardrail','jailbreak_guardrail','gpt-4.1-mini')"
+    )
+    await conn.executemany(
+        "insert into agents(id, name, model, handoff_description, instruction_type, instruction_value) values($1,$2,$3,$4,$5,$6)",
+        [(a["id"], a["name"], a["model"], a["handoff_description"], a["instruction_type"], a["instruction_value"]) for a in rows["agents"]],
+    )
+    await conn.executemany(
+        "insert into agent_tools(agent_id, tool_name, sort_order) values($1,$2,$3)",
+        [(t["agent_id"], t["code_name"], t["sort_order"]) for t in rows["tool_links"]],
+    )
+    await conn.executemany(
+        "insert into agent_guardrails(agent_id, guardrail_name) values($1,$2)",
+        [(g["agent_id"], g["name"]) for g in rows["guardrail_links"]],
+    )
+    await conn.executemany(
+        "insert into handoffs(source_agent_id, target_agent_id) values($1,$2)",
+        [(h["source_agent_id"], h["target_agent_id"]) for h in rows["handoffs"]],
+    )
+
+
+async def _legacy_load(fetch: Any) -> None:
+    # The pre-bulk loader: agents, then tools and guardrails per agent, then handoffs
+    agents = await fetch("select id, name, model, handoff_description, instruction_type, instruction_value from agents order by id")
+    for a in agents:
+        await fetch(
+            "select t.code_name, t.description, t.agent_ref_name from agent_tools at"
+            " join tools t on t.name = at.tool_name where at.agent_id = $1 order by at.sort_order",
+            a["id"],
+        )
+        await fetch(
+            "select g.name, g.code_name, g.model, g.instruction_value from agent_guardrails ag"
+            " join guardrails g on g.name = ag.guardrail_name where ag.agent_id = $1 order by g.name",
+            a["id"],
+        )
+    await fetch(
+        "select h.source_agent_id, s.name, h.target_agent_id, t.name, h.on_handoff_callback from handoffs h"
+        " join agents s on s.id = h.source_agent_id join agents t on t.id = h.target_agent_id"
+    )
+
+
+async def _bench_db(rows: dict[str, list[dict[str, Any]]], repeat: int) -> None:
+    import asyncpg
+
+    dsn = os.environ["DATABASE_URL"]
+    admin = await asyncpg.connect(dsn)
+    await admin.execute(f"drop schema if exists {_SCHEMA} cascade; create schema {_SCHEMA}")
+    sep = "&" if "?" in dsn else "?"
+    os.environ["DATABASE_URL"] = f"{dsn}{sep}search_path={_SCHEMA}"
+    try:
+        import db
+        from loader import build_registry_from_rows, load_config_rows
+
+        await db.init_schema()
+        pool = await db.get_pool()
+        async with pool.acquire() as conn:
+            await _populate(conn, rows)
+
+        for label, fn in (("legacy per-agent load", lambda: _legacy_load(db.fetch)), ("bulk load", load_config_rows)):
+            best = float("inf")
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                await fn()
+                best = min(best, time.perf_counter() - t0)
+            print(f"{label:<28} {best * 1000:9.1f} ms")
+
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            build_registry_from_rows(await load_config_rows())
+            best = min(best, time.perf_counter() - t0)
+        print(f"{'full reload (load + build)':<28} {best * 1000:9.1f} ms")
+        await db.close_pool()
+    finally:
+        await admin.execute(f"drop schema if exists {_SCHEMA} cascade")
+        await admin.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--agents", type=int, default=3000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    from loader import build_registry_from_rows
+
+    rows = synthetic_rows(args.agents)
+    print(f"{args.agents} agents, {len(rows['tool_links'])} tool links, "
+          f"{len(rows['guardrail_links'])} guardrail links, {len(rows['handoffs'])} handoffs")
+    best = float("inf")
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        build_registry_from_rows(rows)
+        best = min(best, time.perf_counter() - t0)
+    print(f"{'in-memory build':<28} {best * 1000:9.1f} ms")
+
+    # Incremental rebuild after one agent's instructions change (plus its handoff sources)
+    from loader import _changed_agents, _with_dependents
+
+    previous = build_registry_from_rows(rows, version=1)
+    changed_rows = dict(rows, agents=[dict(a) for a in rows["agents"]])
+    changed_rows["agents"][-1]["instruction_value"] = "Changed instructions."
+    changed = _changed_agents([{"entity": "agent", "name": changed_rows["agents"][-1]["name"]}], (previous.rows, changed_rows))
+    rebuild = _with_dependents(changed or set(), (previous.rows, changed_rows))
+    best = float("inf")
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        build_registry_from_rows(changed_rows, previous=previous, rebuild=rebuild, version=2)
+        best = min(best, time.perf_counter() - t0)
+    print(f"{f'incremental ({len(rebuild)} agents)':<28} {best * 1000:9.1f} ms")
+
+    if os.getenv("DATABASE_URL"):
+        asyncio.run(_bench_db(rows, args.repeat))
+    else:
+        print("DATABASE_URL not set; skipping database load comparison")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark seat holds/assignments under concurrent booking load.
+
+Run from the python-backend folder:
+
+    python -m benchmarks.bench_seat_inventory [--flights 50] [--customers 5000]
+
+Every customer holds a random seat on a random flight, then assigns it, retrying
+another seat on conflict, all as concurrent asyncio tasks. Flights are created in
+memory (no Postgres): an assign's write-through claim goes to an in-memory
+table that accepts every write, and the batched write of released seats is not
+part of the measurement. At the end each flight is checked for double bookings
+and the occupancy snapshot size is compared with a JSON list of occupied seats.
+"""
+from __future__ import annotations as _annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Optional
+
+import seat_inventory
+from seat_inventory import FlightSeats, SeatInventory
+
+
+async def _customer(inv: SeatInventory, rng: random.Random, flight: str, holder: str, conflicts: list[int]) -> bool:
+    labels = inv.layout.labels
+    for _ in range(20):
+        seat = rng.choice(labels)
+        if not await inv.hold(flight, seat, holder):
+            conflicts[0] += 1
+            continue
+        # Customer confirms with the agent a moment later
+        await asyncio.sleep(0)
+        if await inv.assign(flight, seat, holder):
+            return True
+        conflicts[0] += 1
+    return False
+
+
+async def _accept_all(batch: dict[tuple[str, str], tuple[Optional[str], Optional[str]]]) -> set[tuple[str, str]]:
+    # Stands in for the Postgres round trip; with one process every conditional write succeeds
+    await asyncio.sleep(0)
+    return set(batch)
+
+
+async def _run(flights: int, customers: int, seed: int) -> None:
+    seat_inventory.DEMO_OCCUPANCY = False
+    inv = SeatInventory()
+    inv._write = _accept_all  # type: ignore[method-assign]
+    names = [f"FLT-{100 + i}" for i in range(flights)]
+    for name in names:
+        inv._flights[name] = FlightSeats(name, inv.layout)
+    rng = random.Random(seed)
+    conflicts = [0]
+    jobs = [(rng.choice(names), f"C{i:06d}") for i in range(customers)]
+
+    started = time.perf_counter()
+    booked = await asyncio.gather(*(_customer(inv, rng, f, h, conflicts) for f, h in jobs))
+    elapsed = time.perf_counter() - started
+
+    seated = 0
+    for name in names:
+        fs = inv._flights[name]
+        owners = [h for h in fs.owner.values() if h]
+        assert len(owners) == len(set(owners)), f"{name}: customer seated twice"
+        assert fs.assigned.bit_count() == len(fs.owner), f"{name}: bitmap and owners disagree"
+        assert all(fs.seat_of[h] == i for i, h in fs.owner.items()), f"{name}: seat index out of sync"
+        seated += len(owners)
+    assert seated == sum(booked)
+
+    ops = customers * 2 + conflicts[0]
+    fs = inv._flights[names[0]]
+    snapshot = json.dumps(fs.snapshot(), separators=(",", ":"))
+    listing = json.dumps([fs.layout.labels[i] for i in fs.owner])
+    print(f"{customers} customers over {flights} flights of {inv.layout.size} seats")
+    print(f"{'seated':<22} {seated:9d} ({customers - seated} gave up after 20 tries)")
+    print(f"{'conflicts':<22} {conflicts[0]:9d}")
+    print(f"{'throughput':<22} {ops / elapsed:9.0f} ops/s ({elapsed * 1e6 / ops:.1f} us/op incl. task switches)")
+    print(f"{'pending writes':<22} {len(inv._dirty):9d} released seats for one flush")
+    print(f"{'snapshot':<22} {len(snapshot):9d} bytes (JSON seat list: {len(listing)} bytes)")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--flights", type=int, default=50)
+    ap.add_argument("--customers", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    asyncio.run(_run(args.flights, args.customers, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Benchmark worker startup: import-time breakdown and time to first request.
+
+Run from the python-backend folder:
+
+    python -m benchmarks.bench_startup [--mode warm|cold] [--budget-ms 4000]
+
+Each measurement runs in a fresh interpreter. `warm` starts from a registry
+snapshot of synthetic agents and needs no database (the background reconcile
+just keeps retrying); `cold` runs the full DB startup path and needs
+DATABASE_URL. The script exits non-zero when the median time to first request
+exceeds the budget, so CI can run it as the startup regression check.
+"""
+from __future__ import annotations as _annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+_CHILD = r"""
+import time
+t0 = time.perf_counter()
+import logging
+import api
+t_import = time.perf_counter()
+logging.disable(logging.CRITICAL)
+from fastapi.testclient import TestClient
+with TestClient(api.app) as client:
+    t_startup = time.perf_counter()
+    resp = client.get("/admin/metrics")
+    t_first = time.perf_counter()
+    assert resp.status_code == 200, resp.status_code
+import json
+print(json.dumps({
+    "import_ms": (t_import - t0) * 1000,
+    "startup_ms": (t_startup - t_import) * 1000,
+    "first_request_ms": (t_first - t0) * 1000,
+}))
+"""
+
+
+def import_breakdown(env: dict[str, str], top: int) -> list[tuple[int, int, str]]:
+    """(cumulative us, depth, module) for the slowest imports under `import api`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(cumulative), depth, name.strip()))
+    # Direct dependencies of the app are the actionable ones
+    shallow = [r for r in rows if r[1] <= 2]
+    return sorted(shallow, reverse=True)[:top]
+
+
+def time_to_first_request(env: dict[str, str]) -> dict[str, float]:
+    proc = subprocess.run(
+        [sys.executable, "-c", _CHILD],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"startup child failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mode", choices=("warm", "cold"), default="warm")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--agents", type=int, default=50)
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "4000")))
+    args = ap.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=str(BACKEND_DIR))
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.mode == "warm":
+            from benchmarks.bench_registry_reload import synthetic_rows
+            from registry_snapshot import write_snapshot
+
+            snapshot = Path(tmp) / "registry_snapshot.json"
+            write_snapshot(synthetic_rows(args.agents), 1, snapshot)
+            env["REGISTRY_SNAPSHOT_PATH"] = str(snapshot)
+            env.pop("DATABASE_URL", None)
+        else:
+            if not env.get("DATABASE_URL"):
+                sys.exit("--mode cold needs DATABASE_URL")
+            env["REGISTRY_SNAPSHOT_ENABLED"] = "false"
+
+        print("slowest imports under `import api` (cumulative):")
+        for cumulative, depth, name in import_breakdown(env, args.top):
+            print(f"  {cumulative / 1000:8.1f} ms  {'  ' * depth}{name}")
+
+        runs = [time_to_first_request(env) for _ in range(args.runs)]
+
+    for key in ("import_ms", "startup_ms", "first_request_ms"):
+        values = [r[key] for r in runs]
+        print(f"{key:<18} median {statistics.median(values):8.1f} ms   max {max(values):8.1f} ms")
+    median_first = statistics.median(r["first_request_ms"] for r in runs)
+    if median_first > args.budget_ms:
+        print(f"FAIL: time to first request {median_first:.0f} ms exceeds budget {args.budget_ms:.0f} ms")
+        sys.exit(1)
+    print(f"OK: time to first request {median_first:.0f} ms within budget {args.budget_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from __future__ import annotations as _annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Optional
+
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class ChatSession:
+    """One /ws/chat connection; frames are JSON objects with a "type" key."""
+
+    def __init__(self, websocket: Any, conversation_id: str) -> None:
+        self.websocket = websocket
+        self.conversation_id = conversation_id
+        self.last_seen = time.monotonic()
+        self.closed = False
+        # Registry version whose agent list the client has; resent when it changes
+        self.registry_version = 0
+        # Flight in the conversation context; seat_map frames for it are pushed here
+        self.flight_number: Optional[str] = None
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, frame: dict[str, Any]) -> bool:
+        """Send one frame; False once the connection is gone (a dead client is not an error here)."""
+        if self.closed:
+            return False
+        async with self._send_lock:
+            try:
+                await self.websocket.send_json(frame)
+            except Exception:
+                self.closed = True
+                return False
+        metrics.inc("ws_frames_sent_total", type=frame.get("type", ""))
+        return True
+
+
+_sessions: dict[str, set[ChatSession]] = {}
+
+
+def register(session: ChatSession) -> None:
+    _sessions.setdefault(session.conversation_id, set()).add(session)
+    metrics.set_gauge("ws_sessions", sum(len(s) for s in _sessions.values()))
+
+
+def unregister(session: ChatSession) -> None:
+    session.closed = True
+    sessions = _sessions.get(session.conversation_id)
+    if sessions is not None:
+        sessions.discard(session)
+        if not sessions:
+            del _sessions[session.conversation_id]
+    metrics.set_gauge("ws_sessions", sum(len(s) for s in _sessions.values()))
+
+
+async def push(conversation_id: str, frame: dict[str, Any]) -> int:
+    """Send a server-initiated frame to every live connection of a conversation.
+
+    Returns how many connections received it (0 when the client is not connected).
+    """
+    delivered = 0
+    for session in list(_sessions.get(conversation_id, ())):
+        if await session.send(frame):
+            delivered += 1
+    return delivered
+
+
+async def push_flight(flight_number: str, frame: dict[str, Any]) -> int:
+    """Send a frame to every live connection whose conversation is about this flight."""
+    delivered = 0
+    for sessions in list(_sessions.values()):
+        for session in list(sessions):
+            if session.flight_number == flight_number and await session.send(frame):
+                delivered += 1
+    return delivered
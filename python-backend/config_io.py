@@ -0,0 +1,294 @@
+from __future__ import annotations as _annotations
+
+import json
+import time
+from typing import Any, Optional
+
+import asyncpg
+from pydantic import BaseModel, Field
+
+import metrics
+from db import acquire, fetchrow, record_config_change
+
+
+# Bump when the document layout changes incompatibly
+CONFIG_FORMAT = 1
+
+
+class AgentConfig(BaseModel):
+    name: str
+    model: str
+    handoff_description: Optional[str] = None
+    instruction_type: str = Field(default="text", pattern="^(text|provider)$")
+    instruction_value: str
+    is_triage: bool = False
+
+
+class ToolConfig(BaseModel):
+    name: str
+    code_name: str
+    description: Optional[str] = None
+    test_arguments: Optional[dict[str, Any]] = None
+    agent_ref_name: Optional[str] = None
+    cache_ttl_seconds: float = 0
+    cache_max_entries: int = 256
+
+
+class GuardrailConfig(BaseModel):
+    name: str
+    code_name: str
+    model: Optional[str] = None
+    instruction_value: Optional[str] = None
+
+
+class AgentToolConfig(BaseModel):
+    agent: str
+    tool_name: str
+    sort_order: int = 0
+
+
+class AgentGuardrailConfig(BaseModel):
+    agent: str
+    guardrail_name: str
+
+
+class HandoffConfig(BaseModel):
+    source: str
+    target: str
+    on_handoff_callback: Optional[str] = None
+
+
+class AppContextConfig(BaseModel):
+    triage_name: str
+    defaults: dict[str, Any] = Field(default_factory=dict)
+
+
+class ConfigDocument(BaseModel):
+    """The whole agent configuration, keyed by names so it moves between databases."""
+    format: int = CONFIG_FORMAT
+    version: Optional[int] = None
+    agents: list[AgentConfig] = Field(default_factory=list)
+    tools: list[ToolConfig] = Field(default_factory=list)
+    guardrails: list[GuardrailConfig] = Field(default_factory=list)
+    agent_tools: list[AgentToolConfig] = Field(default_factory=list)
+    agent_guardrails: list[AgentGuardrailConfig] = Field(default_factory=list)
+    handoffs: list[HandoffConfig] = Field(default_factory=list)
+    app_contexts: list[AppContextConfig] = Field(default_factory=list)
+
+
+class ConfigImportError(ValueError):
+    pass
+
+
+_EXPORT_SQL = """
+select
+    (select coalesce(max(id), 0) from config_changes) as version,
+    (select coalesce(jsonb_agg(x order by x.id), '[]'::jsonb) from (
+        select id, name, model, handoff_description, instruction_type, instruction_value, is_triage from agents
+    ) x) as agents,
+    (select coalesce(jsonb_agg(x order by x.name), '[]'::jsonb) from (
+        select name, code_name, description, test_arguments, agent_ref_name, cache_ttl_seconds, cache_max_entries from tools
+    ) x) as tools,
+    (select coalesce(jsonb_agg(x order by x.name), '[]'::jsonb) from (
+        select name, code_name, model, instruction_value from guardrails
+    ) x) as guardrails,
+    (select coalesce(jsonb_agg(x order by x.agent, x.sort_order, x.tool_name), '[]'::jsonb) from (
+        select a.name as agent, at.tool_name, at.sort_order
+        from agent_tools at join agents a on a.id = at.agent_id
+    ) x) as agent_tools,
+    (select coalesce(jsonb_agg(x order by x.agent, x.guardrail_name), '[]'::jsonb) from (
+        select a.name as agent, ag.guardrail_name
+        from agent_guardrails ag join agents a on a.id = ag.agent_id
+    ) x) as agent_guardrails,
+    (select coalesce(jsonb_agg(x order by x.source, x.target), '[]'::jsonb) from (
+        select s.name as source, t.name as target, h.on_handoff_callback
+        from handoffs h
+        join agents s on s.id = h.source_agent_id
+        join agents t on t.id = h.target_agent_id
+    ) x) as handoffs,
+    (select coalesce(jsonb_agg(x order by x.triage_name), '[]'::jsonb) from (
+        select triage_name, defaults from app_contexts
+    ) x) as app_contexts
+"""
+
+
+def _json_value(raw: Any) -> Any:
+    return json.loads(raw) if isinstance(raw, str) else raw
+
+
+def _json_object(raw: Any) -> Optional[dict[str, Any]]:
+    # test_arguments is stored as JSON text; tolerate junk from manual edits
+    try:
+        value = _json_value(raw)
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+async def export_config() -> ConfigDocument:
+    row = await fetchrow(_EXPORT_SQL, label="config_export")
+    if row is None:
+        return ConfigDocument()
+    tools = _json_value(row["tools"])
+    for t in tools:
+        t["test_arguments"] = _json_object(t.get("test_arguments"))
+    contexts = _json_value(row["app_contexts"])
+    for c in contexts:
+        c["defaults"] = _json_object(c.get("defaults")) or {}
+    return ConfigDocument(
+        version=int(row["version"]),
+        agents=_json_value(row["agents"]),
+        tools=tools,
+        guardrails=_json_value(row["guardrails"]),
+        agent_tools=_json_value(row["agent_tools"]),
+        agent_guardrails=_json_value(row["agent_guardrails"]),
+        handoffs=_json_value(row["handoffs"]),
+        app_contexts=contexts,
+    )
+
+
+# Staging tables the document is COPYed into; dropped at commit
+_STAGING_DDL = """
+create temp table import_agents (
+    name text, model text, handoff_description text, instruction_type text, instruction_value text, is_triage boolean
+) on commit drop;
+create temp table import_tools (
+    name text, code_name text, description text, test_arguments text, agent_ref_name text,
+    cache_ttl_seconds double precision, cache_max_entries integer
+) on commit drop;
+create temp table import_guardrails (name text, code_name text, model text, instruction_value text) on commit drop;
+create temp table import_agent_tools (agent text, tool_name text, sort_order integer) on commit drop;
+create temp table import_agent_guardrails (agent text, guardrail_name text) on commit drop;
+create temp table import_handoffs (source text, target text, on_handoff_callback text) on commit drop;
+create temp table import_app_contexts (triage_name text, defaults text) on commit drop;
+"""
+
+_REPLACE_SQL = """
+delete from handoffs;
+delete from agent_tools;
+delete from agent_guardrails;
+delete from agents;
+delete from tools;
+delete from guardrails;
+delete from app_contexts;
+"""
+
+# Links name agents that must exist once the agents are upserted
+_DANGLING_SQL = """
+select 'agent_tools' as kind, s.agent as name from import_agent_tools s
+    left join agents a on a.name = s.agent where a.id is null
+union all
+select 'agent_guardrails', s.agent from import_agent_guardrails s
+    left join agents a on a.name = s.agent where a.id is null
+union all
+select 'handoffs', s.source from import_handoffs s
+    left join agents a on a.name = s.source where a.id is null
+union all
+select 'handoffs', s.target from import_handoffs s
+    left join agents a on a.name = s.target where a.id is null
+limit 10
+"""
+
+_UPSERT_SQL = (
+    """
+    insert into tools(name, code_name, description, test_arguments, agent_ref_name, cache_ttl_seconds, cache_max_entries)
+    select name, code_name, description, test_arguments, agent_ref_name, cache_ttl_seconds, cache_max_entries from import_tools
+    on conflict (name) do update set
+        code_name=excluded.code_name, description=excluded.description, test_arguments=excluded.test_arguments,
+        agent_ref_name=excluded.agent_ref_name, cache_ttl_seconds=excluded.cache_ttl_seconds,
+        cache_max_entries=excluded.cache_max_entries
+    """,
+    """
+    insert into guardrails(name, code_name, model, instruction_value)
+    select name, code_name, model, instruction_value from import_guardrails
+    on conflict (name) do update set
+        code_name=excluded.code_name, model=excluded.model, instruction_value=excluded.instruction_value
+    """,
+    """
+    insert into agents(name, model, handoff_description, instruction_type, instruction_value, is_triage)
+    select name, model, handoff_description, instruction_type, instruction_value, is_triage from import_agents
+    on conflict (name) do update set
+        model=excluded.model, handoff_description=excluded.handoff_description,
+        instruction_type=excluded.instruction_type, instruction_value=excluded.instruction_value,
+        is_triage=excluded.is_triage
+    """,
+    """
+    insert into agent_tools(agent_id, tool_name, sort_order)
+    select a.id, s.tool_name, s.sort_order from import_agent_tools s join agents a on a.name = s.agent
+    on conflict (agent_id, tool_name) do update set sort_order=excluded.sort_order
+    """,
+    """
+    insert into agent_guardrails(agent_id, guardrail_name)
+    select a.id, s.guardrail_name from import_agent_guardrails s join agents a on a.name = s.agent
+    on conflict do nothing
+    """,
+    """
+    insert into handoffs(source_agent_id, target_agent_id, on_handoff_callback)
+    select src.id, tgt.id, s.on_handoff_callback from import_handoffs s
+    join agents src on src.name = s.source
+    join agents tgt on tgt.name = s.target
+    on conflict (source_agent_id, target_agent_id) do update set on_handoff_callback=excluded.on_handoff_callback
+    """,
+    """
+    insert into app_contexts(triage_name, defaults)
+    select triage_name, defaults::jsonb from import_app_contexts
+    on conflict (triage_name) do update set defaults=excluded.defaults
+    """,
+)
+
+
+def _staging_records(doc: ConfigDocument) -> list[tuple[str, list[str], list[tuple[Any, ...]]]]:
+    return [
+        ("import_agents", ["name", "model", "handoff_description", "instruction_type", "instruction_value", "is_triage"],
+         [(a.name, a.model, a.handoff_description, a.instruction_type, a.instruction_value, a.is_triage) for a in doc.agents]),
+        ("import_tools", ["name", "code_name", "description", "test_arguments", "agent_ref_name", "cache_ttl_seconds", "cache_max_entries"],
+         [(t.name, t.code_name, t.description,
+           json.dumps(t.test_arguments) if t.test_arguments is not None else None,
+           t.agent_ref_name or None, float(t.cache_ttl_seconds), int(t.cache_max_entries)) for t in doc.tools]),
+        ("import_guardrails", ["name", "code_name", "model", "instruction_value"],
+         [(g.name, g.code_name, g.model, g.instruction_value) for g in doc.guardrails]),
+        ("import_agent_tools", ["agent", "tool_name", "sort_order"],
+         [(l.agent, l.tool_name, l.sort_order) for l in doc.agent_tools]),
+        ("import_agent_guardrails", ["agent", "guardrail_name"],
+         [(l.agent, l.guardrail_name) for l in doc.agent_guardrails]),
+        ("import_handoffs", ["source", "target", "on_handoff_callback"],
+         [(h.source, h.target, h.on_handoff_callback) for h in doc.handoffs]),
+        ("import_app_contexts", ["triage_name", "defaults"],
+         [(c.triage_name, json.dumps(c.defaults)) for c in doc.app_contexts]),
+    ]
+
+
+async def import_config(doc: ConfigDocument, replace: bool = False) -> dict[str, int]:
+    """Upsert a config document (or replace the whole config) in one transaction.
+
+    Rows are COPYed into temp staging tables and merged with one statement per
+    table; a single config change is logged, so workers rebuild once.
+    """
+    if doc.format != CONFIG_FORMAT:
+        raise ConfigImportError(f"Unsupported config format {doc.format}; expected {CONFIG_FORMAT}")
+    started = time.perf_counter()
+    staged = _staging_records(doc)
+    async with acquire() as conn:
+        try:
+            async with conn.transaction():
+                await conn.execute(_STAGING_DDL)
+                for table, columns, records in staged:
+                    if records:
+                        await conn.copy_records_to_table(table, records=records, columns=columns)
+                if replace:
+                    await conn.execute(_REPLACE_SQL)
+                await conn.execute(_UPSERT_SQL[0])
+                await conn.execute(_UPSERT_SQL[1])
+                await conn.execute(_UPSERT_SQL[2])
+                dangling = await conn.fetch(_DANGLING_SQL)
+                if dangling:
+                    names = ", ".join(sorted({f"{r['kind']}: {r['name']}" for r in dangling}))
+                    raise ConfigImportError(f"Links reference unknown agents ({names})")
+                for sql in _UPSERT_SQL[3:]:
+                    await conn.execute(sql)
+                # One change for the whole import; every worker does a single full rebuild
+                await record_config_change("agent", conn=conn)
+        except asyncpg.PostgresError as e:
+            raise ConfigImportError(str(e)) from e
+    metrics.observe("config_import_seconds", time.perf_counter() - started)
+    return {table.removeprefix("import_"): len(records) for table, _, records in staged}
@@ -0,0 +1,87 @@
+from __future__ import annotations as _annotations
+
+from typing import Any
+
+import msgpack
+import zstandard
+
+from domain import CONTEXT_CLASS
+from settings import env_int
+
+
+# Encoded states at least this large are zstd-compressed; 0 disables compression
+ZSTD_MIN_BYTES = env_int("CONVERSATION_ZSTD_MIN_BYTES", 512)
+ZSTD_LEVEL = env_int("CONVERSATION_ZSTD_LEVEL", 3)
+
+# First byte of every encoded state: format version, plus the compression flag
+CODEC_FORMAT = 1
+_ZSTD_FLAG = 0x80
+
+# Keys of Responses input items (and of our own state), sent as their index in
+# this table instead of the string. Append only: the index is what is stored.
+KEY_TABLE: tuple[str, ...] = (
+    "role", "content", "type", "id", "status", "text", "annotations", "logprobs",
+    "call_id", "name", "arguments", "output", "action", "query", "sources", "url",
+    "summary", "encrypted_content", "refusal", "results", "queries", "title",
+    "start_index", "end_index", "file_id", "filename", "provider_data",
+)
+_KEY_INDEX = {key: idx for idx, key in enumerate(KEY_TABLE)}
+
+_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+_decompressor = zstandard.ZstdDecompressor()
+
+
+def _pack_keys(value: Any) -> Any:
+    # Input items are JSON-shaped, so every genuine key is a string and int keys are unambiguous
+    if isinstance(value, dict):
+        return {_KEY_INDEX.get(k, k): _pack_keys(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_pack_keys(v) for v in value]
+    return value
+
+
+def _unpack_keys(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {(KEY_TABLE[k] if isinstance(k, int) else k): _unpack_keys(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_unpack_keys(v) for v in value]
+    return value
+
+
+def _default(obj: Any) -> Any:
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    return str(obj)
+
+
+def encode_state(state: dict[str, Any]) -> bytes:
+    """Pack a conversation state ({input_items, context, current_agent}) into bytes."""
+    body = msgpack.packb(
+        [
+            state["current_agent"],
+            state["context"].model_dump(mode="json"),
+            _pack_keys(state["input_items"]),
+        ],
+        default=_default,
+        use_bin_type=True,
+    )
+    if ZSTD_MIN_BYTES and len(body) >= ZSTD_MIN_BYTES:
+        return bytes((CODEC_FORMAT | _ZSTD_FLAG,)) + _compressor.compress(body)
+    return bytes((CODEC_FORMAT,)) + body
+
+
+def decode_state(blob: bytes) -> dict[str, Any]:
+    """Inverse of encode_state; the context comes back as a CONTEXT_CLASS instance."""
+    header, body = blob[0], memoryview(blob)[1:]
+    if header & ~_ZSTD_FLAG != CODEC_FORMAT:
+        raise ValueError(f"Unsupported conversation state format {header & ~_ZSTD_FLAG}")
+    if header & _ZSTD_FLAG:
+        body = memoryview(_decompressor.decompress(body))
+    current_agent, context, input_items = msgpack.unpackb(body, raw=False, strict_map_key=False)
+    return {
+        "input_items": _unpack_keys(input_items),
+        "context": CONTEXT_CLASS(**context),
+        "current_agent": current_agent,
+    }
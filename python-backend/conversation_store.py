@@ -0,0 +1,245 @@
+from __future__ import annotations as _annotations
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import IO, Any, Dict, Optional
+
+import metrics
+from conversation_codec import decode_state, encode_state
+from settings import env_float
+
+
+logger = logging.getLogger(__name__)
+
+
+# Conversations untouched this long move from memory to the segment file; 0 keeps everything in memory
+IDLE_SECONDS = env_float("CONVERSATION_IDLE_SECONDS", 300.0)
+# Conversations untouched this long are dropped from both tiers; 0 keeps them forever
+TTL_SECONDS = env_float("CONVERSATION_TTL_SECONDS", 86400.0)
+SWEEP_INTERVAL = env_float("CONVERSATION_SWEEP_INTERVAL", 30.0)
+# Compact once garbage exceeds both this and the live bytes in the segment file
+COMPACT_MIN_BYTES = int(env_float("CONVERSATION_COMPACT_MIN_BYTES", 8 * 1024 * 1024))
+SPILL_DIR = Path(os.getenv(
+    "CONVERSATION_SPILL_DIR",
+    str(Path(__file__).resolve().parent / ".cache" / "conversations"),
+))
+
+
+def _pwrite_all(fd: int, data: bytes, offset: int) -> None:
+    # A short write would leave index entries pointing at bytes that were never written
+    written = os.pwrite(fd, data, offset)
+    if written != len(data):
+        raise OSError(f"short write: {written} of {len(data)} bytes at offset {offset}")
+
+
+class ConversationStore:
+    async def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    def save(self, conversation_id: str, state: Dict[str, Any]):
+        pass
+
+
+class TieredConversationStore(ConversationStore):
+    """Hot conversations in memory; idle ones in a local append-only segment file.
+
+    The segment file is anonymous (unlinked on creation), so it never outlives the
+    process; only the in-memory index of (offset, length) finds records in it. A
+    periodic sweep expires old conversations, spills idle ones in one batched
+    write and compacts the file once most of it is garbage. get() rehydrates a
+    spilled conversation with a single pread in a worker thread and moves it back
+    to memory.
+    """
+
+    def __init__(
+        self,
+        idle_seconds: float = IDLE_SECONDS,
+        ttl_seconds: float = TTL_SECONDS,
+        directory: Path = SPILL_DIR,
+    ) -> None:
+        self.idle_seconds = idle_seconds
+        self.ttl_seconds = ttl_seconds
+        self.directory = directory
+        self._hot: Dict[str, bytes] = {}
+        self._cold: Dict[str, tuple[int, int]] = {}
+        self._touched: Dict[str, float] = {}
+        self._file: Optional[IO[bytes]] = None
+        self._end = 0
+        self._cold_bytes = 0
+        self._sweeper: Optional[asyncio.Task[None]] = None
+
+    def _segment(self) -> IO[bytes]:
+        if self._file is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._file = tempfile.TemporaryFile(dir=self.directory, prefix="conversations-", suffix=".seg")
+            self._end = 0
+        return self._file
+
+    def _drop_cold(self, conversation_id: str) -> None:
+        loc = self._cold.pop(conversation_id, None)
+        if loc is not None:
+            self._cold_bytes -= loc[1]
+
+    async def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        blob = self._hot.get(conversation_id)
+        if blob is None:
+            loc = self._cold.get(conversation_id)
+            if loc is None:
+                return None
+            blob = await self._read_cold(*loc)
+            current = self._hot.get(conversation_id)
+            if current is not None:
+                # Saved while the read was in flight: the memory copy wins
+                blob = current
+            elif conversation_id not in self._cold:
+                # Deleted or expired while the read was in flight
+                return None
+            else:
+                # Back to the hot tier; the segment copy becomes garbage for the next compaction
+                self._drop_cold(conversation_id)
+                self._hot[conversation_id] = blob
+                metrics.inc("conversation_rehydrations_total")
+        self._touched[conversation_id] = time.monotonic()
+        return decode_state(blob)
+
+    async def _read_cold(self, offset: int, length: int) -> bytes:
+        # The read runs off the event loop; it gets its own descriptor so a compaction
+        # swapping and closing the segment meanwhile cannot pull the file from under it
+        fd = os.dup(self._segment().fileno())
+
+        def _read() -> bytes:
+            try:
+                return os.pread(fd, length, offset)
+            finally:
+                os.close(fd)
+
+        return await asyncio.to_thread(_read)
+
+    def save(self, conversation_id: str, state: Dict[str, Any]):
+        self._hot[conversation_id] = encode_state(state)
+        self._drop_cold(conversation_id)
+        self._touched[conversation_id] = time.monotonic()
+
+    def delete(self, conversation_id: str) -> None:
+        self._hot.pop(conversation_id, None)
+        self._drop_cold(conversation_id)
+        self._touched.pop(conversation_id, None)
+
+    def __len__(self) -> int:
+        return len(self._hot) + len(self._cold)
+
+    @property
+    def garbage_bytes(self) -> int:
+        return self._end - self._cold_bytes
+
+    async def sweep(self) -> None:
+        now = time.monotonic()
+        if self.ttl_seconds > 0:
+            expired = [cid for cid, t in self._touched.items() if now - t >= self.ttl_seconds]
+            for cid in expired:
+                self.delete(cid)
+            if expired:
+                metrics.inc("conversation_expired_total", len(expired))
+        if self.idle_seconds > 0:
+            idle = [(cid, blob) for cid, blob in self._hot.items() if now - self._touched.get(cid, 0.0) >= self.idle_seconds]
+            if idle:
+                await self._spill(idle)
+        if self.garbage_bytes > max(COMPACT_MIN_BYTES, self._cold_bytes):
+            await self._compact()
+        self._publish()
+
+    async def _spill(self, batch: list[tuple[str, bytes]]) -> None:
+        fd = self._segment().fileno()
+        offset = self._end
+        data = b"".join(blob for _, blob in batch)
+        # Reserve the range first; a failed write just leaves it as garbage
+        self._end += len(data)
+        try:
+            await asyncio.to_thread(_pwrite_all, fd, data, offset)
+        except OSError:
+            logger.warning("Could not spill %d conversations to %s", len(batch), self.directory, exc_info=True)
+            return
+        for cid, blob in batch:
+            # Saved or deleted while the write was in flight: the memory copy wins
+            if self._hot.get(cid) is blob:
+                del self._hot[cid]
+                self._cold[cid] = (offset, len(blob))
+                self._cold_bytes += len(blob)
+            offset += len(blob)
+        metrics.inc("conversation_spills_total", len(batch))
+
+    async def _compact(self) -> None:
+        old = self._segment()
+        snapshot = dict(self._cold)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        new = tempfile.TemporaryFile(dir=self.directory, prefix="conversations-", suffix=".seg")
+
+        def _copy() -> tuple[Dict[str, tuple[int, int]], int]:
+            locations: Dict[str, tuple[int, int]] = {}
+            end = 0
+            chunk: list[bytes] = []
+            chunk_start = 0
+            for cid, (offset, length) in sorted(snapshot.items(), key=lambda kv: kv[1][0]):
+                chunk.append(os.pread(old.fileno(), length, offset))
+                locations[cid] = (end, length)
+                end += length
+                if end - chunk_start >= 1 << 20:
+                    _pwrite_all(new.fileno(), b"".join(chunk), chunk_start)
+                    chunk, chunk_start = [], end
+            if chunk:
+                _pwrite_all(new.fileno(), b"".join(chunk), chunk_start)
+            return locations, end
+
+        started = time.perf_counter()
+        try:
+            locations, end = await asyncio.to_thread(_copy)
+        except OSError:
+            new.close()
+            logger.warning("Conversation segment compaction failed", exc_info=True)
+            return
+        reclaimed = self._end - end
+        # The sweep is the only writer, so the cold index can only have shrunk meanwhile
+        self._cold = {cid: locations[cid] for cid in self._cold if cid in locations}
+        self._cold_bytes = sum(length for _, length in self._cold.values())
+        self._file, self._end = new, end
+        old.close()
+        metrics.inc("conversation_compactions_total")
+        metrics.observe("conversation_compaction_seconds", time.perf_counter() - started)
+        logger.info("Compacted conversation segment: %d records, %d bytes reclaimed", len(self._cold), reclaimed)
+
+    def _publish(self) -> None:
+        metrics.set_gauge("conversation_store_size", len(self._hot), tier="hot")
+        metrics.set_gauge("conversation_store_size", len(self._cold), tier="cold")
+        metrics.set_gauge("conversation_store_bytes", sum(len(b) for b in self._hot.values()), tier="hot")
+        metrics.set_gauge("conversation_store_bytes", self._cold_bytes, tier="cold")
+        metrics.set_gauge("conversation_segment_garbage_bytes", self.garbage_bytes)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Conversation store sweep failed")
+
+    def start(self) -> None:
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+        if self._file is not None:
+            # Spilled conversations die with the process, like the in-memory ones
+            self._file.close()
+            self._file = None
+            self._cold.clear()
+            self._cold_bytes = 0
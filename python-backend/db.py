@@ -1,104 +1,428 @@
 from __future__ import annotations as _annotations
 
+import asyncio
+import logging
 import os
-from typing import Any, Optional
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
 
 import asyncpg
 
+import metrics
+from settings import env_float
+
+
+logger = logging.getLogger(__name__)
+
+
+POOL_MIN_SIZE = int(env_float("DB_POOL_MIN_SIZE", 2))
+POOL_MAX_SIZE = int(env_float("DB_POOL_MAX_SIZE", 10))
+# Server-side statement_timeout for pooled connections; 0 disables it
+STATEMENT_TIMEOUT_MS = int(env_float("DB_STATEMENT_TIMEOUT_MS", 15000))
+# Connections older than this are closed when released and reopened on demand; 0 disables
+CONN_MAX_LIFETIME = env_float("DB_CONN_MAX_LIFETIME", 1800.0)
+CONN_MAX_IDLE = env_float("DB_CONN_MAX_IDLE", 300.0)
+SLOW_QUERY_MS = env_float("DB_SLOW_QUERY_MS", 250.0)
 
 _pool: Optional[asyncpg.Pool] = None
+_pool_lock = asyncio.Lock()
+
+# Hot queries prepared on every pooled connection and run by label via fetch_prepared /
+# fetchrow_prepared; modules add their own with register_prepared at import
+PREPARED_QUERIES: dict[str, str] = {
+    "config_version": "select coalesce(max(id), 0) as version from config_changes",
+}
+
+# Per connection (keyed by backend pid): open time and prepared statements by label
+_conn_opened: dict[int, float] = {}
+_conn_statements: dict[int, dict[str, Any]] = {}
+
+# NOTIFY channel carrying the new config version after every logged change
+CONFIG_CHANNEL = "config_changes"
+
+
+def _dsn() -> str:
+    dsn = os.getenv("DATABASE_URL")
+    if not dsn:
+        raise RuntimeError("DATABASE_URL env var is required for Postgres connection")
+    return dsn
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    pid = conn.get_server_pid()
+    _conn_opened[pid] = time.monotonic()
+    statements = _conn_statements[pid] = {}
+
+    def _forget(_conn: Any) -> None:
+        if _conn_statements.get(pid) is statements:
+            _conn_opened.pop(pid, None)
+            _conn_statements.pop(pid, None)
+
+    conn.add_termination_listener(_forget)
+    for label, query in PREPARED_QUERIES.items():
+        try:
+            statements[label] = await conn.prepare(query)
+        except asyncpg.PostgresError:
+            # e.g. table not created yet on a fresh database; prepared on first use instead
+            pass
 
 
 async def get_pool() -> asyncpg.Pool:
     global _pool
     if _pool is None:
-        dsn = os.getenv("DATABASE_URL")
-        if not dsn:
-            raise RuntimeError("DATABASE_URL env var is required for Postgres connection")
-        _pool = await asyncpg.create_pool(dsn)
+        async with _pool_lock:
+            # Concurrent first callers wait here instead of each creating a pool
+            if _pool is None:
+                server_settings = {}
+                if STATEMENT_TIMEOUT_MS > 0:
+                    server_settings["statement_timeout"] = str(STATEMENT_TIMEOUT_MS)
+                _pool = await asyncpg.create_pool(
+                    _dsn(),
+                    min_size=min(POOL_MIN_SIZE, POOL_MAX_SIZE),
+                    max_size=POOL_MAX_SIZE,
+                    max_inactive_connection_lifetime=CONN_MAX_IDLE,
+                    server_settings=server_settings,
+                    init=_init_connection,
+                )
     return _pool
 
 
-async def init_schema() -> None:
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        # Agents and supporting entities
-        await conn.execute(
-            """
-            create table if not exists agents (
-                id serial primary key,
-                name text unique not null,
-                model text not null,
-                handoff_description text,
-                instruction_type text not null check (instruction_type in ('text','provider')),
-                instruction_value text not null,
-                is_triage boolean not null default false
-            );
-
-            create table if not exists tools (
-                name text primary key,
-                code_name text not null,
-                description text,
-                test_arguments text
-            );
-
-            create table if not exists agent_tools (
-                agent_id integer not null references agents(id) on delete cascade,
-                tool_name text not null references tools(name) on delete cascade,
-                sort_order integer not null default 0,
-                primary key (agent_id, tool_name)
-            );
-
-            create table if not exists guardrails (
-                name text primary key,
-                code_name text not null
-            );
-
-            create table if not exists agent_guardrails (
-                agent_id integer not null references agents(id) on delete cascade,
-                guardrail_name text not null references guardrails(name) on delete cascade,
-                primary key (agent_id, guardrail_name)
-            );
-
-            create table if not exists handoffs (
-                source_agent_id integer not null references agents(id) on delete cascade,
-                target_agent_id integer not null references agents(id) on delete cascade,
-                on_handoff_callback text,
-                primary key (source_agent_id, target_agent_id)
-            );
-
-            create table if not exists app_contexts (
-                triage_name text primary key,
-                defaults text
-            );
-            """
-        )
-        # Evolve schema for guardrails config
-        await conn.execute(
-            """
-            alter table guardrails add column if not exists model text;
-            alter table guardrails add column if not exists instruction_value text;
-            alter table tools add column if not exists agent_ref_name text;
-            """
-        )
-
-
-async def fetchrow(query: str, *args: Any) -> Optional[asyncpg.Record]:
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        return await conn.fetchrow(query, *args)
+async def close_pool() -> None:
+    global _pool
+    async with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        await pool.close()
+    _conn_opened.clear()
+    _conn_statements.clear()
 
 
-async def fetch(query: str, *args: Any) -> list[asyncpg.Record]:
+@asynccontextmanager
+async def acquire() -> AsyncIterator[asyncpg.Connection]:
+    """Pool connection with wait-time metrics and max-lifetime recycling."""
     pool = await get_pool()
+    started = time.perf_counter()
     async with pool.acquire() as conn:
-        rows = await conn.fetch(query, *args)
-        return list(rows)
+        metrics.observe("db_pool_wait_seconds", time.perf_counter() - started)
+        metrics.set_gauge("db_pool_size", pool.get_size())
+        metrics.set_gauge("db_pool_idle", pool.get_idle_size())
+        try:
+            yield conn
+        finally:
+            pid = conn.get_server_pid()
+            opened = _conn_opened.get(pid)
+            if CONN_MAX_LIFETIME > 0 and opened is not None and time.monotonic() - opened > CONN_MAX_LIFETIME:
+                # The pool reconnects a closed connection on its next acquire
+                _conn_opened.pop(pid, None)
+                _conn_statements.pop(pid, None)
+                metrics.inc("db_connections_recycled_total")
+                await conn.close()
+
+
+_LABEL_RE = re.compile(r"\b(?:from|into|update)\s+([a-z_][\w.]*)", re.IGNORECASE)
+_labels: dict[str, str] = {}
+
+
+def query_label(query: str) -> str:
+    """Metrics label for a query: first keyword and first table, e.g. "select:agents"."""
+    label = _labels.get(query)
+    if label is None:
+        words = query.split(None, 1)
+        table = _LABEL_RE.search(query)
+        label = f"{words[0].lower() if words else 'query'}:{table.group(1).lower() if table else '-'}"
+        if len(_labels) >= 1024:
+            _labels.clear()
+        _labels[query] = label
+    return label
+
+
+def _observe_query(label: str, query: str, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    metrics.observe("db_query_seconds", elapsed, label=label)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        metrics.inc("db_slow_queries_total", label=label)
+        logger.warning("Slow query [%s] %.0f ms: %s", label, elapsed * 1000, " ".join(query.split())[:300])
+
+
+async def connect() -> asyncpg.Connection:
+    """Dedicated connection outside the pool, e.g. for LISTEN."""
+    return await asyncpg.connect(_dsn())
+
+
+# Schema migrations applied in order by init_schema; append new steps, never edit applied ones
+MIGRATIONS: list[tuple[int, str]] = [
+    # Agents and supporting entities
+    (1, """
+        create table if not exists agents (
+            id serial primary key,
+            name text unique not null,
+            model text not null,
+            handoff_description text,
+            instruction_type text not null check (instruction_type in ('text','provider')),
+            instruction_value text not null,
+            is_triage boolean not null default false
+        );
+
+        create table if not exists tools (
+            name text primary key,
+            code_name text not null,
+            description text,
+            test_arguments text
+        );
+
+        create table if not exists agent_tools (
+            agent_id integer not null references agents(id) on delete cascade,
+            tool_name text not null references tools(name) on delete cascade,
+            sort_order integer not null default 0,
+            primary key (agent_id, tool_name)
+        );
 
+        create table if not exists guardrails (
+            name text primary key,
+            code_name text not null
+        );
 
-async def execute(query: str, *args: Any) -> str:
+        create table if not exists agent_guardrails (
+            agent_id integer not null references agents(id) on delete cascade,
+            guardrail_name text not null references guardrails(name) on delete cascade,
+            primary key (agent_id, guardrail_name)
+        );
+
+        create table if not exists handoffs (
+            source_agent_id integer not null references agents(id) on delete cascade,
+            target_agent_id integer not null references agents(id) on delete cascade,
+            on_handoff_callback text,
+            primary key (source_agent_id, target_agent_id)
+        );
+
+        create table if not exists app_contexts (
+            triage_name text primary key,
+            defaults text
+        );
+    """),
+    # Evolve schema for guardrails and tool config
+    (2, """
+        alter table guardrails add column if not exists model text;
+        alter table guardrails add column if not exists instruction_value text;
+        alter table tools add column if not exists agent_ref_name text;
+        alter table tools add column if not exists cache_ttl_seconds double precision not null default 0;
+        alter table tools add column if not exists cache_max_entries integer not null default 256;
+    """),
+    # FAQ knowledge base with weighted full-text search
+    (3, """
+        create table if not exists faq_entries (
+            id serial primary key,
+            question text not null,
+            answer text not null,
+            keywords text not null default '',
+            search_vector tsvector generated always as (
+                setweight(to_tsvector('english', coalesce(question, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(keywords, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(answer, '')), 'C')
+            ) stored
+        );
+
+        create index if not exists faq_entries_search_idx on faq_entries using gin (search_vector);
+    """),
+    # Change log written by admin mutations; max(id) is the config version
+    (4, """
+        create table if not exists config_changes (
+            id bigserial primary key,
+            entity text not null,
+            name text,
+            changed_at timestamptz not null default now()
+        );
+    """),
+    # Context defaults as jsonb so they load already structured with the registry config
+    # Legacy text that is not valid JSON becomes null (with a server-log warning
+    # carrying the old value) instead of aborting startup
+    (5, """
+        create function pg_temp.app_context_defaults_jsonb(triage_name text, raw text) returns jsonb
+        language plpgsql as $$
+        begin
+            return raw::jsonb;
+        exception when invalid_text_representation then
+            raise warning 'app_contexts.defaults for % is not valid JSON; set to null (was: %)', triage_name, raw;
+            return null;
+        end $$;
+        alter table app_contexts alter column defaults type jsonb
+            using case when nullif(btrim(defaults), '') is null then null
+                       else pg_temp.app_context_defaults_jsonb(triage_name, defaults) end;
+        drop function pg_temp.app_context_defaults_jsonb(text, text);
+    """),
+    # Seat assignments, written behind in batches by seat_inventory; holds are memory only
+    (6, """
+        create table if not exists seat_assignments (
+            flight_number text not null,
+            seat text not null,
+            holder text not null,
+            updated_at timestamptz not null default now(),
+            primary key (flight_number, seat)
+        );
+    """),
+    # Flight status feeds, bulk-loaded by flight_status.ingest; seq drives incremental index refresh
+    (7, """
+        create sequence if not exists flight_status_seq;
+        create table if not exists flight_status (
+            flight_number text not null,
+            flight_date date not null,
+            origin text,
+            destination text,
+            scheduled_departure timestamp,
+            scheduled_arrival timestamp,
+            estimated_departure timestamp,
+            estimated_arrival timestamp,
+            terminal text,
+            gate text,
+            status text default 'scheduled',
+            seq bigint not null default nextval('flight_status_seq'),
+            updated_at timestamptz not null default now(),
+            primary key (flight_number, flight_date)
+        );
+        create index if not exists flight_status_seq_idx on flight_status (seq);
+    """),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# pg_advisory_xact_lock key serializing migrations across workers
+_MIGRATION_LOCK_ID = 0x6D696772
+
+
+async def _schema_version(conn: asyncpg.Connection) -> int:
+    try:
+        return int(await conn.fetchval("select coalesce(max(version), 0) from schema_migrations"))
+    except asyncpg.UndefinedTableError:
+        return 0
+
+
+async def init_schema() -> None:
     pool = await get_pool()
     async with pool.acquire() as conn:
-        return await conn.execute(query, *args)
+        # Fast path: an up-to-date database costs one query and no DDL
+        if await _schema_version(conn) >= SCHEMA_VERSION:
+            return
+        async with conn.transaction():
+            # One worker migrates at a time; the others wait, then find nothing left to apply
+            await conn.execute("select pg_advisory_xact_lock($1)", _MIGRATION_LOCK_ID)
+            await conn.execute(
+                """
+                create table if not exists schema_migrations (
+                    version integer primary key,
+                    applied_at timestamptz not null default now()
+                )
+                """
+            )
+            current = await _schema_version(conn)
+            for version, sql in MIGRATIONS:
+                if version > current:
+                    await conn.execute(sql)
+                    await conn.execute("insert into schema_migrations(version) values($1)", version)
+            if current < SCHEMA_VERSION:
+                # Migrations may rewrite config rows; log it like any other config write
+                await record_config_change("agent", conn=conn)
+
+
+async def fetchrow(query: str, *args: Any, label: Optional[str] = None) -> Optional[asyncpg.Record]:
+    async with acquire() as conn:
+        started = time.perf_counter()
+        try:
+            return await conn.fetchrow(query, *args)
+        finally:
+            _observe_query(label or query_label(query), query, started)
+
+
+async def fetch(query: str, *args: Any, label: Optional[str] = None) -> list[asyncpg.Record]:
+    async with acquire() as conn:
+        started = time.perf_counter()
+        try:
+            rows = await conn.fetch(query, *args)
+            return list(rows)
+        finally:
+            _observe_query(label or query_label(query), query, started)
+
+
+async def execute(query: str, *args: Any, label: Optional[str] = None) -> str:
+    async with acquire() as conn:
+        started = time.perf_counter()
+        try:
+            return await conn.execute(query, *args)
+        finally:
+            _observe_query(label or query_label(query), query, started)
+
+
+def register_prepared(label: str, query: str) -> None:
+    """Add a hot query to PREPARED_QUERIES; connections already open prepare it on first use."""
+    PREPARED_QUERIES[label] = query
+
+
+async def _run_prepared(label: str, method: str, args: tuple[Any, ...]) -> Any:
+    query = PREPARED_QUERIES[label]
+    async with acquire() as conn:
+        statements = _conn_statements.setdefault(conn.get_server_pid(), {})
+        started = time.perf_counter()
+        try:
+            stmt = statements.get(label)
+            if stmt is None:
+                stmt = statements[label] = await conn.prepare(query)
+            try:
+                return await getattr(stmt, method)(*args)
+            except asyncpg.InvalidCachedStatementError:
+                # Schema changed under the statement; prepare it again once
+                stmt = statements[label] = await conn.prepare(query)
+                return await getattr(stmt, method)(*args)
+        finally:
+            _observe_query(label, query, started)
+
+
+async def fetchrow_prepared(label: str, *args: Any) -> Optional[asyncpg.Record]:
+    """Run one of PREPARED_QUERIES through the connection's prepared statement."""
+    return await _run_prepared(label, "fetchrow", args)
+
+
+async def fetch_prepared(label: str, *args: Any) -> list[asyncpg.Record]:
+    """fetchrow_prepared for queries returning many rows."""
+    return list(await _run_prepared(label, "fetch", args))
+
+
+# Change log entries kept for incremental reloads; older ones force a full rebuild
+CONFIG_CHANGES_RETAINED = 10000
+
+# pg_advisory_xact_lock key held from a change's id allocation to its commit, so
+# config versions become visible in id order and `id > since` never skips one
+_CONFIG_LOCK_ID = 0x63666763
+
+
+async def record_config_change(entity: str, name: Optional[str] = None, conn: Optional[asyncpg.Connection] = None) -> int:
+    """Log a config mutation, notify every worker and return the new config version.
+
+    entity is "agent", "tool", "guardrail", "context" or "faq"; name None means
+    "anything of this kind may have changed" and makes the next reload a full
+    rebuild (FAQ and context changes never rebuild agents). Pass conn to log inside the caller's transaction, after its writes
+    (the NOTIFY is sent on commit); without one the change is logged on its own.
+    """
+    if conn is None:
+        async with acquire() as own_conn:
+            return await record_config_change(entity, name, conn=own_conn)
+    if not conn.is_in_transaction():
+        async with conn.transaction():
+            return await record_config_change(entity, name, conn=conn)
+    await conn.execute("select pg_advisory_xact_lock($1)", _CONFIG_LOCK_ID)
+    version = await conn.fetchval(
+        "with c as (insert into config_changes(entity, name) values($1,$2) returning id)"
+        " select id, pg_notify($3, id::text) from c",
+        entity, name, CONFIG_CHANNEL,
+    )
+    await conn.execute("delete from config_changes where id <= $1", version - CONFIG_CHANGES_RETAINED)
+    return int(version)
 
 
+@asynccontextmanager
+async def config_mutation(entity: str, name: Optional[str] = None) -> AsyncIterator[asyncpg.Connection]:
+    """Transaction for an admin config write; the change is logged in it, so both commit or neither does."""
+    async with acquire() as conn:
+        async with conn.transaction():
+            yield conn
+            await record_config_change(entity, name, conn=conn)
@@ -1,8 +1,10 @@
 from __future__ import annotations as _annotations
 
+import importlib
+import json
 import random
 import string
-from typing import Callable, Awaitable
+from typing import Any, Callable, Awaitable, Iterator, Mapping, Optional
 
 from pydantic import BaseModel, ConfigDict
 
@@ -17,9 +19,10 @@ from agents import (
     input_guardrail,
 )
 from agents.extensions.handoff_prompt import RECOMMENDED_PROMPT_PREFIX
-from services.web_search import web_search_service
-from services.openai_web_search import openai_web_search_service
-from services.perplexity_web_search import perplexity_web_search_service
+import faq
+import flight_status
+from seat_inventory import inventory as seat_inventory
+from tool_cache import tool_error
 
 
 # =========================
@@ -43,48 +46,72 @@ def create_initial_context() -> AgentContext:
 
 
 @function_tool(
-    name_override="faq_lookup_tool", description_override="Lookup frequently asked questions."
+    name_override="faq_lookup_tool",
+    description_override="Lookup frequently asked questions.",
+    failure_error_function=tool_error,
 )
-async def faq_lookup_tool(question: str) -> str:
-    q = question.lower()
-    if "bag" in q or "baggage" in q:
-        return (
-            "You are allowed to bring one bag on the plane. "
-            "It must be under 50 pounds and 22 inches x 14 inches x 9 inches."
-        )
-    elif "seats" in q or "plane" in q:
-        return (
-            "There are 120 seats on the plane. "
-            "There are 22 business class seats and 98 economy seats. "
-            "Exit rows are rows 4 and 16. "
-            "Rows 5-8 are Economy Plus, with extra legroom."
-        )
-    elif "wifi" in q:
-        return "We have free wifi on the plane, join Airline-Wifi"
-    return "I'm sorry, I don't know the answer to that question."
+async def faq_lookup_tool(question: str, top_k: int = 3) -> str:
+    return faq.format_entries(await faq.lookup(question, top_k=top_k))
+
+
+# Seat tools and their admin test invokers share these, so a test goes through the inventory too
+
+
+async def _assign_seat(flight_number: str, confirmation_number: str, new_seat: str) -> tuple[bool, str]:
+    try:
+        assigned = await seat_inventory.assign(flight_number, new_seat, confirmation_number)
+    except ValueError as e:
+        return False, str(e)
+    if not assigned:
+        return False, f"Seat {new_seat} is not available on flight {flight_number}. Please choose another seat."
+    return True, f"Updated seat to {new_seat.strip().upper()} for confirmation number {confirmation_number}"
+
+
+async def _seat_map(flight_number: str) -> str:
+    try:
+        snapshot = await seat_inventory.snapshot(flight_number)
+    except ValueError as e:
+        return str(e)
+    # Compact occupancy (base64 bitmap); the UI renders the seat map from the same snapshot
+    return json.dumps(snapshot, separators=(",", ":"))
+
+
+async def _cancel_flight(flight_number: str, confirmation_number: Optional[str]) -> str:
+    try:
+        await seat_inventory.flight(flight_number)
+        if confirmation_number:
+            await seat_inventory.release(flight_number, confirmation_number)
+    except ValueError as e:
+        return str(e)
+    return f"Flight {flight_number} successfully cancelled"
 
 
 @function_tool
 async def update_seat(
     context: RunContextWrapper[AgentContext], confirmation_number: str, new_seat: str
 ) -> str:
-    context.context.confirmation_number = confirmation_number
-    context.context.seat_number = new_seat
-    assert context.context.flight_number is not None, "Flight number is required"
-    return f"Updated seat to {new_seat} for confirmation number {confirmation_number}"
+    flight_number = getattr(context.context, "flight_number", None)
+    assert flight_number is not None, "Flight number is required"
+    assigned, message = await _assign_seat(flight_number, confirmation_number, new_seat)
+    if assigned:
+        context.context.confirmation_number = confirmation_number
+        context.context.seat_number = new_seat.strip().upper()
+    return message
 
 
 @function_tool(
     name_override="flight_status_tool",
-    description_override="Lookup status for a flight."
+    description_override="Lookup status for a flight. flight_date is YYYY-MM-DD; leave it empty for the flight departing around today.",
+    failure_error_function=tool_error,
 )
-async def flight_status_tool(flight_number: str) -> str:
-    return f"Flight {flight_number} is on time and scheduled to depart at gate A10."
+async def flight_status_tool(flight_number: str, flight_date: Optional[str] = None) -> str:
+    return await flight_status.describe(flight_number, flight_date)
 
 
 @function_tool(
     name_override="baggage_tool",
-    description_override="Lookup baggage allowance and fees."
+    description_override="Lookup baggage allowance and fees.",
+    failure_error_function=tool_error,
 )
 async def baggage_tool(query: str) -> str:
     q = query.lower()
@@ -102,7 +129,9 @@ async def baggage_tool(query: str) -> str:
 async def display_seat_map(
     context: RunContextWrapper[AgentContext]
 ) -> str:
-    return "DISPLAY_SEAT_MAP"
+    flight_number = getattr(context.context, "flight_number", None)
+    assert flight_number is not None, "Flight number is required"
+    return await _seat_map(flight_number)
 
 
 @function_tool(
@@ -114,46 +143,71 @@ async def cancel_flight(
 ) -> str:
     fn = context.context.flight_number
     assert fn is not None, "Flight number is required"
-    return f"Flight {fn} successfully cancelled"
+    return await _cancel_flight(fn, getattr(context.context, "confirmation_number", None))
 
 
-# Generic Web Search tool
-@function_tool(
-    name_override="web_search",
-    description_override="Search the internet and return top results."
-)
-async def web_search(query: str, max_results: int = 5) -> str:
-    return await web_search_service(query, max_results=max_results)
+class LazyRegistry(Mapping[str, Any]):
+    """code_name -> implementation; "module:attr" entries are imported on first lookup.
 
-# OpenAI modern Web Search tool
-@function_tool(
-    name_override="modern_web_search",
-    description_override="Use OpenAI web search to synthesize an answer with citations."
-)
-async def modern_web_search(query: str, max_results: int = 5) -> str:
-    return await openai_web_search_service(query, max_results=max_results)
+    Keeps heavy tool modules (web-search services and their clients) out of the import
+    path of workers whose agents never use them.
+    """
+
+    def __init__(self, loaded: dict[str, Any], lazy: Optional[dict[str, str]] = None) -> None:
+        self._loaded = dict(loaded)
+        self._lazy = dict(lazy or {})
+
+    def register(self, code_name: str, impl: Any) -> None:
+        """Register an implementation, or a "module:attr" string to import on first use."""
+        if isinstance(impl, str):
+            self._lazy[code_name] = impl
+            self._loaded.pop(code_name, None)
+        else:
+            self._loaded[code_name] = impl
+
+    def __getitem__(self, code_name: str) -> Any:
+        try:
+            return self._loaded[code_name]
+        except KeyError:
+            pass
+        module_name, _, attr = self._lazy[code_name].partition(":")
+        impl = self._loaded[code_name] = getattr(importlib.import_module(module_name), attr)
+        return impl
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._loaded
+        yield from (k for k in self._lazy if k not in self._loaded)
+
+    def __len__(self) -> int:
+        return len(self._loaded.keys() | self._lazy.keys())
+
+    def is_loaded(self, code_name: str) -> bool:
+        return code_name in self._loaded
 
-# Perplexity Web Search tool
-@function_tool(
-    name_override="perplexity_web_search",
-    description_override="Search the web with Perplexity.AI and return a concise answer with sources."
-)
-async def perplexity_web_search(input: str, max_results: int = 5) -> str:
-    return await perplexity_web_search_service(input, max_results=max_results)
 
 # Expose a registry for dynamic wiring
-TOOL_REGISTRY: dict[str, Callable[..., Awaitable[str]]]
-TOOL_REGISTRY = {
-    "faq_lookup_tool": faq_lookup_tool,
-    "update_seat": update_seat,
-    "flight_status_tool": flight_status_tool,
-    "baggage_tool": baggage_tool,
-    "display_seat_map": display_seat_map,
-    "cancel_flight": cancel_flight,
-    "web_search": web_search,
-    "modern_web_search": modern_web_search,
-    "perplexity_web_search": perplexity_web_search,
-}
+TOOL_REGISTRY = LazyRegistry(
+    {
+        "faq_lookup_tool": faq_lookup_tool,
+        "update_seat": update_seat,
+        "flight_status_tool": flight_status_tool,
+        "baggage_tool": baggage_tool,
+        "display_seat_map": display_seat_map,
+        "cancel_flight": cancel_flight,
+    },
+    lazy={
+        "web_search": "web_tools:web_search",
+        "modern_web_search": "web_tools:modern_web_search",
+        "perplexity_web_search": "web_tools:perplexity_web_search",
+        "meta_web_search": "web_tools:meta_web_search",
+    },
+)
+
+
+# Tools that read or change the conversation context. A cached result would be keyed
+# without it and replayed (or run once for coalesced callers) across conversations,
+# so these never get a cache policy.
+CONTEXT_TOOLS = frozenset({"update_seat", "display_seat_map", "cancel_flight"})
 
 
 # =========================
@@ -161,23 +215,8 @@ TOOL_REGISTRY = {
 # =========================
 
 
-async def _test_faq_lookup_tool(question: str) -> str:
-    q = (question or "").lower()
-    if "bag" in q or "baggage" in q:
-        return (
-            "You are allowed to bring one bag on the plane. "
-            "It must be under 50 pounds and 22 inches x 14 inches x 9 inches."
-        )
-    elif "seats" in q or "plane" in q:
-        return (
-            "There are 120 seats on the plane. "
-            "There are 22 business class seats and 98 economy seats. "
-            "Exit rows are rows 4 and 16. "
-            "Rows 5-8 are Economy Plus, with extra legroom."
-        )
-    elif "wifi" in q:
-        return "We have free wifi on the plane, join Airline-Wifi"
-    return "I'm sorry, I don't know the answer to that question."
+async def _test_faq_lookup_tool(question: str, top_k: int = 3) -> str:
+    return faq.format_entries(await faq.lookup(question or "", top_k=top_k))
 
 
 async def _test_baggage_tool(query: str) -> str:
@@ -189,45 +228,41 @@ async def _test_baggage_tool(query: str) -> str:
     return "Please provide details about your baggage inquiry."
 
 
-async def _test_flight_status_tool(flight_number: str) -> str:
-    return f"Flight {flight_number} is on time and scheduled to depart at gate A10."
-
+async def _test_flight_status_tool(flight_number: str, flight_date: Optional[str] = None) -> str:
+    return await flight_status.describe(flight_number, flight_date)
 
-async def _test_display_seat_map() -> str:
-    return "DISPLAY_SEAT_MAP"
 
-
-async def _test_cancel_flight(flight_number: str) -> str:
-    return f"Flight {flight_number} successfully cancelled"
+# The seat tools read the flight (and confirmation) from the context; here they are arguments
 
 
-async def _test_update_seat(confirmation_number: str, new_seat: str) -> str:
-    return f"Updated seat to {new_seat} for confirmation number {confirmation_number}"
+async def _test_display_seat_map(flight_number: str) -> str:
+    return await _seat_map(flight_number)
 
 
-async def _test_web_search(query: str, max_results: int = 5) -> str:
-    return await web_search_service(query, max_results=max_results)
+async def _test_cancel_flight(flight_number: str, confirmation_number: Optional[str] = None) -> str:
+    return await _cancel_flight(flight_number, confirmation_number)
 
 
-async def _test_modern_web_search(query: str, max_results: int = 5) -> str:
-    return await openai_web_search_service(query, max_results=max_results)
+async def _test_update_seat(flight_number: str, confirmation_number: str, new_seat: str) -> str:
+    return (await _assign_seat(flight_number, confirmation_number, new_seat))[1]
 
 
-async def _test_perplexity_web_search(query: str, max_results: int = 5) -> str:
-    return await perplexity_web_search_service(query, max_results=max_results)
-
-
-TOOL_TEST_INVOKERS: dict[str, Callable[..., Awaitable[str]]] = {
-    "faq_lookup_tool": _test_faq_lookup_tool,
-    "baggage_tool": _test_baggage_tool,
-    "flight_status_tool": _test_flight_status_tool,
-    "display_seat_map": _test_display_seat_map,
-    "cancel_flight": _test_cancel_flight,
-    "update_seat": _test_update_seat,
-    "web_search": _test_web_search,
-    "modern_web_search": _test_modern_web_search,
-    "perplexity_web_search": _test_perplexity_web_search,
-}
+TOOL_TEST_INVOKERS = LazyRegistry(
+    {
+        "faq_lookup_tool": _test_faq_lookup_tool,
+        "baggage_tool": _test_baggage_tool,
+        "flight_status_tool": _test_flight_status_tool,
+        "display_seat_map": _test_display_seat_map,
+        "cancel_flight": _test_cancel_flight,
+        "update_seat": _test_update_seat,
+    },
+    lazy={
+        "web_search": "web_tools:_test_web_search",
+        "modern_web_search": "web_tools:_test_modern_web_search",
+        "perplexity_web_search": "web_tools:_test_perplexity_web_search",
+        "meta_web_search": "web_tools:_test_meta_web_search",
+    },
+)
 
 
 # =========================
@@ -0,0 +1,178 @@
+from __future__ import annotations as _annotations
+
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from db import acquire, fetch, fetch_prepared, record_config_change, register_prepared
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be can do does for from have how i in is it my of on or the this to what when where which who why will with you your".split()
+)
+
+# Field weights mirror the setweight() classes of faq_entries.search_vector (A/B/C)
+_FIELD_WEIGHTS = {"question": 3.0, "keywords": 2.0, "answer": 1.0}
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+# Entries scoring below this fraction of the best match are not returned
+_MIN_RELATIVE_SCORE = 0.4
+
+NO_ANSWER = "I'm sorry, I don't know the answer to that question."
+
+
+def _stem(token: str) -> str:
+    # Very small suffix stripper; enough to fold "bags"/"bag" and "seats"/"seat"
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    return [_stem(t) for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+@dataclass(frozen=True)
+class FaqEntry:
+    id: int
+    question: str
+    answer: str
+    keywords: str = ""
+
+
+class FaqIndex:
+    """Immutable in-process inverted index over FAQ entries, ranked with BM25.
+
+    A new index is built whenever the faq_entries table changes and swapped in
+    atomically, so readers never observe a half-built index.
+    """
+
+    def __init__(self, entries: Iterable[FaqEntry]) -> None:
+        self.entries: list[FaqEntry] = list(entries)
+        # token -> list of (entry position, weighted term frequency)
+        self._postings: dict[str, list[tuple[int, float]]] = {}
+        self._lengths: list[float] = []
+        for pos, entry in enumerate(self.entries):
+            tf: dict[str, float] = {}
+            length = 0.0
+            for field, weight in _FIELD_WEIGHTS.items():
+                for tok in tokenize(getattr(entry, field)):
+                    tf[tok] = tf.get(tok, 0.0) + weight
+                    length += weight
+            self._lengths.append(length)
+            for tok, freq in tf.items():
+                self._postings.setdefault(tok, []).append((pos, freq))
+        n = len(self.entries)
+        self._avg_len = (sum(self._lengths) / n) if n else 0.0
+        self._idf = {
+            tok: math.log(1.0 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for tok, plist in self._postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def search(self, query: str, top_k: int = 3) -> list[tuple[FaqEntry, float]]:
+        scores: dict[int, float] = {}
+        for tok in set(tokenize(query)):
+            plist = self._postings.get(tok)
+            if not plist:
+                continue
+            idf = self._idf[tok]
+            for pos, freq in plist:
+                norm = _K1 * (1.0 - _B + _B * self._lengths[pos] / (self._avg_len or 1.0))
+                scores[pos] = scores.get(pos, 0.0) + idf * freq * (_K1 + 1.0) / (freq + norm)
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], self.entries[kv[0]].id))
+        return [(self.entries[pos], score) for pos, score in ranked[: max(top_k, 0)]]
+
+
+_index: Optional[FaqIndex] = None
+
+
+def _row_to_entry(row: Any) -> FaqEntry:
+    return FaqEntry(
+        id=int(row["id"]),
+        question=row["question"],
+        answer=row["answer"],
+        keywords=row.get("keywords") or "",
+    )
+
+
+async def refresh_index() -> FaqIndex:
+    """Rebuild the in-process index from Postgres.
+
+    Mutations log an "faq" config change; every worker rebuilds when the registry
+    reload triggered by its NOTIFY sees that change.
+    """
+    global _index
+    rows = await fetch("select id, question, answer, keywords from faq_entries order by id")
+    _index = FaqIndex(_row_to_entry(r) for r in rows)
+    return _index
+
+
+register_prepared("faq_search", """
+    select id, question, answer, keywords
+    from faq_entries, websearch_to_tsquery('english', $1) q
+    where search_vector @@ q
+    order by ts_rank(search_vector, q) desc, id
+    limit $2
+""")
+
+
+async def search_db(query: str, top_k: int = 3) -> list[FaqEntry]:
+    """Rank entries in Postgres using the GIN-indexed tsvector column."""
+    rows = await fetch_prepared("faq_search", query, top_k)
+    return [_row_to_entry(r) for r in rows]
+
+
+async def lookup(query: str, top_k: int = 3) -> list[FaqEntry]:
+    if _index is None:
+        try:
+            await refresh_index()
+        except Exception:
+            return await search_db(query, top_k)
+    assert _index is not None
+    ranked = _index.search(query, top_k)
+    if not ranked:
+        return []
+    # Drop weak tail matches so the agent is not handed unrelated answers
+    floor = ranked[0][1] * _MIN_RELATIVE_SCORE
+    return [entry for entry, score in ranked if score >= floor]
+
+
+def format_entries(entries: list[FaqEntry]) -> str:
+    if not entries:
+        return NO_ANSWER
+    if len(entries) == 1:
+        return entries[0].answer
+    lines: list[str] = []
+    for idx, e in enumerate(entries, start=1):
+        lines.append(f"{idx}. Q: {e.question}")
+        lines.append(f"   A: {e.answer}")
+    return "\n".join(lines)
+
+
+async def import_entries(entries: list[dict[str, Any]], replace: bool = False) -> int:
+    """Insert many entries in a single transaction, optionally replacing existing content.
+
+    The index is not rebuilt here: the logged "faq" change makes the next
+    reload_registry() on every worker refresh it.
+    """
+    async with acquire() as conn:
+        async with conn.transaction():
+            if replace:
+                await conn.execute("delete from faq_entries")
+            await conn.executemany(
+                "insert into faq_entries(question, answer, keywords) values($1,$2,$3)",
+                [(e["question"], e["answer"], e.get("keywords") or "") for e in entries],
+            )
+            await record_config_change("faq", conn=conn)
+    return len(entries)
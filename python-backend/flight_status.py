@@ -0,0 +1,352 @@
+from __future__ import annotations as _annotations
+
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, AsyncIterable, AsyncIterator, NamedTuple, Optional, Union
+
+import asyncpg
+
+import db
+import metrics
+from settings import env_float
+
+
+logger = logging.getLogger(__name__)
+
+
+REFRESH_INTERVAL = env_float("FLIGHT_STATUS_REFRESH_SECONDS", 30.0)
+# The index keeps flights from this many days back onwards; older ones are only in Postgres
+KEEP_DAYS = int(env_float("FLIGHT_STATUS_KEEP_DAYS", 2))
+
+# Feed columns in table order; a feed file may carry any subset that includes the key
+KEY_COLUMNS = ("flight_number", "flight_date")
+COLUMNS = KEY_COLUMNS + (
+    "origin", "destination",
+    "scheduled_departure", "scheduled_arrival", "estimated_departure", "estimated_arrival",
+    "terminal", "gate", "status",
+)
+
+
+class FlightStatusImportError(ValueError):
+    pass
+
+
+class FlightStatus(NamedTuple):
+    # A tuple rather than a dataclass: the index holds one per flight per day, built in bulk
+    flight_number: str
+    flight_date: date
+    origin: Optional[str] = None
+    destination: Optional[str] = None
+    # Local airport times, as the feeds publish them
+    scheduled_departure: Optional[datetime] = None
+    scheduled_arrival: Optional[datetime] = None
+    estimated_departure: Optional[datetime] = None
+    estimated_arrival: Optional[datetime] = None
+    terminal: Optional[str] = None
+    gate: Optional[str] = None
+    status: Optional[str] = None
+
+    def describe(self) -> str:
+        route = f" ({self.origin} to {self.destination})" if self.origin and self.destination else ""
+        parts = [f"Flight {self.flight_number} on {self.flight_date.isoformat()}{route} is {self.status or 'scheduled'}."]
+        departure = self.estimated_departure or self.scheduled_departure
+        if departure is not None:
+            text = f"It departs at {departure:%H:%M} local time"
+            if self.estimated_departure and self.scheduled_departure and self.estimated_departure != self.scheduled_departure:
+                text += f" (scheduled {self.scheduled_departure:%H:%M})"
+            if self.gate:
+                text += f" from {'terminal ' + self.terminal + ', ' if self.terminal else ''}gate {self.gate}"
+            parts.append(text + ".")
+        elif self.gate:
+            parts.append(f"Departure gate is {self.gate}.")
+        arrival = self.estimated_arrival or self.scheduled_arrival
+        if arrival is not None:
+            parts.append(f"Expected arrival is {arrival:%H:%M} local time.")
+        return " ".join(parts)
+
+
+def normalize_flight_number(flight_number: str) -> str:
+    return "".join((flight_number or "").split()).upper()
+
+
+class FlightStatusIndex:
+    """(flight number, date) -> FlightStatus for the flights around today.
+
+    Unlike the FAQ index it is patched in place: each refresh applies only the
+    rows whose seq moved past the highest one seen, and single dict writes are
+    atomic for readers on the event loop.
+    """
+
+    def __init__(self) -> None:
+        self._by_key: dict[tuple[str, date], FlightStatus] = {}
+        self.seq = 0
+        self.loaded = False
+        self.oldest = date.min
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def apply(self, rows: list[Any]) -> None:
+        """Rows are (*COLUMNS, seq) in seq order, as _REFRESH_SQL returns them."""
+        by_key = self._by_key
+        for row in rows:
+            status = FlightStatus._make(tuple(row)[:-1])
+            by_key[(status.flight_number, status.flight_date)] = status
+        if rows:
+            self.seq = max(self.seq, int(rows[-1][-1]))
+
+    def prune(self, oldest: date) -> int:
+        """Drop flights dated before `oldest`; a no-op until the date moves on."""
+        if oldest <= self.oldest:
+            return 0
+        self.oldest = oldest
+        stale = [key for key in self._by_key if key[1] < oldest]
+        for key in stale:
+            del self._by_key[key]
+        return len(stale)
+
+    def get(self, flight_number: str, flight_date: date) -> Optional[FlightStatus]:
+        return self._by_key.get((normalize_flight_number(flight_number), flight_date))
+
+    def nearest(self, flight_number: str, today: date) -> Optional[FlightStatus]:
+        """Today's flight, else tomorrow's, else yesterday's: three dict probes."""
+        fn = normalize_flight_number(flight_number)
+        for offset in (0, 1, -1):
+            status = self._by_key.get((fn, today + timedelta(days=offset)))
+            if status is not None:
+                return status
+        return None
+
+
+index = FlightStatusIndex()
+_task: Optional[asyncio.Task[None]] = None
+# One refresh at a time: interleaved slices of two refreshes could apply an older row over a newer one
+_refresh_lock = asyncio.Lock()
+# Cold-start load shared by every lookup that arrives before the index is loaded
+_cold_load: Optional[asyncio.Future[FlightStatusIndex]] = None
+
+_SELECT_COLUMNS = ", ".join(COLUMNS)
+_REFRESH_SQL = f"""
+    select {_SELECT_COLUMNS}, seq from flight_status
+    where seq > $1 and flight_date >= $2
+    order by seq
+"""
+_FETCH_ONE_SQL = f"""
+    select {_SELECT_COLUMNS} from flight_status
+    where flight_number = $1 and flight_date between $2 and $3
+    order by flight_date = $4 desc, flight_date > $4 desc
+    limit 1
+"""
+# Every worker refreshes every REFRESH_INTERVAL, and lookups outside the index hit _FETCH_ONE_SQL
+db.register_prepared("flight_status_refresh", _REFRESH_SQL)
+db.register_prepared("flight_status_one", _FETCH_ONE_SQL)
+
+_STAGING_DDL = """
+create temp table flight_status_import (
+    flight_number text, flight_date date, origin text, destination text,
+    scheduled_departure timestamp, scheduled_arrival timestamp,
+    estimated_departure timestamp, estimated_arrival timestamp,
+    terminal text, gate text, status text
+) on commit drop;
+"""
+
+_APPLY_SLICE = 10000
+
+# pg_advisory_xact_lock key serializing ingests, so seq order is commit order and a
+# refresh can never skip a row committed after it read a higher seq
+_INGEST_LOCK_ID = 0x666C7374
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _upsert_sql(columns: list[str]) -> str:
+    values = [c for c in columns if c not in KEY_COLUMNS]
+    select = ", ".join(values)
+    updates = ", ".join(f"{c} = excluded.{c}" for c in values)
+    # Only the feed's own columns are written, so a status feed leaves schedule fields alone
+    return f"""
+        insert into flight_status (flight_number, flight_date{', ' + select if values else ''}, seq)
+        select s.*, nextval('flight_status_seq') from (
+            select distinct on (upper(regexp_replace(flight_number, '[[:space:]]+', '', 'g')), flight_date)
+                upper(regexp_replace(flight_number, '[[:space:]]+', '', 'g')), flight_date{', ' + select if values else ''}
+            from flight_status_import
+            where flight_number is not null and flight_date is not null
+            -- A flight repeated in one file: its last line wins
+            order by upper(regexp_replace(flight_number, '[[:space:]]+', '', 'g')), flight_date, ctid desc
+        ) s
+        on conflict (flight_number, flight_date) do update set
+            {updates + ', ' if updates else ''}seq = excluded.seq, updated_at = now()
+    """
+
+
+def _parse_header(line: bytes) -> list[str]:
+    columns = [c.strip().strip('"').lower() for c in line.decode("utf-8-sig").strip().split(",")]
+    unknown = [c for c in columns if c not in COLUMNS]
+    if unknown:
+        raise FlightStatusImportError(f"Unknown feed columns: {', '.join(unknown)}")
+    missing = [c for c in KEY_COLUMNS if c not in columns]
+    if missing:
+        raise FlightStatusImportError(f"Feed is missing key columns: {', '.join(missing)}")
+    return columns
+
+
+async def _with_header(chunks: AsyncIterable[bytes]) -> tuple[list[str], AsyncIterator[bytes]]:
+    """Read the CSV header off a byte stream; the returned stream still starts with it."""
+    it = chunks.__aiter__()
+    head = b""
+    while b"\n" not in head:
+        try:
+            head += await it.__anext__()
+        except StopAsyncIteration:
+            break
+    columns = _parse_header(head.split(b"\n", 1)[0])
+
+    async def _replay() -> AsyncIterator[bytes]:
+        yield head
+        async for chunk in it:
+            yield chunk
+
+    return columns, _replay()
+
+
+async def ingest(source: Union[str, Path, AsyncIterable[bytes]]) -> int:
+    """COPY a CSV schedule/status feed (file path or byte stream) into flight_status.
+
+    The header names the columns (any subset of COLUMNS with the key); blank
+    fields are NULL. Returns the number of flights written.
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            columns = _parse_header(f.readline())
+        copy_source: Any = str(source)
+    else:
+        columns, copy_source = await _with_header(source)
+    started = time.perf_counter()
+    async with db.acquire() as conn:
+        try:
+            async with conn.transaction():
+                await conn.execute("select pg_advisory_xact_lock($1)", _INGEST_LOCK_ID)
+                await conn.execute(_STAGING_DDL)
+                await conn.copy_to_table(
+                    "flight_status_import", source=copy_source, columns=columns, format="csv", header=True,
+                )
+                result = await conn.execute(_upsert_sql(columns))
+        except asyncpg.PostgresError as e:
+            raise FlightStatusImportError(str(e)) from e
+    count = int(result.split()[-1])
+    metrics.inc("flight_status_ingested_total", count)
+    metrics.observe("flight_status_ingest_seconds", time.perf_counter() - started)
+    logger.info("Ingested %d flights in %.2fs", count, time.perf_counter() - started)
+    # This worker answers from the new data right away; the others on their next refresh
+    await refresh_index()
+    return count
+
+
+async def refresh_index() -> FlightStatusIndex:
+    """Apply rows changed since the last refresh (all of them on the first call).
+
+    Refreshes are serialized; one that waited reads from the seq the previous one reached.
+    """
+    async with _refresh_lock:
+        oldest = _today() - timedelta(days=KEEP_DAYS)
+        started = time.perf_counter()
+        rows = await db.fetch_prepared("flight_status_refresh", index.seq, oldest)
+        # A cold load is a few hundred thousand rows; let requests in between slices
+        for start in range(0, len(rows), _APPLY_SLICE):
+            index.apply(rows[start:start + _APPLY_SLICE])
+            await asyncio.sleep(0)
+        index.prune(oldest)
+        index.loaded = True
+        metrics.observe("flight_status_refresh_seconds", time.perf_counter() - started)
+        metrics.set_gauge("flight_status_indexed", len(index))
+        return index
+
+
+async def _cold_refresh() -> FlightStatusIndex:
+    global _cold_load
+    try:
+        return await refresh_index()
+    finally:
+        # A failed load is retried by the next lookup
+        _cold_load = None
+
+
+async def _load_once() -> FlightStatusIndex:
+    global _cold_load
+    if _cold_load is None:
+        _cold_load = asyncio.ensure_future(_cold_refresh())
+    # Shielded: a cancelled tool call must not abort the load other lookups are waiting on
+    return await asyncio.shield(_cold_load)
+
+
+async def _fetch_one(flight_number: str, flight_date: Optional[date]) -> Optional[FlightStatus]:
+    today = _today()
+    row = await db.fetchrow_prepared(
+        "flight_status_one",
+        normalize_flight_number(flight_number),
+        flight_date or today - timedelta(days=1), flight_date or today + timedelta(days=1), flight_date or today,
+    )
+    return FlightStatus._make(row) if row else None
+
+
+async def lookup(flight_number: str, flight_date: Optional[date] = None) -> Optional[FlightStatus]:
+    """Status of a flight on a date, or of its nearest departure around today."""
+    if not index.loaded:
+        try:
+            await _load_once()
+        except Exception:
+            return await _fetch_one(flight_number, flight_date)
+    if flight_date is not None and flight_date < index.oldest:
+        return await _fetch_one(flight_number, flight_date)
+    if flight_date is not None:
+        return index.get(flight_number, flight_date)
+    return index.nearest(flight_number, _today())
+
+
+async def describe(flight_number: str, flight_date: Optional[str] = None) -> str:
+    """Tool-facing text for a flight; flight_date is YYYY-MM-DD."""
+    day: Optional[date] = None
+    if flight_date:
+        try:
+            day = date.fromisoformat(flight_date.strip())
+        except ValueError:
+            return f"'{flight_date}' is not a date; use YYYY-MM-DD."
+    status = await lookup(flight_number, day)
+    if status is None:
+        when = f"on {day.isoformat()}" if day else "around today"
+        return f"No status is available for flight {normalize_flight_number(flight_number)} {when}."
+    return status.describe()
+
+
+async def _refresh_loop() -> None:
+    while True:
+        try:
+            await refresh_index()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("Flight status refresh failed", exc_info=True)
+        await asyncio.sleep(REFRESH_INTERVAL)
+
+
+def start() -> None:
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_refresh_loop())
+
+
+async def stop() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+
+def index_state() -> dict[str, Any]:
+    return {"flights": len(index), "seq": index.seq, "loaded": index.loaded, "oldest_date": index.oldest.isoformat() if index.loaded else None}
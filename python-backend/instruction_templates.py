@@ -0,0 +1,149 @@
+from __future__ import annotations as _annotations
+
+import functools
+import re
+import string
+from typing import Any, Optional
+
+from domain import CONTEXT_CLASS
+
+
+# Context fields agent instructions are expected to reference; others still render
+# from the conversation context but are reported when the template is compiled
+KNOWN_PLACEHOLDERS = frozenset({
+    "passenger_name",
+    "confirmation_number",
+    "seat_number",
+    "flight_number",
+    "account_number",
+    "ticket_number",
+})
+
+MISSING_VALUE = "[unknown]"
+
+_formatter = string.Formatter()
+
+
+_ATTRIBUTE_RE = re.compile(r"\.([^.\[]*)")
+
+
+def _root_name(field_name: str) -> str:
+    for idx, ch in enumerate(field_name):
+        if ch in ".[":
+            return field_name[:idx]
+    return field_name
+
+
+def _is_context_field(field_name: str) -> bool:
+    """True if the placeholder names context data, not a method or dunder of the model.
+
+    Declared model fields always qualify; other names must not collide with an
+    attribute of CONTEXT_CLASS (model_dump, __class__, ...), since the context
+    accepts arbitrary extra keys. Attribute access below the root may not reach
+    private or dunder attributes either.
+    """
+    root = _root_name(field_name)
+    if root not in CONTEXT_CLASS.model_fields and (not root or root.startswith("_") or hasattr(CONTEXT_CLASS, root)):
+        return False
+    return not any(attr.startswith("_") for attr in _ATTRIBUTE_RE.findall(field_name[len(root):]))
+
+
+def _context_value(context: Any, name: str) -> Any:
+    # Read data only: declared fields and extra keys, never class attributes or methods
+    if name in getattr(type(context), "model_fields", {}):
+        return getattr(context, name, None)
+    extra = getattr(context, "__pydantic_extra__", None)
+    if extra is not None:
+        return extra.get(name)
+    return getattr(context, "__dict__", {}).get(name)
+
+
+class CompiledTemplate:
+    """An instruction template parsed once into literal text and field references.
+
+    Rendering reads only the referenced context fields and is memoized on their values.
+    """
+
+    def __init__(self, template: str) -> None:
+        self.template = template
+        self.problems: list[str] = []
+        # (literal, field_name, conversion, format_spec)
+        self._parts: list[tuple[str, Optional[str], Optional[str], str]] = []
+        try:
+            parsed = list(_formatter.parse(template))
+        except ValueError as e:
+            self.problems.append(f"invalid template syntax ({e}); it is used as plain text")
+            parsed = [(template, None, None, None)]
+        rejected: list[str] = []
+        for literal, field_name, spec, conversion in parsed:
+            if field_name is not None and (not field_name or field_name[0].isdigit() or "{" in (spec or "")):
+                self.problems.append(
+                    "positional or nested placeholders are not supported; the template is used as plain text"
+                )
+                self._parts = [(template, None, None, "")]
+                rejected = []
+                break
+            if field_name is not None and not _is_context_field(field_name):
+                # Rendered as MISSING_VALUE; the name never reaches getattr
+                rejected.append(field_name)
+                self._parts.append((literal + MISSING_VALUE, None, None, ""))
+                continue
+            self._parts.append((literal, field_name, conversion, spec or ""))
+        if rejected:
+            self.problems.append(
+                "placeholders " + ", ".join("{" + f + "}" for f in dict.fromkeys(rejected))
+                + f" do not name context fields and render as {MISSING_VALUE}"
+            )
+
+        self.fields: tuple[str, ...] = tuple(dict.fromkeys(
+            _root_name(f) for _, f, _, _ in self._parts if f is not None
+        ))
+        unknown = [f for f in self.fields if f not in KNOWN_PLACEHOLDERS]
+        if unknown:
+            self.problems.append(
+                "unknown placeholders " + ", ".join("{" + f + "}" for f in unknown)
+                + f" render as {MISSING_VALUE} unless the conversation context defines them"
+            )
+        if not self.fields:
+            self._text = "".join(literal for literal, _, _, _ in self._parts)
+        self._render_cached = functools.lru_cache(maxsize=256)(self._render_values)
+
+    def _render_values(self, values: tuple[Any, ...]) -> str:
+        mapping = dict(zip(self.fields, values))
+        out: list[str] = []
+        for literal, field_name, conversion, spec in self._parts:
+            out.append(literal)
+            if field_name is None:
+                continue
+            value = mapping.get(_root_name(field_name))
+            if value is None:
+                out.append(MISSING_VALUE)
+                continue
+            try:
+                if field_name != _root_name(field_name):
+                    value, _ = _formatter.get_field(field_name, (), mapping)
+                value = _formatter.convert_field(value, conversion)
+                out.append(_formatter.format_field(value, spec))
+            except Exception:
+                out.append(MISSING_VALUE)
+        return "".join(out)
+
+    def render(self, context: Any) -> str:
+        if not self.fields:
+            return self._text
+        values = tuple(_context_value(context, f) if context is not None else None for f in self.fields)
+        try:
+            return self._render_cached(values)
+        except TypeError:
+            # Unhashable context values (lists, dicts) cannot key the memo
+            return self._render_values(values)
+
+    def instructions(self, run_context: Any, agent: Any) -> str:
+        """Dynamic-instructions callable for Agent(instructions=...)."""
+        return self.render(getattr(run_context, "context", None))
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_template(template: str) -> CompiledTemplate:
+    """Compile once per distinct template text, so registry rebuilds reuse the result."""
+    return CompiledTemplate(template)
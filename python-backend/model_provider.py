@@ -0,0 +1,99 @@
+from __future__ import annotations as _annotations
+
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Optional
+
+from agents import RunConfig
+from agents.models.interface import Model, ModelProvider
+from agents.models.multi_provider import MultiProvider
+
+import metrics
+from services.adaptive_limiter import AdaptiveLimiter, limiter_for
+
+
+class TurnUsage:
+    """Tokens spent by the model calls of one chat turn, guardrails and agent tools included."""
+
+    def __init__(self) -> None:
+        self.tokens = 0
+        self.calls = 0
+
+    def add(self, usage: Any) -> None:
+        self.tokens += int(getattr(usage, "total_tokens", 0) or 0)
+        self.calls += 1
+
+
+_turn_usage: ContextVar[Optional[TurnUsage]] = ContextVar("turn_usage", default=None)
+# Smoothed tokens of a completed turn; what a cancelled turn is assumed to have needed
+_avg_turn_tokens = 0.0
+
+
+def track_turn_usage() -> TurnUsage:
+    """Start counting tokens for the current task and the run tasks it spawns."""
+    usage = TurnUsage()
+    _turn_usage.set(usage)
+    return usage
+
+
+def finish_turn(usage: TurnUsage, cancelled: bool = False) -> None:
+    global _avg_turn_tokens
+    if not cancelled:
+        if usage.calls:
+            _avg_turn_tokens = usage.tokens if not _avg_turn_tokens else 0.9 * _avg_turn_tokens + 0.1 * usage.tokens
+        return
+    metrics.inc("chat_cancelled_tokens_spent_total", usage.tokens)
+    # Estimate: what an average turn costs, minus what this one had already spent
+    metrics.inc("chat_cancelled_tokens_saved_total", max(_avg_turn_tokens - usage.tokens, 0.0))
+
+
+class LimitedModel(Model):
+    """Runs every request of the wrapped model inside its model's adaptive concurrency slot."""
+
+    def __init__(self, inner: Model, limiter: AdaptiveLimiter) -> None:
+        self._inner = inner
+        self._limiter = limiter
+
+    async def get_response(self, *args: Any, **kwargs: Any) -> Any:
+        async with self._limiter.slot():
+            response = await self._inner.get_response(*args, **kwargs)
+        usage = _turn_usage.get()
+        if usage is not None:
+            usage.add(getattr(response, "usage", None))
+        return response
+
+    async def stream_response(self, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        async with self._limiter.slot():
+            async for event in self._inner.stream_response(*args, **kwargs):
+                if getattr(event, "type", None) == "response.completed":
+                    usage = _turn_usage.get()
+                    if usage is not None:
+                        usage.add(getattr(event.response, "usage", None))
+                yield event
+
+    def get_retry_advice(self, request: Any) -> Any:
+        return self._inner.get_retry_advice(request)
+
+    async def _cleanup_on_run_end(self, owner: object) -> None:
+        await self._inner._cleanup_on_run_end(owner)
+
+    async def close(self) -> None:
+        await self._inner.close()
+
+
+class LimitedModelProvider(ModelProvider):
+    """Default model lookup with one adaptive limiter per model name."""
+
+    def __init__(self, inner: Optional[ModelProvider] = None) -> None:
+        self._inner = inner or MultiProvider()
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        return LimitedModel(self._inner.get_model(model_name), limiter_for(model_name or "default"))
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+MODEL_PROVIDER = LimitedModelProvider()
+
+# Passed to every Runner.run so agent, guardrail and agent-as-tool calls share the limiters
+RUN_CONFIG = RunConfig(model_provider=MODEL_PROVIDER)
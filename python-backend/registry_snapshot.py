@@ -0,0 +1,73 @@
+from __future__ import annotations as _annotations
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Optional
+
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of the resolved config rows changes; older snapshots are ignored
+SNAPSHOT_FORMAT = 2
+
+SNAPSHOT_PATH = Path(os.getenv(
+    "REGISTRY_SNAPSHOT_PATH",
+    str(Path(__file__).resolve().parent / ".cache" / "registry_snapshot.json"),
+))
+
+
+def _enabled() -> bool:
+    return os.getenv("REGISTRY_SNAPSHOT_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def write_snapshot(rows: dict[str, list[dict[str, Any]]], version: int, path: Path = SNAPSHOT_PATH) -> None:
+    """Atomically write `<sha256 hex>\\n<json>` so a torn or edited file is detected on read."""
+    if not _enabled():
+        return
+    payload = json.dumps(
+        {"format": SNAPSHOT_FORMAT, "version": version, "rows": rows},
+        separators=(",", ":"), ensure_ascii=False, default=str,
+    ).encode("utf-8")
+    digest = hashlib.sha256(payload).hexdigest().encode("ascii")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(digest + b"\n" + payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_snapshot(path: Path = SNAPSHOT_PATH) -> Optional[tuple[dict[str, list[dict[str, Any]]], int]]:
+    """Return (rows, version) from a valid snapshot, or None if missing, stale-format or corrupt."""
+    if not _enabled():
+        return None
+    try:
+        raw = path.read_bytes()
+    except FileNotFoundError:
+        metrics.inc("registry_snapshot_loads_total", result="missing")
+        return None
+    except OSError:
+        logger.warning("Could not read registry snapshot %s", path, exc_info=True)
+        metrics.inc("registry_snapshot_loads_total", result="error")
+        return None
+    digest, _, payload = raw.partition(b"\n")
+    if hashlib.sha256(payload).hexdigest().encode("ascii") != digest.strip():
+        logger.warning("Registry snapshot %s failed its checksum; ignoring it", path)
+        metrics.inc("registry_snapshot_loads_total", result="corrupt")
+        return None
+    try:
+        doc = json.loads(payload)
+    except ValueError:
+        metrics.inc("registry_snapshot_loads_total", result="corrupt")
+        return None
+    if doc.get("format") != SNAPSHOT_FORMAT:
+        metrics.inc("registry_snapshot_loads_total", result="stale_format")
+        return None
+    metrics.inc("registry_snapshot_loads_total", result="ok")
+    return doc["rows"], int(doc["version"])
@@ -0,0 +1,92 @@
+from __future__ import annotations as _annotations
+
+import asyncio
+import logging
+from typing import Any, Optional
+
+import db
+import metrics
+from loader import current_registry, reload_registry
+from settings import env_float
+
+
+logger = logging.getLogger(__name__)
+
+
+# Burst of admin edits (e.g. a UI save touching several tables) -> one rebuild
+_DEBOUNCE_SECONDS = env_float("REGISTRY_RELOAD_DEBOUNCE", 0.5)
+_RECONNECT_MAX_SECONDS = env_float("REGISTRY_LISTEN_RECONNECT_MAX", 30.0)
+
+_pending = asyncio.Event()
+_tasks: list[asyncio.Task[Any]] = []
+_conn: Optional[Any] = None
+
+
+def request_reload() -> None:
+    """Schedule a debounced background rebuild in this worker."""
+    _pending.set()
+
+
+def _on_notify(_conn: Any, _pid: int, _channel: str, payload: str) -> None:
+    metrics.inc("registry_notifications_total")
+    reg = current_registry()
+    try:
+        if reg is not None and int(payload) <= reg.version:
+            return
+    except ValueError:
+        pass
+    request_reload()
+
+
+async def _rebuild_loop() -> None:
+    while True:
+        await _pending.wait()
+        await asyncio.sleep(_DEBOUNCE_SECONDS)
+        _pending.clear()
+        try:
+            await reload_registry()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            metrics.inc("registry_reload_failures_total")
+            logger.exception("Background registry reload failed; retrying on next change")
+
+
+async def _listen_loop() -> None:
+    global _conn
+    delay = 1.0
+    while True:
+        closed = asyncio.Event()
+        try:
+            _conn = await db.connect()
+            _conn.add_termination_listener(lambda _c: closed.set())
+            await _conn.add_listener(db.CONFIG_CHANNEL, _on_notify)
+            delay = 1.0
+            # Changes made while we were not listening are only visible through the version
+            request_reload()
+            await closed.wait()
+            logger.warning("Config LISTEN connection lost; reconnecting")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("Config LISTEN connection failed; retrying in %.0fs", delay, exc_info=True)
+        finally:
+            conn, _conn = _conn, None
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, _RECONNECT_MAX_SECONDS)
+
+
+async def start() -> None:
+    if _tasks:
+        return
+    _tasks.append(asyncio.create_task(_rebuild_loop()))
+    _tasks.append(asyncio.create_task(_listen_loop()))
+
+
+async def stop() -> None:
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
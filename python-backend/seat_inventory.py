@@ -0,0 +1,579 @@
+from __future__ import annotations as _annotations
+
+import asyncio
+import base64
+import contextlib
+import heapq
+import logging
+import os
+import re
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Optional
+
+import chat_sessions
+import db
+import flight_status
+import metrics
+from settings import env_float
+
+
+logger = logging.getLogger(__name__)
+
+
+# How long a seat picked on the seat map stays reserved for the customer before it is assigned
+HOLD_SECONDS = env_float("SEAT_HOLD_SECONDS", 120.0)
+# Interval of the background tick: hold expiry, seat_map pushes and the batched Postgres write
+FLUSH_INTERVAL = env_float("SEAT_FLUSH_INTERVAL", 0.5)
+# Seats the seat map used to hard-code as taken; applied in memory on load, never written back
+DEMO_OCCUPANCY = os.getenv("SEAT_DEMO_OCCUPANCY", "1").lower() not in ("0", "false", "no")
+# The flight numbers the demo handoffs make up (FLT-100..FLT-999); known only in demo mode
+_DEMO_FLIGHT_RE = re.compile(r"FLT-\d{3}")
+
+
+class UnknownFlightError(ValueError):
+    pass
+
+
+class SeatLayout:
+    """Seat label <-> bit index for one aircraft; bits run cabin by cabin, row by row, left to right."""
+
+    def __init__(self, name: str, cabins: Iterable[tuple[str, int, int, str]], exit_rows: Iterable[int] = ()) -> None:
+        self.name = name
+        self.cabins = list(cabins)
+        self.exit_rows = frozenset(exit_rows)
+        self.labels = [
+            f"{row}{letter}"
+            for _, first, last, letters in self.cabins
+            for row in range(first, last + 1)
+            for letter in letters
+        ]
+        self._index = {label: i for i, label in enumerate(self.labels)}
+        self.size = len(self.labels)
+
+    def bit(self, seat: str) -> int:
+        try:
+            return self._index[seat.strip().upper()]
+        except KeyError:
+            raise ValueError(f"There is no seat {seat} on this aircraft") from None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "cabins": [
+                {"name": name, "first_row": first, "last_row": last, "letters": letters}
+                for name, first, last, letters in self.cabins
+            ],
+            "exit_rows": sorted(self.exit_rows),
+        }
+
+
+NARROW_BODY = SeatLayout(
+    "narrow-body-136",
+    [("Business", 1, 4, "ABCD"), ("Economy Plus", 5, 8, "ABCDEF"), ("Economy", 9, 24, "ABCDEF")],
+    exit_rows=(4, 16),
+)
+
+_DEMO_OCCUPIED = (
+    "1A", "2B", "3C", "5A", "5F", "7B", "7E", "9A", "9F", "10C", "10D", "12A", "12F",
+    "14B", "14E", "16A", "16F", "18C", "18D", "20A", "20F", "22B", "22E", "24A", "24F",
+)
+
+
+class FlightSeats:
+    """Occupancy of one flight as two bitmaps (assigned, held) plus who owns each set bit."""
+
+    def __init__(self, flight_number: str, layout: SeatLayout) -> None:
+        self.flight_number = flight_number
+        self.layout = layout
+        self.assigned = 0
+        self.held = 0
+        # bit -> holder; "" marks seats taken by passengers this service does not know about
+        self.owner: Dict[int, str] = {}
+        self.holds: Dict[int, tuple[str, float]] = {}
+        self.seat_of: Dict[str, int] = {}
+        self.hold_of: Dict[str, int] = {}
+        # bit -> holder as last read from or written to Postgres; what a conditional write expects there
+        self.stored: Dict[int, str] = {}
+        # Bumped on every change; lets clients drop stale seat_map frames
+        self.version = 0
+        # Serializes this flight's Postgres writes, so `stored` follows commit order
+        self.write_lock = asyncio.Lock()
+
+    def held_by_other(self, i: int, holder: str, now: float) -> bool:
+        hold = self.holds.get(i)
+        return hold is not None and hold[0] != holder and hold[1] > now
+
+    def drop_hold(self, i: int) -> None:
+        hold = self.holds.pop(i, None)
+        if hold is not None:
+            self.held &= ~(1 << i)
+            if self.hold_of.get(hold[0]) == i:
+                del self.hold_of[hold[0]]
+
+    def snapshot(self) -> dict[str, Any]:
+        taken = self.assigned | self.held
+        return {
+            "flight_number": self.flight_number,
+            "layout": self.layout.name,
+            "version": self.version,
+            "seats": self.layout.size,
+            "available": self.layout.size - taken.bit_count(),
+            # Bit i (little-endian) is layout.labels[i]; set = assigned or held
+            "occupied": base64.b64encode(taken.to_bytes((self.layout.size + 7) // 8, "little")).decode(),
+        }
+
+
+db.register_prepared("seat_assignments_load", "select seat, holder from seat_assignments where flight_number = $1")
+# Every write is conditional on the holder this process last saw in Postgres; rows another
+# worker changed meanwhile are left alone and missing from the returned keys
+_INSERT_SQL = """
+    insert into seat_assignments (flight_number, seat, holder)
+    select * from unnest($1::text[], $2::text[], $3::text[])
+    on conflict (flight_number, seat) do update set updated_at = now()
+        where seat_assignments.holder = excluded.holder
+    returning flight_number, seat
+"""
+_UPDATE_SQL = """
+    update seat_assignments s set holder = d.holder, updated_at = now()
+    from unnest($1::text[], $2::text[], $3::text[], $4::text[]) as d(flight_number, seat, holder, expected)
+    where s.flight_number = d.flight_number and s.seat = d.seat and s.holder in (d.expected, d.holder)
+    returning s.flight_number, s.seat
+"""
+_DELETE_SQL = """
+    delete from seat_assignments s
+    using unnest($1::text[], $2::text[], $3::text[]) as d(flight_number, seat, expected)
+    where s.flight_number = d.flight_number and s.seat = d.seat and s.holder = d.expected
+    returning s.flight_number, s.seat
+"""
+_CURRENT_SQL = """
+    select s.flight_number, s.seat, s.holder from seat_assignments s
+    join unnest($1::text[], $2::text[]) as d(flight_number, seat)
+        on s.flight_number = d.flight_number and s.seat = d.seat
+"""
+
+# Seat changes made by the chat turn running in this task (and the run tasks it spawns):
+# (flight number, holder, the holder's seat bit before the change)
+_turn_changes: ContextVar[Optional[list[tuple[str, str, Optional[int]]]]] = ContextVar("seat_turn_changes", default=None)
+
+
+class SeatInventory:
+    """Seat holds and assignments for every flight this process serves.
+
+    Postgres is loaded once per flight. Holds stay in memory; released seats
+    are written behind in batches, while an assign writes its claim through
+    before confirming it. Each
+    hold/assign/release decides without awaiting once its flight is loaded,
+    which makes it an atomic compare-and-set on the event loop: two customers
+    racing for a seat in this process get exactly one True. Across workers
+    every write is conditional on the holder Postgres had when this process
+    last read or wrote the seat. When another worker got there first, its
+    holder is adopted here and the assign returns False, so a seat is never
+    confirmed to two customers. Expired holds are treated as free immediately
+    and removed by the tick through a min-heap of expiry times.
+    """
+
+    def __init__(self, layout: SeatLayout = NARROW_BODY) -> None:
+        self.layout = layout
+        self._flights: Dict[str, FlightSeats] = {}
+        self._loading: Dict[str, asyncio.Future[FlightSeats]] = {}
+        # (expires_at, flight_number, bit, holder); stale entries are skipped when popped
+        self._expiry: list[tuple[float, str, int, str]] = []
+        # (flight_number, seat label) -> (holder stored in Postgres, holder to write or None to delete)
+        self._dirty: Dict[tuple[str, str], tuple[Optional[str], Optional[str]]] = {}
+        self._changed: set[str] = set()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    async def flight(self, flight_number: str) -> FlightSeats:
+        """The flight's inventory, loaded on first use; UnknownFlightError if there is no such flight."""
+        fs = self._flights.get(flight_number)
+        if fs is not None:
+            return fs
+        pending = self._loading.get(flight_number)
+        if pending is None:
+            pending = self._loading[flight_number] = asyncio.ensure_future(self._load(flight_number))
+        # Shielded: a cancelled turn must not abort a load other customers are waiting on
+        return await asyncio.shield(pending)
+
+    @staticmethod
+    async def _exists(flight_number: str) -> bool:
+        if DEMO_OCCUPANCY and _DEMO_FLIGHT_RE.fullmatch(flight_number):
+            return True
+        return await flight_status.lookup(flight_number) is not None
+
+    async def _load(self, flight_number: str) -> FlightSeats:
+        try:
+            rows = await db.fetch_prepared("seat_assignments_load", flight_number)
+            # Stored seats prove the flight exists; otherwise it must be in the status feed.
+            # Made-up flight numbers would otherwise each get inventory kept for good
+            if not rows and not await self._exists(flight_number):
+                metrics.inc("seat_unknown_flight_total")
+                raise UnknownFlightError(f"There is no flight {flight_number}")
+        finally:
+            # A failed load is retried by the next caller
+            self._loading.pop(flight_number, None)
+        fs = FlightSeats(flight_number, self.layout)
+        for row in rows:
+            try:
+                i = self.layout.bit(row["seat"])
+            except ValueError:
+                logger.warning("Ignoring stored seat %s on %s: not in layout %s", row["seat"], flight_number, self.layout.name)
+                continue
+            self._set_assigned(fs, i, row["holder"])
+            fs.stored[i] = row["holder"]
+        if DEMO_OCCUPANCY:
+            for seat in _DEMO_OCCUPIED:
+                i = self.layout.bit(seat)
+                if not fs.assigned >> i & 1:
+                    self._set_assigned(fs, i, "")
+        self._flights[flight_number] = fs
+        metrics.set_gauge("seat_flights_loaded", len(self._flights))
+        return fs
+
+    @staticmethod
+    def _set_assigned(fs: FlightSeats, i: int, holder: str) -> None:
+        fs.assigned |= 1 << i
+        fs.owner[i] = holder
+        if holder:
+            fs.seat_of[holder] = i
+
+    def _touch(self, fs: FlightSeats, i: int) -> None:
+        fs.version += 1
+        self._changed.add(fs.flight_number)
+        key = (fs.flight_number, fs.layout.labels[i])
+        pending = self._dirty.get(key)
+        # The first change in a batch records what Postgres holds; later ones only move the target
+        self._dirty[key] = (pending[0] if pending is not None else fs.stored.get(i), fs.owner.get(i))
+
+    @staticmethod
+    def _journal(fs: FlightSeats, holder: str) -> None:
+        changes = _turn_changes.get()
+        if changes is not None:
+            changes.append((fs.flight_number, holder, fs.seat_of.get(holder)))
+
+    def _free_for(self, fs: FlightSeats, i: int, holder: str, now: float) -> bool:
+        if fs.assigned >> i & 1 and fs.owner.get(i) != holder:
+            return False
+        return not fs.held_by_other(i, holder, now)
+
+    async def hold(self, flight_number: str, seat: str, holder: str, ttl: float = HOLD_SECONDS) -> bool:
+        """Reserve a seat for `holder` for `ttl` seconds; replaces the holder's previous hold."""
+        fs = await self.flight(flight_number)
+        i = fs.layout.bit(seat)
+        now = time.monotonic()
+        if not holder or not self._free_for(fs, i, holder, now):
+            metrics.inc("seat_ops_total", op="hold", result="conflict")
+            return False
+        previous = fs.hold_of.get(holder)
+        if previous is not None:
+            fs.drop_hold(previous)
+        # An expired hold of someone else may still be there until the tick removes it
+        fs.drop_hold(i)
+        expires = now + ttl
+        fs.holds[i] = (holder, expires)
+        fs.hold_of[holder] = i
+        fs.held |= 1 << i
+        heapq.heappush(self._expiry, (expires, flight_number, i, holder))
+        fs.version += 1
+        self._changed.add(flight_number)
+        metrics.inc("seat_ops_total", op="hold", result="ok")
+        return True
+
+    async def assign(self, flight_number: str, seat: str, holder: str) -> bool:
+        """Give `holder` the seat unless someone else has it or holds it; frees the holder's old seat.
+
+        The claim is written through to Postgres before True is returned; a seat
+        another worker already took there is adopted and the assign returns False.
+        """
+        fs = await self.flight(flight_number)
+        i = fs.layout.bit(seat)
+        if not holder or not self._free_for(fs, i, holder, time.monotonic()):
+            metrics.inc("seat_ops_total", op="assign", result="conflict")
+            return False
+        previous: Optional[int] = None
+        if fs.owner.get(i) != holder:
+            self._journal(fs, holder)
+            previous = fs.seat_of.get(holder)
+            if previous is not None:
+                fs.assigned &= ~(1 << previous)
+                del fs.owner[previous]
+                self._touch(fs, previous)
+            self._set_assigned(fs, i, holder)
+        fs.drop_hold(i)
+        previous_hold = fs.hold_of.get(holder)
+        if previous_hold is not None:
+            fs.drop_hold(previous_hold)
+        self._touch(fs, i)
+        # Set in memory first, so no one here can take the seat while the claim is written;
+        # the old seat's release is written behind
+        key = (flight_number, fs.layout.labels[i])
+        async with fs.write_lock:
+            for _ in range(2):
+                claim = self._dirty.pop(key, None)
+                if claim is None:
+                    # Already written (or lost) by a flush that had the lock first
+                    break
+                try:
+                    applied = await self._write({key: claim})
+                except asyncio.CancelledError:
+                    # Outcome unknown; the flush settles it (and a cancelled turn undoes the assign)
+                    self._requeue({key: claim})
+                    raise
+                except Exception:
+                    self._give_back(fs, i, holder, previous)
+                    raise
+                if key in applied:
+                    self._stored(key, claim[1])
+                    break
+                await self._reconcile([key])
+                if fs.owner.get(i) != holder:
+                    break
+                # The stored row was freed meanwhile; the retry claims it with a plain insert
+        if fs.owner.get(i) == holder and fs.stored.get(i) == holder:
+            metrics.inc("seat_ops_total", op="assign", result="ok")
+            return True
+        self._give_back(fs, i, holder, previous)
+        metrics.inc("seat_ops_total", op="assign", result="conflict")
+        return False
+
+    def _give_back(self, fs: FlightSeats, i: int, holder: str, previous: Optional[int]) -> None:
+        """Undo an assign whose claim did not reach Postgres: the holder gets their old seat back."""
+        if fs.owner.get(i) == holder:
+            fs.assigned &= ~(1 << i)
+            del fs.owner[i]
+            fs.seat_of.pop(holder, None)
+            self._touch(fs, i)
+        if previous is not None and not fs.assigned >> previous & 1:
+            self._set_assigned(fs, previous, holder)
+            self._touch(fs, previous)
+
+    async def release(self, flight_number: str, holder: str) -> Optional[str]:
+        """Drop the holder's seat and hold on a flight; returns the seat that was assigned, if any."""
+        fs = await self.flight(flight_number)
+        held = fs.hold_of.get(holder)
+        if held is not None:
+            fs.drop_hold(held)
+            fs.version += 1
+            self._changed.add(flight_number)
+        if holder not in fs.seat_of:
+            return None
+        self._journal(fs, holder)
+        i = fs.seat_of.pop(holder)
+        fs.assigned &= ~(1 << i)
+        del fs.owner[i]
+        self._touch(fs, i)
+        metrics.inc("seat_ops_total", op="release", result="ok")
+        return fs.layout.labels[i]
+
+    def track_turn(self) -> list[tuple[str, str, Optional[int]]]:
+        """Start recording the seat changes of the chat turn running in the current task."""
+        changes: list[tuple[str, str, Optional[int]]] = []
+        _turn_changes.set(changes)
+        return changes
+
+    def undo_turn(self, changes: list[tuple[str, str, Optional[int]]]) -> None:
+        """Put every holder a cancelled turn moved back on the seat they had before it."""
+        now = time.monotonic()
+        for flight_number, holder, before in reversed(changes):
+            fs = self._flights.get(flight_number)
+            if fs is None:
+                continue
+            current = fs.seat_of.get(holder)
+            if current == before:
+                continue
+            if before is not None and not self._free_for(fs, before, holder, now):
+                # Taken by someone else meanwhile; the holder keeps the seat the turn gave them
+                logger.warning("Seat %s on %s was taken before a cancelled turn could give it back to %s",
+                               fs.layout.labels[before], flight_number, holder)
+                continue
+            if current is not None:
+                fs.assigned &= ~(1 << current)
+                del fs.owner[current]
+                del fs.seat_of[holder]
+                self._touch(fs, current)
+            if before is not None:
+                fs.drop_hold(before)
+                self._set_assigned(fs, before, holder)
+                self._touch(fs, before)
+            metrics.inc("seat_ops_total", op="undo", result="ok")
+
+    async def snapshot(self, flight_number: str) -> dict[str, Any]:
+        return (await self.flight(flight_number)).snapshot()
+
+    def expire_holds(self, now: Optional[float] = None) -> int:
+        now = time.monotonic() if now is None else now
+        expired = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            expires, flight_number, i, holder = heapq.heappop(self._expiry)
+            fs = self._flights.get(flight_number)
+            # Skip entries whose hold was since assigned, replaced or renewed
+            if fs is None or fs.holds.get(i) != (holder, expires):
+                continue
+            fs.drop_hold(i)
+            fs.version += 1
+            self._changed.add(flight_number)
+            expired += 1
+        if expired:
+            metrics.inc("seat_holds_expired_total", expired)
+        return expired
+
+    async def publish(self) -> None:
+        """Push one seat_map frame per changed flight to the chat sockets looking at it."""
+        changed, self._changed = self._changed, set()
+        for flight_number in changed:
+            fs = self._flights.get(flight_number)
+            if fs is not None:
+                await chat_sessions.push_flight(flight_number, {"type": "seat_map", **fs.snapshot()})
+
+    def _stored(self, key: tuple[str, str], holder: Optional[str]) -> None:
+        fs = self._flights.get(key[0])
+        if fs is None:
+            return
+        i = fs.layout.bit(key[1])
+        if holder is None:
+            fs.stored.pop(i, None)
+        else:
+            fs.stored[i] = holder
+        pending = self._dirty.get(key)
+        if pending is not None:
+            # Changed again while this batch was being written; that write now expects this one
+            self._dirty[key] = (holder, pending[1])
+
+    @staticmethod
+    async def _write(batch: Dict[tuple[str, str], tuple[Optional[str], Optional[str]]]) -> set[tuple[str, str]]:
+        """Apply a batch in one transaction; returns the keys whose write took effect."""
+        inserts = [(f, s, new) for (f, s), (old, new) in batch.items() if new is not None and old is None]
+        updates = [(f, s, new, old) for (f, s), (old, new) in batch.items() if new is not None and old is not None]
+        deletes = [(f, s, old) for (f, s), (old, new) in batch.items() if new is None and old is not None]
+        applied: set[tuple[str, str]] = set()
+        async with db.acquire() as conn:
+            async with conn.transaction():
+                if inserts:
+                    applied.update(tuple(r) for r in await conn.fetch(_INSERT_SQL, *map(list, zip(*inserts))))
+                if updates:
+                    applied.update(tuple(r) for r in await conn.fetch(_UPDATE_SQL, *map(list, zip(*updates))))
+                if deletes:
+                    applied.update(tuple(r) for r in await conn.fetch(_DELETE_SQL, *map(list, zip(*deletes))))
+        return applied
+
+    def _requeue(self, batch: Dict[tuple[str, str], tuple[Optional[str], Optional[str]]]) -> None:
+        # A seat changed again meanwhile keeps its newer target
+        for key, (old, new) in batch.items():
+            pending = self._dirty.get(key)
+            self._dirty[key] = (old, new if pending is None else pending[1])
+
+    async def flush(self) -> int:
+        """Write every seat changed since the last flush in one transaction."""
+        if not self._dirty:
+            return 0
+        flights = [self._flights[f] for f in sorted({f for f, _ in self._dirty}) if f in self._flights]
+        async with contextlib.AsyncExitStack() as stack:
+            # Sorted, so two flushes cannot deadlock; an assign only ever takes one of these
+            for fs in flights:
+                await stack.enter_async_context(fs.write_lock)
+            # Taken under the locks: an assign that wrote first has already removed its claim
+            locked = {fs.flight_number for fs in flights}
+            batch = {key: entry for key, entry in self._dirty.items() if key[0] in locked}
+            for key in batch:
+                del self._dirty[key]
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            try:
+                applied = await self._write(batch)
+            except Exception:
+                # Keep the batch for the next tick
+                self._requeue(batch)
+                metrics.inc("seat_flush_errors_total")
+                logger.warning("Could not persist %d seat changes", len(batch), exc_info=True)
+                return 0
+            conflicts: list[tuple[str, str]] = []
+            for key, (old, new) in batch.items():
+                if key in applied:
+                    self._stored(key, new)
+                elif new is not None:
+                    conflicts.append(key)
+                elif old is None:
+                    # Assigned and released within the batch: nothing to write
+                    continue
+                else:
+                    # The row no longer held the expected holder; find out who does
+                    conflicts.append(key)
+            metrics.inc("seat_rows_flushed_total", len(batch) - len(conflicts))
+            metrics.observe("seat_flush_seconds", time.perf_counter() - started)
+            if conflicts:
+                await self._reconcile(conflicts)
+            return len(batch) - len(conflicts)
+
+    async def _reconcile(self, conflicts: list[tuple[str, str]]) -> None:
+        """Adopt what Postgres holds for seats another worker wrote first."""
+        rows = await db.fetch(_CURRENT_SQL, *map(list, zip(*conflicts)), label="select:seat_assignments")
+        current = {(r["flight_number"], r["seat"]): r["holder"] for r in rows}
+        for key in conflicts:
+            fs = self._flights.get(key[0])
+            holder = current.get(key)
+            if fs is None:
+                continue
+            i = fs.layout.bit(key[1])
+            if holder is None:
+                # Freed again meanwhile: still ours to write, as a plain insert
+                fs.stored.pop(i, None)
+                pending = self._dirty.get(key)
+                self._dirty[key] = (None, fs.owner.get(i) if pending is None else pending[1])
+                continue
+            fs.stored[i] = holder
+            self._dirty.pop(key, None)
+            mine = fs.owner.get(i)
+            if mine == holder:
+                continue
+            metrics.inc("seat_flush_conflicts_total")
+            logger.warning("Seat %s on %s was assigned to %s by another worker; %s loses it",
+                           key[1], key[0], holder, mine or "nobody")
+            if mine is not None and fs.seat_of.get(mine) == i:
+                del fs.seat_of[mine]
+            fs.drop_hold(i)
+            self._set_assigned(fs, i, holder)
+            fs.version += 1
+            self._changed.add(fs.flight_number)
+
+    async def tick(self) -> None:
+        self.expire_holds()
+        await self.publish()
+        await self.flush()
+        metrics.set_gauge("seat_holds_active", sum(len(fs.holds) for fs in self._flights.values()))
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Seat inventory tick failed")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Last batch of changes before the pool closes
+        await self.flush()
+
+    def state(self) -> dict[str, Any]:
+        return {
+            "layout": self.layout.to_dict(),
+            "flights": {
+                fn: {**fs.snapshot(), "holds": len(fs.holds)}
+                for fn, fs in self._flights.items()
+            },
+            "pending_writes": len(self._dirty),
+            "pending_expiries": len(self._expiry),
+        }
+
+
+inventory = SeatInventory()
@@ -0,0 +1,163 @@
+from __future__ import annotations as _annotations
+
+import asyncio
+import collections
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+import openai
+
+import metrics
+from settings import env_float
+
+
+INITIAL_LIMIT = env_float("MODEL_CONCURRENCY_INITIAL", 8)
+MIN_LIMIT = env_float("MODEL_CONCURRENCY_MIN", 1)
+MAX_LIMIT = env_float("MODEL_CONCURRENCY_MAX", 64)
+# Multiplicative cut on 429/5xx/timeouts, and the gentler one when latency climbs
+BACKOFF_RATIO = env_float("MODEL_CONCURRENCY_BACKOFF", 0.5)
+LATENCY_BACKOFF_RATIO = env_float("MODEL_CONCURRENCY_LATENCY_BACKOFF", 0.9)
+# Short-term latency above this multiple of the long-term average counts as congestion
+LATENCY_TOLERANCE = env_float("MODEL_CONCURRENCY_LATENCY_TOLERANCE", 2.0)
+
+OK = "ok"
+OVERLOAD = "overload"
+IGNORE = "ignore"
+
+
+def classify(exc: BaseException) -> str:
+    """Whether a failed call says anything about provider capacity."""
+    if isinstance(exc, (openai.RateLimitError, openai.InternalServerError, openai.APITimeoutError,
+                        openai.APIConnectionError, asyncio.TimeoutError)):
+        return OVERLOAD
+    if isinstance(exc, openai.APIStatusError) and exc.status_code >= 500:
+        return OVERLOAD
+    if exc.__cause__ is not None:
+        # e.g. ProviderError raised from the SDK exception
+        return classify(exc.__cause__)
+    # Bad requests, auth errors, cancellation: not a capacity signal
+    return IGNORE
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for one model, steered by outcomes and latency.
+
+    The limit grows by about one slot per limit's worth of successful calls while
+    it is actually used, is halved on 429/5xx/timeouts and trimmed when the
+    short-term latency drifts well above the long-term one. Each decrease is
+    applied at most once per average call duration, so one burst of failures
+    from calls sent under the old limit does not collapse it to the floor.
+    """
+
+    def __init__(self, name: str, initial: float = INITIAL_LIMIT) -> None:
+        self.name = name
+        self.limit = min(max(initial, MIN_LIMIT), MAX_LIMIT)
+        self.in_flight = 0
+        self._waiters: collections.deque[asyncio.Future[None]] = collections.deque()
+        self._short_latency = 0.0
+        self._long_latency = 0.0
+        self._last_decrease = 0.0
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge("model_concurrency_limit", round(self.limit, 2), model=self.name)
+        metrics.set_gauge("model_in_flight", self.in_flight, model=self.name)
+        metrics.set_gauge("model_queue_depth", len(self._waiters), model=self.name)
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self.in_flight += 1
+                fut.set_result(None)
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self._publish()
+            return
+        fut: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        self._publish()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Woken and cancelled in the same tick; give the slot back
+                self.in_flight -= 1
+                self._wake()
+            else:
+                try:
+                    self._waiters.remove(fut)
+                except ValueError:
+                    pass
+            self._publish()
+            raise
+
+    def release(self, latency: float, outcome: str) -> None:
+        self.in_flight -= 1
+        now = time.monotonic()
+        if outcome == OVERLOAD:
+            self._decrease(now, BACKOFF_RATIO, "overload")
+        elif outcome == OK:
+            self._short_latency = latency if not self._short_latency else 0.7 * self._short_latency + 0.3 * latency
+            self._long_latency = latency if not self._long_latency else 0.98 * self._long_latency + 0.02 * latency
+            if self._short_latency > LATENCY_TOLERANCE * self._long_latency:
+                self._decrease(now, LATENCY_BACKOFF_RATIO, "latency")
+            elif self.in_flight + 1 >= self.limit / 2:
+                # Only grow while the current limit is being used, or an idle pool would creep to MAX_LIMIT
+                self.limit = min(self.limit + 1.0 / self.limit, MAX_LIMIT)
+        self._wake()
+        self._publish()
+
+    def _decrease(self, now: float, ratio: float, reason: str) -> None:
+        if now - self._last_decrease < (self._long_latency or 1.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.limit * ratio, MIN_LIMIT)
+        metrics.inc("model_concurrency_decreases_total", model=self.name, reason=reason)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        queued_at = time.perf_counter()
+        await self.acquire()
+        started = time.perf_counter()
+        metrics.observe("model_queue_seconds", started - queued_at, model=self.name)
+        outcome = IGNORE
+        try:
+            yield
+            outcome = OK
+        except BaseException as e:
+            outcome = classify(e)
+            raise
+        finally:
+            latency = time.perf_counter() - started
+            metrics.observe("model_call_seconds", latency, model=self.name)
+            metrics.inc("model_calls_total", model=self.name, outcome=outcome)
+            self.release(latency, outcome)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "model": self.name,
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "latency_short": round(self._short_latency, 3),
+            "latency_long": round(self._long_latency, 3),
+        }
+
+
+_limiters: dict[str, AdaptiveLimiter] = {}
+
+
+def limiter_for(model: str) -> AdaptiveLimiter:
+    """Process-wide limiter pool for one model name."""
+    limiter = _limiters.get(model)
+    if limiter is None:
+        limiter = _limiters[model] = AdaptiveLimiter(model)
+    return limiter
+
+
+def limiter_states() -> list[dict[str, Any]]:
+    return [l.to_dict() for l in _limiters.values()]
@@ -0,0 +1,242 @@
+from __future__ import annotations as _annotations
+
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+import metrics
+from settings import env_float
+from services.tool_results import report_failure
+
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+UNAVAILABLE_PREFIX = "Search provider unavailable"
+
+
+# Wall-clock budget for one provider call, retries (and a caller's fallbacks) included;
+# kept well under the 30 s agent turn timeout so a slow provider cannot use it all up
+CALL_DEADLINE = env_float("PROVIDER_CALL_DEADLINE", 20.0)
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, provider: str, endpoint: str, retry_after: float) -> None:
+        self.provider = provider
+        self.endpoint = endpoint
+        self.retry_after = max(retry_after, 0.0)
+        super().__init__(f"{provider}/{endpoint} circuit is open; retry in {self.retry_after:.0f}s")
+
+
+class ProviderError(RuntimeError):
+    """Raised by service code for provider-side failures that are not HTTP exceptions."""
+
+
+def unavailable_message(provider: str, retry_after: float, alternatives: str = "") -> str:
+    """Message returned to the agent instead of waiting on a provider we know is failing."""
+    hint = f" Try {alternatives} instead, or answer without web search." if alternatives else " Answer without web search."
+    return report_failure(f"{UNAVAILABLE_PREFIX}: {provider} is failing and was skipped (retry in ~{retry_after:.0f}s).{hint}")
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe after the cool-down."""
+
+    def __init__(self, provider: str, endpoint: str, failure_threshold: int, reset_timeout: float) -> None:
+        self.provider = provider
+        self.endpoint = endpoint
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge("circuit_breaker_state", _STATE_GAUGE[self.state], provider=self.provider, endpoint=self.endpoint)
+
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            self.state = state
+            metrics.inc("circuit_breaker_transitions_total", provider=self.provider, endpoint=self.endpoint, to=state)
+            self._publish()
+
+    def retry_after(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return self.opened_at + self.reset_timeout - time.monotonic()
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                return False
+            self._transition(HALF_OPEN)
+        # Half-open: let exactly one probe through
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def release_probe(self) -> None:
+        # Probe abandoned (e.g. cancelled) without an outcome; let the next caller probe
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self._probe_in_flight = False
+        self.failures = 0
+        self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._transition(OPEN)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "endpoint": self.endpoint,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_after": round(max(self.retry_after(), 0.0), 1),
+        }
+
+
+class RetryBudget:
+    """Retries are paid for by a fraction of successful traffic so a degraded provider
+    never sees more than (1 + ratio) times its normal request rate."""
+
+    def __init__(self, ratio: float, min_tokens: float, max_tokens: float) -> None:
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = min_tokens
+
+    def deposit(self) -> None:
+        self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def try_withdraw(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+_breakers: dict[tuple[str, str], CircuitBreaker] = {}
+_budgets: dict[str, RetryBudget] = {}
+
+
+def get_breaker(provider: str, endpoint: str) -> CircuitBreaker:
+    key = (provider, endpoint)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        breaker = _breakers[key] = CircuitBreaker(
+            provider,
+            endpoint,
+            failure_threshold=int(env_float("CIRCUIT_FAILURE_THRESHOLD", 5)),
+            reset_timeout=env_float("CIRCUIT_RESET_TIMEOUT", 30.0),
+        )
+    return breaker
+
+
+def _budget(provider: str) -> RetryBudget:
+    budget = _budgets.get(provider)
+    if budget is None:
+        budget = _budgets[provider] = RetryBudget(
+            ratio=env_float("RETRY_BUDGET_RATIO", 0.2),
+            min_tokens=env_float("RETRY_BUDGET_MIN", 3.0),
+            max_tokens=env_float("RETRY_BUDGET_MAX", 10.0),
+        )
+    return budget
+
+
+def is_breaker_failure(exc: BaseException) -> bool:
+    """Errors that indicate the provider is unhealthy (as opposed to a bad request)."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        return code in (403, 408, 429) or code >= 500
+    return isinstance(exc, (httpx.TransportError, asyncio.TimeoutError, TimeoutError, ProviderError))
+
+
+def is_retryable(exc: BaseException) -> bool:
+    # A timeout already spent the attempt's share of the deadline; retrying only overruns it
+    if isinstance(exc, (httpx.TimeoutException, asyncio.TimeoutError, TimeoutError)):
+        return False
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        return code in (408, 429) or code >= 500
+    return isinstance(exc, (httpx.TransportError, ProviderError))
+
+
+async def guarded_call(
+    provider: str,
+    endpoint: str,
+    fn: Callable[[], Awaitable[T]],
+    *,
+    retries: int = 1,
+    base_delay: float = 0.2,
+    max_delay: float = 2.0,
+    deadline: Optional[float] = None,
+) -> T:
+    """Run fn under the provider/endpoint breaker with budgeted, jittered retries.
+
+    `deadline` is a time.monotonic() instant (default CALL_DEADLINE from now)
+    bounding every attempt and backoff together; asyncio.TimeoutError is raised
+    when it passes. Raises CircuitOpenError immediately when the breaker is open.
+    """
+    breaker = get_breaker(provider, endpoint)
+    budget = _budget(provider)
+    if deadline is None:
+        deadline = time.monotonic() + CALL_DEADLINE
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError(f"{provider}/{endpoint} call deadline passed")
+        if not breaker.allow():
+            metrics.inc("circuit_breaker_rejections_total", provider=provider, endpoint=endpoint)
+            raise CircuitOpenError(provider, endpoint, breaker.retry_after())
+        try:
+            result = await asyncio.wait_for(fn(), timeout=remaining)
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+        except Exception as exc:
+            if not is_breaker_failure(exc):
+                # Caller error: says nothing about the provider's health either way
+                breaker.release_probe()
+                raise
+            breaker.record_failure()
+            if attempt >= retries or not is_retryable(exc) or not budget.try_withdraw():
+                raise
+            attempt += 1
+            # Full jitter keeps synchronized callers from retrying in lockstep
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            if time.monotonic() + delay >= deadline:
+                raise
+            metrics.inc("provider_retries_total", provider=provider, endpoint=endpoint)
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        budget.deposit()
+        return result
+
+
+def breaker_states() -> list[dict[str, Any]]:
+    return [b.to_dict() for _, b in sorted(_breakers.items())]
+
+
+def reset_breakers(provider: Optional[str] = None) -> None:
+    for (p, _), breaker in _breakers.items():
+        if provider is None or p == provider:
+            breaker.record_success()
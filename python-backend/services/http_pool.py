@@ -0,0 +1,111 @@
+from __future__ import annotations as _annotations
+
+import asyncio
+import os
+from typing import Any, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from settings import env_float, env_int
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=env_int("HTTP_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=env_int("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20),
+        keepalive_expiry=env_float("HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+
+
+def _http2_enabled() -> bool:
+    if os.getenv("HTTP2_ENABLED", "").lower() not in ("1", "true", "yes"):
+        return False
+    try:
+        import h2  # noqa: F401  (httpx needs the optional 'h2' package for HTTP/2)
+    except ImportError:
+        return False
+    return True
+
+
+class _HostLimitedTransport(httpx.AsyncBaseTransport):
+    """Caps concurrent requests per host while sharing one connection pool."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, per_host: int) -> None:
+        self._inner = inner
+        self._per_host = max(per_host, 1)
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        sem = self._semaphores.get(host)
+        if sem is None:
+            sem = self._semaphores[host] = asyncio.Semaphore(self._per_host)
+        async with sem:
+            return await self._inner.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+_client_defaults: dict[str, dict[str, Any]] = {}
+_clients: dict[str, httpx.AsyncClient] = {}
+_openai_client: Optional[AsyncOpenAI] = None
+
+
+def register(name: str, **defaults: Any) -> None:
+    """Declare a provider client and its defaults (headers, timeout, ...); created at startup."""
+    _client_defaults[name] = defaults
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """Return the process-wide client for a provider, creating it lazily if startup has not run."""
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        http2 = _http2_enabled()
+        transport = _HostLimitedTransport(
+            httpx.AsyncHTTPTransport(limits=_limits(), http2=http2, retries=0),
+            per_host=env_int("HTTP_PER_HOST_CONCURRENCY", 8),
+        )
+        defaults = dict(_client_defaults.get(name) or {})
+        defaults.setdefault("timeout", env_float("HTTP_TIMEOUT", 15.0))
+        client = httpx.AsyncClient(transport=transport, **defaults)
+        _clients[name] = client
+    return client
+
+
+async def start() -> None:
+    """Create every registered client up front; called on application startup."""
+    for name in list(_client_defaults):
+        get_client(name)
+
+
+def get_openai_client() -> AsyncOpenAI:
+    global _openai_client
+    if _openai_client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("OPENAI_API_KEY is not set")
+        _openai_client = AsyncOpenAI(
+            api_key=api_key,
+            http_client=httpx.AsyncClient(limits=_limits(), http2=_http2_enabled(), timeout=None),
+        )
+    return _openai_client
+
+
+async def aclose() -> None:
+    """Close every pooled client; called on application shutdown."""
+    global _openai_client
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        try:
+            await client.aclose()
+        except Exception:
+            pass
+    if _openai_client is not None:
+        try:
+            await _openai_client.close()
+        except Exception:
+            pass
+        _openai_client = None
@@ -0,0 +1,129 @@
+from __future__ import annotations as _annotations
+
+import asyncio
+import os
+import re
+import time
+from typing import Awaitable, Callable, Optional
+
+import metrics
+from settings import env_float
+from services.openai_web_search import openai_web_search_service
+from services.perplexity_web_search import perplexity_web_search_service
+from services.web_search import web_search_service
+from services.tool_results import report_failure, run_tracked
+
+
+PROVIDERS: dict[str, tuple[str, Callable[..., Awaitable[str]]]] = {
+    "duckduckgo": ("DuckDuckGo", web_search_service),
+    "perplexity": ("Perplexity", perplexity_web_search_service),
+    "openai": ("OpenAI Web Search", openai_web_search_service),
+}
+
+MODES = ("race", "merge")
+
+META_SEARCH_PROVIDERS = [
+    p.strip() for p in os.getenv("META_SEARCH_PROVIDERS", "duckduckgo,perplexity,openai").split(",") if p.strip()
+]
+META_SEARCH_MODE = os.getenv("META_SEARCH_MODE", "race")
+META_SEARCH_DEADLINE = env_float("META_SEARCH_DEADLINE", 12.0)
+
+_URL_RE = re.compile(r"https?://[^\s)\]>\"']+")
+# A numbered DuckDuckGo result line: "1. Title — https://..."
+_RESULT_LINE_RE = re.compile(r"^\d+\.\s")
+
+
+def _norm_url(url: str) -> str:
+    return url.rstrip(".,;/").lower().split("#", 1)[0]
+
+
+def _merge(outputs: list[tuple[str, str]], max_results: int) -> str:
+    """Combine provider outputs, dropping list results whose URL an earlier provider already cited."""
+    seen: set[str] = set()
+    sections: list[str] = []
+    for label, text in outputs:
+        kept: list[str] = []
+        skip_block = False
+        count = 0
+        for line in text.splitlines():
+            if _RESULT_LINE_RE.match(line):
+                urls = {_norm_url(u) for u in _URL_RE.findall(line)}
+                skip_block = bool(urls & seen) or count >= max_results
+                seen |= urls
+                if not skip_block:
+                    count += 1
+                    kept.append(f"{count}. {line.split('.', 1)[1].strip()}")
+                continue
+            if skip_block and line.startswith("   "):
+                continue
+            skip_block = False
+            seen |= {_norm_url(u) for u in _URL_RE.findall(line)}
+            kept.append(line)
+        body = "\n".join(kept).strip()
+        if body:
+            sections.append(f"[{label}]\n{body}")
+    return "\n\n".join(sections)
+
+
+async def meta_search_service(
+    query: str,
+    max_results: int = 5,
+    mode: Optional[str] = None,
+    providers: Optional[list[str]] = None,
+    deadline: Optional[float] = None,
+) -> str:
+    """Query several search providers concurrently.
+
+    race:  return the first usable answer and cancel the rest.
+    merge: wait until the deadline (or all finish) and return a deduplicated merge.
+    """
+    mode = (mode or META_SEARCH_MODE).lower()
+    if mode not in MODES:
+        raise ValueError(f"Unknown meta search mode {mode!r}; use one of {', '.join(MODES)}")
+    deadline = META_SEARCH_DEADLINE if deadline is None else deadline
+    names = [p for p in (providers or META_SEARCH_PROVIDERS) if p in PROVIDERS]
+    if not names:
+        return report_failure("No results found.")
+
+    started = time.perf_counter()
+    # Each provider runs tracked, so its own failure report does not fail the whole search
+    tasks: dict[asyncio.Task[tuple[str, bool]], str] = {
+        asyncio.ensure_future(run_tracked(lambda fn=PROVIDERS[name][1]: fn(query, max_results=max_results))): name
+        for name in names
+    }
+    results: dict[str, str] = {}
+    try:
+        pending = set(tasks)
+        loop = asyncio.get_running_loop()
+        end_at = loop.time() + deadline
+        while pending:
+            remaining = end_at - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = tasks[task]
+                if task.cancelled() or task.exception() is not None:
+                    continue
+                text, failed = task.result()
+                if failed:
+                    continue
+                results[name] = text
+                if mode == "race":
+                    metrics.inc("meta_search_winner_total", provider=name)
+                    metrics.observe("meta_search_seconds", time.perf_counter() - started, mode="race")
+                    return f"[{PROVIDERS[name][0]}] {text}"
+    finally:
+        # Losers (and stragglers past the deadline) are cancelled so they stop consuming quota,
+        # and awaited so their cancellation (and any error) is collected rather than left dangling
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    metrics.observe("meta_search_seconds", time.perf_counter() - started, mode=mode)
+    if not results:
+        metrics.inc("meta_search_empty_total", mode=mode)
+        return report_failure("No results found.")
+    ordered = [(PROVIDERS[name][0], results[name]) for name in names if name in results]
+    return _merge(ordered, max_results)
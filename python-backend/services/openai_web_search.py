@@ -1,50 +1,74 @@
 from __future__ import annotations as _annotations
 
+import asyncio
 import os
-from typing import Any, List, Dict
+import time
+from typing import Any, Optional
 
-from openai import OpenAI
+import openai
 
+import metrics
+from settings import env_float, env_int
+from services import http_pool
+from services.adaptive_limiter import limiter_for
+from services.circuit_breaker import CircuitOpenError, ProviderError, guarded_call, unavailable_message
+from services.tool_results import report_failure
 
-def _client() -> OpenAI:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY is not set")
-    return OpenAI(api_key=api_key)
 
+OPENAI_WEB_SEARCH_MODEL = os.getenv("OPENAI_WEB_SEARCH_MODEL", "gpt-5")
+OPENAI_WEB_SEARCH_MAX_RESULTS = env_int("OPENAI_WEB_SEARCH_MAX_RESULTS", 5)
+OPENAI_WEB_SEARCH_TIMEOUT = env_float("OPENAI_WEB_SEARCH_TIMEOUT", 25.0)
 
-async def openai_web_search_service(query: str, max_results: int = 5) -> str:
+
+async def openai_web_search_service(query: str, max_results: Optional[int] = None) -> str:
     """Use OpenAI's responses with web search to produce a synthesized answer with citations."""
-    client = _client()
-    # The Python SDK performs I/O; use run_in_thread to avoid blocking if needed by your runtime
-    from asyncio import get_running_loop
-    loop = get_running_loop()
-
-    def _call() -> str:
-        result = client.responses.create(
-            model="gpt-5",
-            input=(
-                f"Search the web and answer: {query}. "
-                f"Include sources (URLs) inline and limit to about {max_results}. "
-                "Return a concise, factual answer."
-            ),
-            tools=[{"type": "web_search"}],
-        )
-        # Prefer SDK convenience property if available
-        text = getattr(result, "output_text", None)
-        if isinstance(text, str) and text.strip():
-            return text.strip()
-        # Fallback: assemble from output items
-        out = []
-        for item in getattr(result, "output", []) or []:
-            try:
-                if getattr(item, "type", "") == "output_text" and getattr(item, "text", None):
-                    out.append(item.text)
-            except Exception:
-                continue
-        final = "\n".join(out).strip()
-        return final or "No results found."
+    client = http_pool.get_openai_client()
+    limit = max_results or OPENAI_WEB_SEARCH_MAX_RESULTS
 
-    return await loop.run_in_executor(None, _call)
+    async def _call() -> Any:
+        queued_at = time.perf_counter()
+        # Shares the adaptive pool of its model with agent calls to the same model
+        async with limiter_for(OPENAI_WEB_SEARCH_MODEL).slot():
+            started_at = time.perf_counter()
+            metrics.observe("web_search_queue_seconds", started_at - queued_at, provider="openai")
+            try:
+                return await client.responses.create(
+                    model=OPENAI_WEB_SEARCH_MODEL,
+                    input=(
+                        f"Search the web and answer: {query}. "
+                        f"Include sources (URLs) inline and limit to about {limit}. "
+                        "Return a concise, factual answer."
+                    ),
+                    tools=[{"type": "web_search"}],
+                )
+            except (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError) as e:
+                raise ProviderError(str(e)) from e
+            finally:
+                metrics.observe("web_search_call_seconds", time.perf_counter() - started_at, provider="openai")
 
+    try:
+        # No retries: a web-search response is slow and costly, the breaker is what protects the turn
+        # The deadline covers the wait for a limiter slot as well as the call
+        result = await guarded_call(
+            "openai", "responses", _call, retries=0, deadline=time.monotonic() + OPENAI_WEB_SEARCH_TIMEOUT,
+        )
+    except CircuitOpenError as e:
+        return unavailable_message("OpenAI web search", e.retry_after, "web_search or perplexity_web_search")
+    except asyncio.TimeoutError:
+        metrics.inc("web_search_timeouts_total", provider="openai")
+        return report_failure(f"OpenAI web search timed out after {OPENAI_WEB_SEARCH_TIMEOUT:g}s")
 
+    # Prefer SDK convenience property if available
+    text = getattr(result, "output_text", None)
+    if isinstance(text, str) and text.strip():
+        return text.strip()
+    # Fallback: assemble from output items
+    out = []
+    for item in getattr(result, "output", []) or []:
+        try:
+            if getattr(item, "type", "") == "output_text" and getattr(item, "text", None):
+                out.append(item.text)
+        except Exception:
+            continue
+    final = "\n".join(out).strip()
+    return final or report_failure("No results found.")
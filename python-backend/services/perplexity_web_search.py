@@ -5,9 +5,15 @@ from typing import Any
 
 import httpx
 
+from services import http_pool
+from services.circuit_breaker import CircuitOpenError, guarded_call, unavailable_message
+from services.tool_results import report_failure
+
 
 PPLX_API_URL = "https://api.perplexity.ai/chat/completions"
 
+http_pool.register("perplexity", timeout=30)
+
 
 async def perplexity_web_search_service(query: str, max_results: int = 5) -> str:
     """Use Perplexity's online models to search the web and synthesize an answer.
@@ -16,7 +22,7 @@ async def perplexity_web_search_service(query: str, max_results: int = 5) -> str
     """
     api_key = os.getenv("PPLX_API_KEY")
     if not api_key:
-        return "PPLX_API_KEY is not set"
+        return report_failure("PPLX_API_KEY is not set")
 
     # Instruct the model to include concise answer and sources
     system_prompt = (
@@ -42,11 +48,23 @@ async def perplexity_web_search_service(query: str, max_results: int = 5) -> str
         "max_tokens": 800,
     }
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        try:
-            resp = await client.post(PPLX_API_URL, headers=headers, json=payload)
-        except Exception as e:
-            return f"Perplexity request failed: {e}"
+    client = http_pool.get_client("perplexity")
+
+    async def _post() -> httpx.Response:
+        resp = await client.post(PPLX_API_URL, headers=headers, json=payload)
+        # Only provider-side statuses feed the breaker; request errors are reported below
+        if resp.status_code in (408, 429) or resp.status_code >= 500:
+            resp.raise_for_status()
+        return resp
+
+    try:
+        resp = await guarded_call("perplexity", "chat_completions", _post)
+    except CircuitOpenError as e:
+        return unavailable_message("Perplexity", e.retry_after, "web_search or modern_web_search")
+    except httpx.HTTPStatusError as e:
+        resp = e.response
+    except Exception as e:
+        return report_failure(f"Perplexity request failed: {e}")
 
     if resp.status_code != 200:
         try:
@@ -54,7 +72,7 @@ async def perplexity_web_search_service(query: str, max_results: int = 5) -> str
             message = data.get("error", {}).get("message") or data
         except Exception:
             message = resp.text
-        return f"Perplexity error ({resp.status_code}): {message}"
+        return report_failure(f"Perplexity error ({resp.status_code}): {message}")
 
     try:
         data = resp.json()
@@ -64,6 +82,6 @@ async def perplexity_web_search_service(query: str, max_results: int = 5) -> str
     except Exception:
         pass
 
-    return "No results found."
+    return report_failure("No results found.")
 
 
@@ -0,0 +1,42 @@
+from __future__ import annotations as _annotations
+
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+# Set by run_tracked for the duration of one tool call; report_failure flips it
+_failed: ContextVar[Optional[list[bool]]] = ContextVar("tool_call_failed", default=None)
+
+
+def report_failure(message: str) -> str:
+    """Mark the current tool call as failed and return `message` as its output.
+
+    Tools and services return their error text through this instead of raising, so
+    the result cache and meta search can tell a failure from an answer.
+    """
+    flag = _failed.get()
+    if flag is not None:
+        flag[0] = True
+    return message
+
+
+async def run_tracked(fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+    """Await fn() and return (value, failed).
+
+    A call failed if it went through report_failure or returned nothing usable.
+    Concurrent calls each get their own flag, so nested or parallel tools do not
+    mark one another.
+    """
+    flag = [False]
+    token = _failed.set(flag)
+    try:
+        value = await fn()
+    finally:
+        _failed.reset(token)
+    return value, flag[0] or _is_empty(value)
+
+
+def _is_empty(value: Any) -> bool:
+    return not isinstance(value, str) or not value.strip()
@@ -1,14 +1,33 @@
 from __future__ import annotations as _annotations
 
 import asyncio
-from typing import Any
+import html
+import re
+import time
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlsplit
 
 import httpx
 
+from services import http_pool
+from services.circuit_breaker import CALL_DEADLINE, CircuitOpenError, guarded_call, unavailable_message
+from services.tool_results import report_failure
+
 
 DUCKDUCKGO_API = "https://duckduckgo.com/"
 DUCKDUCKGO_HTML = "https://html.duckduckgo.com/"
 
+http_pool.register(
+    "duckduckgo",
+    headers={
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0 Safari/537.36",
+        "Accept-Language": "en-US,en;q=0.9",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Referer": DUCKDUCKGO_API,
+    },
+    timeout=15,
+)
+
 
 async def _ddg_token(session: httpx.AsyncClient, query: str) -> str:
     # DuckDuckGo requires a vqd token obtained from initial page load
@@ -28,75 +47,88 @@ async def _ddg_token(session: httpx.AsyncClient, query: str) -> str:
     return text[start:end]
 
 
+async def _ddg_json_results(session: httpx.AsyncClient, query: str, max_results: int) -> list[dict[str, Any]]:
+    # JSON i.js endpoint with a vqd token
+    vqd = await _ddg_token(session, query)
+    params = {
+        "q": query,
+        "l": "us-en",
+        "o": "json",
+        "kl": "us-en",
+        "dl": "us-en",
+        "bing_market": "en-US",
+        "p": "1",
+        "vqd": vqd,
+    }
+    resp = await session.get(DUCKDUCKGO_API + "i.js", params=params)
+    resp.raise_for_status()
+    results: list[dict[str, Any]] = []
+    data = resp.json()
+    for item in data.get("results", []):
+        title = item.get("title") or item.get("highlight") or ""
+        url = item.get("url") or item.get("image") or ""
+        snippet = item.get("source") or item.get("description") or ""
+        if title and url:
+            results.append({"title": title, "url": url, "snippet": snippet})
+        if len(results) >= max_results:
+            break
+    if not results:
+        for item in data.get("related", []):
+            title = item.get("text") or ""
+            url = item.get("first_url") or ""
+            snippet = item.get("topic") or ""
+            if title and url:
+                results.append({"title": title, "url": url, "snippet": snippet})
+            if len(results) >= max_results:
+                break
+    return results[:max_results]
+
+
 async def ddg_search(query: str, max_results: int = 5) -> list[dict[str, Any]]:
     """Perform a lightweight DuckDuckGo search and return top results.
 
-    Returns a list of {title, url, snippet}.
+    Returns a list of {title, url, snippet}. Each endpoint sits behind its own
+    circuit breaker; open endpoints are skipped without a network call, and if
+    every endpoint is open CircuitOpenError is raised straight away. The endpoints
+    are tried in turn under one CALL_DEADLINE, not one each.
     """
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0 Safari/537.36",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Referer": DUCKDUCKGO_API,
-    }
-    async with httpx.AsyncClient(headers=headers, timeout=15) as session:
+    session = http_pool.get_client("duckduckgo")
+    deadline = time.monotonic() + CALL_DEADLINE
+    endpoints = (
         # Prefer the lite HTML endpoint to avoid token/403 issues
-        html_results = await _ddg_html_results(session, query)
-        if html_results:
-            return html_results[:max_results]
-
-        # Try the JSON i.js endpoint with a vqd token as a secondary option
+        ("html", lambda: _ddg_html_results(session, query, max_results=max_results)),
+        ("ijs", lambda: _ddg_json_results(session, query, max_results)),
+        # Final fallback: Instant Answer API (related topics)
+        ("instant_answer", lambda: _ddg_instant_answer(session, query)),
+    )
+    open_circuits: list[CircuitOpenError] = []
+    for endpoint, call in endpoints:
+        if time.monotonic() >= deadline:
+            break
         try:
-            vqd = await _ddg_token(session, query)
-            params = {
-                "q": query,
-                "l": "us-en",
-                "o": "json",
-                "kl": "us-en",
-                "dl": "us-en",
-                "bing_market": "en-US",
-                "p": "1",
-                "vqd": vqd,
-            }
-            resp = await session.get(DUCKDUCKGO_API + "i.js", params=params)
-            results: list[dict[str, Any]] = []
-            if resp.status_code == 200:
-                data = resp.json()
-                for item in data.get("results", []):
-                    title = item.get("title") or item.get("highlight") or ""
-                    url = item.get("url") or item.get("image") or ""
-                    snippet = item.get("source") or item.get("description") or ""
-                    if title and url:
-                        results.append({"title": title, "url": url, "snippet": snippet})
-                    if len(results) >= max_results:
-                        break
-                if not results:
-                    for item in data.get("related", []):
-                        title = item.get("text") or ""
-                        url = item.get("first_url") or ""
-                        snippet = item.get("topic") or ""
-                        if title and url:
-                            results.append({"title": title, "url": url, "snippet": snippet})
-                        if len(results) >= max_results:
-                            break
-                if results:
-                    return results[:max_results]
+            results = await guarded_call("duckduckgo", endpoint, call, deadline=deadline)
+        except CircuitOpenError as e:
+            open_circuits.append(e)
+            continue
         except Exception:
-            pass
-
-        # Final fallback: Instant Answer API (related topics)
-        ia_results = await _ddg_instant_answer(session, query)
-        return ia_results[:max_results]
+            continue
+        if results:
+            return results[:max_results]
+    if len(open_circuits) == len(endpoints):
+        raise min(open_circuits, key=lambda e: e.retry_after)
+    return []
 
 
 async def web_search_service(query: str, max_results: int = 5) -> str:
     """High-level service that formats search results into a concise string."""
     try:
         results = await ddg_search(query, max_results=max_results)
+    except CircuitOpenError as e:
+        return unavailable_message("DuckDuckGo web search", e.retry_after, "modern_web_search or perplexity_web_search")
     except Exception:
-        return "No results found."
+        return report_failure("No results found.")
     if not results:
-        return "No results found."
+        return report_failure("No results found.")
     lines: list[str] = []
     for idx, r in enumerate(results, start=1):
         lines.append(f"{idx}. {r['title']} — {r['url']}")
@@ -105,23 +137,124 @@ async def web_search_service(query: str, max_results: int = 5) -> str:
     return "\n".join(lines)
 
 
-async def _ddg_html_results(session: httpx.AsyncClient, query: str) -> list[dict[str, Any]]:
-    # Parse the DuckDuckGo lite HTML page for web results
+def decode_ddg_url(href: str) -> str:
+    """Resolve DuckDuckGo's //duckduckgo.com/l/?uddg=<target> redirect links to the target URL."""
+    if href.startswith("//"):
+        href = "https:" + href
+    parsed = urlsplit(href)
+    if parsed.netloc.endswith("duckduckgo.com") and parsed.path.startswith("/l/"):
+        target = parse_qs(parsed.query).get("uddg")
+        if target and target[0]:
+            return target[0]
+    return href
+
+
+# A result is its title anchor, then a snippet element if one comes before the next result's anchor
+_DDG_ANCHOR_RE = re.compile(
+    r'<a[^>]*class="[^"]*\bresult__a\b[^"]*"[^>]*href="([^"]+)"[^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL,
+)
+_DDG_ANCHOR_START_RE = re.compile(r'<a[^>]*class="[^"]*\bresult__a\b', re.IGNORECASE)
+_DDG_SNIPPET_RE = re.compile(
+    r'<(a|div|td)[^>]*class="[^"]*\bresult__snippet\b[^"]*"[^>]*>(.*?)</\1>', re.IGNORECASE | re.DOTALL,
+)
+_DDG_SNIPPET_START_RE = re.compile(r'<(?:a|div|td)[^>]*class="[^"]*\bresult__snippet\b', re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_WS_RE = re.compile(r"\s+")
+
+
+def _html_text(fragment: str) -> str:
+    return _WS_RE.sub(" ", html.unescape(_TAG_RE.sub("", fragment))).strip()
+
+
+class DdgResultParser:
+    """Incremental parser for the DuckDuckGo HTML results page.
+
+    Feed it chunks as they arrive; `done` flips once `max_results` results
+    (title, decoded URL and snippet) have been collected so the caller can
+    stop reading the body.
+    """
+
+    def __init__(self, max_results: int) -> None:
+        self.max_results = max_results
+        self.results: list[dict[str, Any]] = []
+        self._buf = ""
+        # (href, title) of a parsed anchor still waiting for its snippet or the next anchor
+        self._pending: Optional[tuple[str, str]] = None
+
+    @property
+    def done(self) -> bool:
+        return len(self.results) >= self.max_results
+
+    def _add(self, href: str, title_html: str, snippet_html: str) -> None:
+        # Sponsored results link through /y.js; skip them
+        if self.done or "/y.js" in href:
+            return
+        title = _html_text(title_html)
+        if title and href:
+            self.results.append({
+                "title": title,
+                "url": decode_ddg_url(html.unescape(href)),
+                "snippet": _html_text(snippet_html),
+            })
+
+    def feed(self, chunk: str) -> None:
+        if self.done:
+            return
+        buf = self._buf + chunk
+        pos = 0
+        # Each pass either consumes text or stops; nothing before `pos` is scanned again
+        while not self.done:
+            if self._pending is None:
+                m = _DDG_ANCHOR_RE.search(buf, pos)
+                if m is None:
+                    break
+                self._pending = (m.group(1), m.group(2))
+                pos = m.end()
+                continue
+            nxt = _DDG_ANCHOR_START_RE.search(buf, pos)
+            end = nxt.start() if nxt is not None else len(buf)
+            snippet = _DDG_SNIPPET_RE.search(buf, pos, end)
+            if snippet is not None:
+                self._add(*self._pending, snippet.group(2))
+                pos = snippet.end()
+            elif nxt is not None:
+                self._add(*self._pending, "")
+                pos = nxt.start()
+            else:
+                break
+            self._pending = None
+        # Drop consumed text; keep from the element still being received, else a split tag
+        start = (_DDG_ANCHOR_START_RE if self._pending is None else _DDG_SNIPPET_START_RE).search(buf, pos)
+        if start is not None:
+            self._buf = buf[start.start():]
+        else:
+            cut = buf.rfind("<", pos)
+            self._buf = buf[cut:] if cut != -1 else ""
+
+    def close(self) -> None:
+        # Last result on the page has no snippet and no following anchor
+        if self._pending is None:
+            m = _DDG_ANCHOR_RE.search(self._buf)
+            if m is not None:
+                self._pending = (m.group(1), m.group(2))
+        if self._pending is not None:
+            self._add(*self._pending, "")
+        self._pending = None
+        self._buf = ""
+
+
+async def _ddg_html_results(session: httpx.AsyncClient, query: str, max_results: int = 5) -> list[dict[str, Any]]:
+    # Stream the DuckDuckGo HTML page and stop reading once enough results are parsed
     url = DUCKDUCKGO_HTML + "html/"
-    resp = await session.get(url, params={"q": query, "kl": "us-en"})
-    resp.raise_for_status()
-    text = resp.text
-    # Very lightweight parsing: anchors with result__a class
-    results: list[dict[str, Any]] = []
-    import re
-    for m in re.finditer(r'<a[^>]*class="[^\"]*result__a[^\"]*"[^>]*href="([^"]+)"[^>]*>(.*?)</a>', text, re.IGNORECASE | re.DOTALL):
-        href = m.group(1)
-        title_raw = m.group(2)
-        # Remove HTML tags from title
-        title = re.sub(r"<[^>]+>", "", title_raw).strip()
-        if href and title:
-            results.append({"title": title, "url": href, "snippet": ""})
-    return results
+    parser = DdgResultParser(max_results)
+    async with session.stream("GET", url, params={"q": query, "kl": "us-en"}) as resp:
+        resp.raise_for_status()
+        async for chunk in resp.aiter_text():
+            parser.feed(chunk)
+            if parser.done:
+                break
+    parser.close()
+    return parser.results
 
 
 async def _ddg_instant_answer(session: httpx.AsyncClient, query: str) -> list[dict[str, Any]]:
@@ -133,8 +266,7 @@ async def _ddg_instant_answer(session: httpx.AsyncClient, query: str) -> list[di
         "skip_disambig": 1,
         "no_redirect": 1,
     })
-    if resp.status_code != 200:
-        return []
+    resp.raise_for_status()
     data = resp.json()
     results: list[dict[str, Any]] = []
     if data.get("AbstractURL"):
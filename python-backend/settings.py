@@ -0,0 +1,21 @@
+from __future__ import annotations as _annotations
+
+import os
+
+
+# Numeric env settings are read at import time; a malformed value falls back to the
+# default instead of crashing the app on startup
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
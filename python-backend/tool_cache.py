@@ -0,0 +1,185 @@
+from __future__ import annotations as _annotations
+
+import asyncio
+import dataclasses
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from agents import RunContextWrapper, default_tool_error_function
+
+from services.tool_results import report_failure, run_tracked
+
+
+logger = logging.getLogger(__name__)
+
+# Bound on remembered per-call statuses that were never collected by the API layer
+_MAX_CALL_STATUSES = 1024
+
+
+@dataclass(frozen=True)
+class ToolCachePolicy:
+    ttl_seconds: float
+    max_entries: int = 256
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+
+def canonical_args(raw: Any) -> str:
+    """Stable cache key fragment for tool arguments regardless of key order or whitespace."""
+    value = raw
+    if isinstance(raw, str):
+        try:
+            value = json.loads(raw) if raw.strip() else {}
+        except Exception:
+            return raw
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class ToolResultCache:
+    """Per-tool TTL/LRU cache with singleflight coalescing of identical in-flight calls."""
+
+    def __init__(self) -> None:
+        self._policies: dict[str, ToolCachePolicy] = {}
+        self._entries: dict[str, OrderedDict[str, tuple[float, Any]]] = {}
+        self._inflight: dict[tuple[str, str], asyncio.Task[Any]] = {}
+        # In-flight call -> callers still awaiting it
+        self._waiters: dict[asyncio.Task[Any], int] = {}
+        self._call_status: OrderedDict[str, str] = OrderedDict()
+
+    def configure(self, code_name: str, policy: ToolCachePolicy) -> None:
+        self._policies[code_name] = policy
+        entries = self._entries.setdefault(code_name, OrderedDict())
+        while len(entries) > max(policy.max_entries, 0):
+            entries.popitem(last=False)
+
+    def clear(self, code_name: Optional[str] = None) -> None:
+        if code_name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(code_name, None)
+
+    def _lookup(self, code_name: str, key: str) -> tuple[bool, Any]:
+        entries = self._entries.get(code_name)
+        if not entries:
+            return False, None
+        hit = entries.get(key)
+        if hit is None:
+            return False, None
+        expires_at, value = hit
+        if expires_at <= time.monotonic():
+            del entries[key]
+            return False, None
+        entries.move_to_end(key)
+        return True, value
+
+    def _store(self, code_name: str, key: str, value: Any) -> None:
+        policy = self._policies.get(code_name)
+        if policy is None or not policy.enabled:
+            return
+        entries = self._entries.setdefault(code_name, OrderedDict())
+        entries[key] = (time.monotonic() + policy.ttl_seconds, value)
+        entries.move_to_end(key)
+        while len(entries) > policy.max_entries:
+            entries.popitem(last=False)
+
+    async def get_or_run(self, code_name: str, args: Any, run: Callable[[], Awaitable[Any]]) -> tuple[Any, str]:
+        """Return (value, status) where status is one of "hit", "coalesced" or "miss"."""
+        key = canonical_args(args)
+        found, value = self._lookup(code_name, key)
+        if found:
+            return value, "hit"
+
+        flight_key = (code_name, key)
+        task = self._inflight.get(flight_key)
+        if task is not None:
+            return await self._join(task), "coalesced"
+
+        # Run the shared call in its own task so one caller's cancellation does not fail the others
+        task = asyncio.ensure_future(run_tracked(run))
+        self._inflight[flight_key] = task
+
+        def _done(t: asyncio.Task[tuple[Any, bool]], _k: str = key) -> None:
+            self._inflight.pop(flight_key, None)
+            if t.cancelled() or t.exception() is not None:
+                return
+            value, failed = t.result()
+            # Failures the tool reported are passed on to every waiter but never cached
+            if not failed:
+                self._store(code_name, _k, value)
+
+        task.add_done_callback(_done)
+        return await self._join(task), "miss"
+
+    async def _join(self, task: asyncio.Task[tuple[Any, bool]]) -> Any:
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            value, _ = await asyncio.shield(task)
+            return value
+        finally:
+            left = self._waiters.pop(task) - 1
+            if left:
+                self._waiters[task] = left
+            elif not task.done():
+                # Every caller was cancelled (e.g. the client went away): stop paying for the call
+                task.cancel()
+
+    def record_call_status(self, call_id: Optional[str], status: str) -> None:
+        if not call_id:
+            return
+        self._call_status[call_id] = status
+        while len(self._call_status) > _MAX_CALL_STATUSES:
+            self._call_status.popitem(last=False)
+
+    def pop_call_status(self, call_id: Optional[str]) -> Optional[str]:
+        if not call_id:
+            return None
+        return self._call_status.pop(call_id, None)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            name: {
+                "ttl_seconds": policy.ttl_seconds,
+                "max_entries": policy.max_entries,
+                "size": len(self._entries.get(name) or ()),
+            }
+            for name, policy in self._policies.items()
+        }
+
+
+tool_cache = ToolResultCache()
+
+
+def tool_error(ctx: RunContextWrapper[Any], error: Exception) -> str:
+    """failure_error_function for cacheable tools: the SDK's default message, reported as a failure."""
+    return report_failure(default_tool_error_function(ctx, error))
+
+
+def wrap_tool(tool: Any, code_name: str, policy: ToolCachePolicy, uses_context: bool = False) -> Any:
+    """Return a copy of a FunctionTool whose invocations go through the shared result cache.
+
+    Tools that read or change the run context (uses_context) are never cached: the
+    key does not cover the context, and a coalesced call would run once, with the
+    first caller's conversation.
+    """
+    if uses_context and policy.enabled:
+        logger.warning("Tool %s uses the conversation context; ignoring its cache policy", code_name)
+        policy = ToolCachePolicy(ttl_seconds=0, max_entries=0)
+    tool_cache.configure(code_name, policy)
+    if not policy.enabled:
+        return tool
+    original = getattr(tool, "on_invoke_tool", None)
+    if original is None or not dataclasses.is_dataclass(tool):
+        return tool
+
+    async def _on_invoke_tool(ctx: Any, input: str) -> Any:
+        value, status = await tool_cache.get_or_run(code_name, input, lambda: original(ctx, input))
+        tool_cache.record_call_status(getattr(ctx, "tool_call_id", None), status)
+        return value
+
+    return dataclasses.replace(tool, on_invoke_tool=_on_invoke_tool)
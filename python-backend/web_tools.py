@@ -0,0 +1,77 @@
+from __future__ import annotations as _annotations
+
+from typing import Optional
+
+from agents import function_tool
+
+from services.web_search import web_search_service
+from services.openai_web_search import openai_web_search_service
+from services.perplexity_web_search import perplexity_web_search_service
+from services.meta_search import meta_search_service
+from tool_cache import tool_error
+
+
+# =========================
+# WEB SEARCH TOOLS (imported lazily through domain.TOOL_REGISTRY)
+# =========================
+
+
+# Generic Web Search tool
+@function_tool(
+    name_override="web_search",
+    description_override="Search the internet and return top results.",
+    failure_error_function=tool_error,
+)
+async def web_search(query: str, max_results: int = 5) -> str:
+    return await web_search_service(query, max_results=max_results)
+
+# OpenAI modern Web Search tool
+@function_tool(
+    name_override="modern_web_search",
+    description_override="Use OpenAI web search to synthesize an answer with citations.",
+    failure_error_function=tool_error,
+)
+async def modern_web_search(query: str, max_results: Optional[int] = None) -> str:
+    return await openai_web_search_service(query, max_results=max_results)
+
+# Perplexity Web Search tool
+@function_tool(
+    name_override="perplexity_web_search",
+    description_override="Search the web with Perplexity.AI and return a concise answer with sources.",
+    failure_error_function=tool_error,
+)
+async def perplexity_web_search(input: str, max_results: int = 5) -> str:
+    return await perplexity_web_search_service(input, max_results=max_results)
+
+# Cross-provider meta search tool
+@function_tool(
+    name_override="meta_web_search",
+    description_override=(
+        "Search the web with several providers at once. mode='race' returns the fastest good answer; "
+        "mode='merge' combines deduplicated results from all providers that answer in time."
+    ),
+    failure_error_function=tool_error,
+)
+async def meta_web_search(query: str, max_results: int = 5, mode: Optional[str] = None) -> str:
+    return await meta_search_service(query, max_results=max_results, mode=mode)
+
+
+# =========================
+# TEST INVOKERS (for admin tool testing)
+# =========================
+
+
+async def _test_web_search(query: str, max_results: int = 5) -> str:
+    return await web_search_service(query, max_results=max_results)
+
+
+async def _test_modern_web_search(query: str, max_results: Optional[int] = None) -> str:
+    return await openai_web_search_service(query, max_results=max_results)
+
+
+async def _test_perplexity_web_search(query: str, max_results: int = 5) -> str:
+    return await perplexity_web_search_service(query, max_results=max_results)
+
+
+async def _test_meta_web_search(query: str, max_results: int = 5, mode: Optional[str] = None) -> str:
+    return await meta_search_service(query, max_results=max_results, mode=mode)
@@ -1,11 +1,28 @@
 "use client";
 
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useMemo, useRef, useState } from "react";
 import { getAdminState } from "@/lib/adminApi";
 import { AgentPanel } from "@/components/agent-panel";
 import { Chat } from "@/components/chat";
-import type { Agent, AgentEvent, GuardrailCheck, Message } from "@/lib/types";
-import { callChatAPI } from "@/lib/api";
+import type { Agent, AgentEvent, GuardrailCheck, Message, SeatMapSnapshot } from "@/lib/types";
+import { callChatAPI, ChatSocket, fetchSeatMap, holdSeat } from "@/lib/api";
+
+const toAssistantMessage = (m: any): Message => ({
+  id: Date.now().toString() + Math.random().toString(),
+  content: m.content,
+  role: "assistant",
+  agent: m.agent,
+  timestamp: new Date(),
+});
+
+const stampEvent = (e: any): AgentEvent => ({ ...e, timestamp: e.timestamp ?? Date.now() });
+
+// Pushed seat_map frames carry no layout and may arrive out of order; keep the newest version
+const mergeSeatMap = (prev: SeatMapSnapshot | null, next: any): SeatMapSnapshot | null => {
+  if (!next || typeof next !== "object" || typeof next.occupied !== "string") return prev;
+  if (prev && (prev.flight_number !== next.flight_number || next.version < prev.version)) return prev;
+  return { ...prev, ...next };
+};
 
 export default function Home() {
   const [messages, setMessages] = useState<Message[]>([]);
@@ -19,6 +36,26 @@ export default function Home() {
   const [triageOptions, setTriageOptions] = useState<string[]>([]);
   // Loading state while awaiting assistant response
   const [isLoading, setIsLoading] = useState(false);
+  // Live /ws/chat session; messages fall back to HTTP while it is not open
+  const socketRef = useRef<ChatSocket | null>(null);
+  // Occupancy of the conversation's flight, loaded when the agent shows the seat map
+  const [seatMap, setSeatMap] = useState<SeatMapSnapshot | null>(null);
+  const flightNumber: string | undefined = context?.flight_number || undefined;
+  const seatMapRequested = useMemo(
+    () => messages.some((m) => m.role === "assistant" && m.content === "DISPLAY_SEAT_MAP"),
+    [messages]
+  );
+
+  useEffect(() => {
+    if (!seatMapRequested || !flightNumber) return;
+    let cancelled = false;
+    fetchSeatMap(flightNumber).then((snapshot) => {
+      if (!cancelled && snapshot) setSeatMap(snapshot);
+    });
+    return () => {
+      cancelled = true;
+    };
+  }, [seatMapRequested, flightNumber]);
 
   // Boot the conversation
   useEffect(() => {
@@ -41,31 +78,62 @@ export default function Home() {
       try { window.localStorage.setItem("triageName", triageName); } catch {}
     }
     if (!triageName) return; // wait until triage is known
-    (async () => {
+    const loadOverHttp = async () => {
       const data = await callChatAPI("", conversationId ?? "", triageName);
       if (!data) return;
       setConversationId(data.conversation_id);
       setCurrentAgent(data.current_agent);
       setContext(data.context);
-      const initialEvents = (data.events || []).map((e: any) => ({
-        ...e,
-        timestamp: e.timestamp ?? Date.now(),
-      }));
-      setEvents(initialEvents);
+      setEvents((data.events || []).map(stampEvent));
       setAgents(data.agents || []);
       setGuardrails(data.guardrails || []);
       if (Array.isArray(data.messages)) {
-        setMessages(
-          data.messages.map((m: any) => ({
-            id: Date.now().toString() + Math.random().toString(),
-            content: m.content,
-            role: "assistant",
-            agent: m.agent,
-            timestamp: new Date(),
-          }))
-        );
+        setMessages(data.messages.map(toAssistantMessage));
       }
-    })();
+    };
+    let hadSession = false;
+    let fellBack = false;
+    const socket = new ChatSocket(triageName, conversationId, {
+      onSession: (frame) => {
+        hadSession = true;
+        setConversationId(frame.conversation_id);
+        setCurrentAgent(frame.current_agent);
+        setContext(frame.context);
+        setAgents(frame.agents || []);
+      },
+      onEvent: (e) => setEvents((prev) => [...prev, stampEvent(e)]),
+      onMessage: (m) => setMessages((prev) => [...prev, toAssistantMessage(m)]),
+      onTurnComplete: (frame) => {
+        setCurrentAgent(frame.current_agent);
+        setContext(frame.context);
+        setGuardrails(frame.guardrails || []);
+        if (frame.events?.length) setEvents((prev) => [...prev, ...frame.events.map(stampEvent)]);
+        if (frame.messages?.length) setMessages((prev) => [...prev, ...frame.messages.map(toAssistantMessage)]);
+        if (frame.agents) setAgents(frame.agents);
+        setIsLoading(false);
+      },
+      onPush: (frame) => {
+        if (frame.type === "seat_map") setSeatMap((prev) => mergeSeatMap(prev, frame));
+      },
+      onError: (frame) => {
+        console.error("Chat socket error:", frame.reason);
+        setIsLoading(false);
+      },
+      onClose: () => {
+        setIsLoading(false);
+        // Backend unreachable over WebSocket: boot the conversation over HTTP instead
+        if (!hadSession && !fellBack) {
+          fellBack = true;
+          loadOverHttp();
+        }
+      },
+    });
+    socketRef.current = socket;
+    socket.connect();
+    return () => {
+      socket.close();
+      if (socketRef.current === socket) socketRef.current = null;
+    };
   }, [triageName]);
 
   // Send a user message
@@ -80,6 +148,9 @@ export default function Home() {
     setMessages((prev) => [...prev, userMsg]);
     setIsLoading(true);
 
+    // Over the socket, replies arrive as pushed frames and turn_complete clears loading
+    if (socketRef.current?.send(content)) return;
+
     const data = await callChatAPI(content, conversationId ?? "", triageName ?? undefined);
     if (!data) {
       setIsLoading(false);
@@ -114,6 +185,16 @@ export default function Home() {
     setIsLoading(false);
   };
 
+  // Hold the clicked seat under the booking's confirmation number before asking the agent for it
+  const handleHoldSeat = async (seat: string) => {
+    const holder = context?.confirmation_number;
+    // Nothing to hold under yet; the agent's assignment is still checked server-side
+    if (!flightNumber || !holder) return true;
+    const { ok, snapshot } = await holdSeat(flightNumber, seat, holder);
+    setSeatMap((prev) => mergeSeatMap(prev, snapshot));
+    return ok;
+  };
+
   const filteredAgents = useMemo(() => {
     if (!agents || agents.length === 0) return agents;
     const start = triageName || "Triage Agent";
@@ -160,6 +241,7 @@ export default function Home() {
           setConversationId(null);
           setMessages([]);
           setEvents([]);
+          setSeatMap(null);
           setTriageName(name || null);
         }}
       />
@@ -167,6 +249,8 @@ export default function Home() {
         messages={messages}
         onSendMessage={handleSendMessage}
         isLoading={isLoading}
+        seatMap={seatMap}
+        onHoldSeat={handleHoldSeat}
       />
     </main>
   );
@@ -1,7 +1,7 @@
 "use client";
 
 import React, { useState, useRef, useEffect, useCallback } from "react";
-import type { Message } from "@/lib/types";
+import type { Message, SeatMapSnapshot } from "@/lib/types";
 import ReactMarkdown from "react-markdown";
 import { SeatMap } from "./seat-map";
 
@@ -10,9 +10,13 @@ interface ChatProps {
   onSendMessage: (message: string) => void;
   /** Whether waiting for assistant response */
   isLoading?: boolean;
+  /** Live occupancy of the conversation's flight for the seat map */
+  seatMap?: SeatMapSnapshot | null;
+  /** Reserve a clicked seat; false keeps the map open (someone else has it) */
+  onHoldSeat?: (seat: string) => Promise<boolean>;
 }
 
-export function Chat({ messages, onSendMessage, isLoading }: ChatProps) {
+export function Chat({ messages, onSendMessage, isLoading, seatMap, onHoldSeat }: ChatProps) {
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const [inputText, setInputText] = useState("");
   const [isComposing, setIsComposing] = useState(false);
@@ -42,12 +46,13 @@ export function Chat({ messages, onSendMessage, isLoading }: ChatProps) {
   }, [inputText, onSendMessage]);
 
   const handleSeatSelect = useCallback(
-    (seat: string) => {
+    async (seat: string) => {
+      if (onHoldSeat && !(await onHoldSeat(seat))) return;
       setSelectedSeat(seat);
       setShowSeatMap(false);
       onSendMessage(`I would like seat ${seat}`);
     },
-    [onSendMessage]
+    [onSendMessage, onHoldSeat]
   );
 
   const handleKeyDown = useCallback(
@@ -95,6 +100,7 @@ export function Chat({ messages, onSendMessage, isLoading }: ChatProps) {
               <SeatMap
                 onSeatSelect={handleSeatSelect}
                 selectedSeat={selectedSeat}
+                occupancy={seatMap}
               />
             </div>
           </div>
@@ -1,11 +1,14 @@
 "use client";
 
-import React from "react";
+import React, { useMemo } from "react";
 import { Card, CardContent } from "@/components/ui/card";
+import type { SeatMapSnapshot } from "@/lib/types";
 
 interface SeatMapProps {
     onSeatSelect: (seatNumber: string) => void;
     selectedSeat?: string;
+    /** Server occupancy; without it every seat shows as available */
+    occupancy?: SeatMapSnapshot | null;
 }
 
 // Define seat layout for a typical narrow-body aircraft
@@ -18,18 +21,39 @@ const SEAT_LAYOUT = {
     }
 };
 
-const OCCUPIED_SEATS = new Set([
-    '1A', '2B', '3C', '5A', '5F', '7B', '7E', '9A', '9F', '10C', '10D',
-    '12A', '12F', '14B', '14E', '16A', '16F', '18C', '18D', '20A', '20F',
-    '22B', '22E', '24A', '24F'
-]);
-
 const EXIT_ROWS = new Set([4, 16]);
 
-export function SeatMap({ onSeatSelect, selectedSeat }: SeatMapProps) {
+// Seat labels in bit order: cabin by cabin, row by row, left to right (same as the server layout)
+function seatLabels(occupancy?: SeatMapSnapshot | null): string[] {
+    const cabins = occupancy?.seat_layout?.cabins ?? [
+        SEAT_LAYOUT.business, SEAT_LAYOUT.economyPlus, SEAT_LAYOUT.economy,
+    ].map((c) => ({ first_row: c.rows[0], last_row: c.rows[c.rows.length - 1], letters: c.seatsPerRow.join("") }));
+    const labels: string[] = [];
+    for (const c of cabins) {
+        for (let row = c.first_row; row <= c.last_row; row++) {
+            for (const letter of c.letters) labels.push(`${row}${letter}`);
+        }
+    }
+    return labels;
+}
+
+function occupiedSeats(occupancy?: SeatMapSnapshot | null): Set<string> {
+    const occupied = new Set<string>();
+    if (!occupancy?.occupied) return occupied;
+    const bits = Uint8Array.from(atob(occupancy.occupied), (ch) => ch.charCodeAt(0));
+    seatLabels(occupancy).forEach((label, i) => {
+        if ((bits[i >> 3] >> (i & 7)) & 1) occupied.add(label);
+    });
+    return occupied;
+}
+
+export function SeatMap({ onSeatSelect, selectedSeat, occupancy }: SeatMapProps) {
+    const occupied = useMemo(() => occupiedSeats(occupancy), [occupancy]);
+
     const getSeatStatus = (seatNumber: string) => {
-        if (OCCUPIED_SEATS.has(seatNumber)) return 'occupied';
+        // The customer's own hold is part of the occupancy bitmap too
         if (selectedSeat === seatNumber) return 'selected';
+        if (occupied.has(seatNumber)) return 'occupied';
         return 'available';
     };
 
@@ -105,6 +129,11 @@ export function SeatMap({ onSeatSelect, selectedSeat }: SeatMapProps) {
             <CardContent className="p-4">
                 <div className="text-center mb-4">
                     <h3 className="font-semibold text-lg mb-2">Select Your Seat</h3>
+                    {occupancy && (
+                        <p className="text-xs text-gray-600 mb-2">
+                            Flight {occupancy.flight_number}: {occupancy.available} of {occupancy.seats} seats available
+                        </p>
+                    )}
                     <div className="flex justify-center gap-4 text-xs">
                         <div className="flex items-center gap-1">
                             <div className="w-3 h-3 bg-emerald-100 border border-emerald-300 rounded"></div>
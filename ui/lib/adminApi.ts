@@ -1,5 +1,6 @@
 export async function getAdminState() {
-  const res = await fetch("/admin/state", { cache: "no-store" });
+  // Revalidate with If-None-Match; an unchanged config comes back as a cheap 304
+  const res = await fetch("/admin/state", { cache: "no-cache" });
   if (!res.ok) throw new Error(`Failed to fetch admin state: ${res.status}`);
   return res.json();
 }
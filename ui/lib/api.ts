@@ -22,3 +22,137 @@ export async function callChatAPI(message: string, conversationId: string, triag
     clearTimeout(timeout);
   }
 }
+
+export async function fetchSeatMap(flightNumber: string) {
+  try {
+    const res = await fetch(`/seats/${encodeURIComponent(flightNumber)}`, { cache: "no-store" });
+    if (!res.ok) return null;
+    return res.json();
+  } catch (err) {
+    console.error("Error loading seat map:", err);
+    return null;
+  }
+}
+
+// Reserve a seat until the agent assigns it; resolves to the fresh snapshot and whether the hold succeeded
+export async function holdSeat(flightNumber: string, seat: string, holder: string) {
+  try {
+    const res = await fetch(`/seats/${encodeURIComponent(flightNumber)}/hold`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ seat, holder }),
+    });
+    const data = await res.json();
+    return { ok: res.ok, snapshot: res.ok ? data : data?.detail };
+  } catch (err) {
+    console.error("Error holding seat:", err);
+    return { ok: false, snapshot: null };
+  }
+}
+
+// Frames exchanged with /ws/chat; every frame is a JSON object with a "type"
+export type ChatSocketFrame = { type: string; [key: string]: any };
+
+export interface ChatSocketHandlers {
+  onSession?: (frame: ChatSocketFrame) => void;
+  onEvent?: (event: any) => void;
+  onMessage?: (message: { content: string; agent: string }) => void;
+  onTurnComplete?: (frame: ChatSocketFrame) => void;
+  onError?: (frame: ChatSocketFrame) => void;
+  // Server-initiated frames of any other type (e.g. seat map updates)
+  onPush?: (frame: ChatSocketFrame) => void;
+  onClose?: () => void;
+}
+
+function chatSocketUrl(): string {
+  // Next rewrites do not proxy WebSockets, so connect to the backend directly
+  const configured = process.env.NEXT_PUBLIC_CHAT_WS_URL;
+  if (configured) return configured;
+  const { protocol, hostname } = window.location;
+  return `${protocol === "https:" ? "wss" : "ws"}://${hostname}:8000/ws/chat`;
+}
+
+// Persistent chat session over /ws/chat; reconnects to the same conversation with backoff
+export class ChatSocket {
+  conversationId: string | null;
+  private ws: WebSocket | null = null;
+  private retries = 0;
+  private stopped = false;
+
+  constructor(
+    private triageName: string | undefined,
+    conversationId: string | null,
+    private handlers: ChatSocketHandlers,
+  ) {
+    this.conversationId = conversationId;
+  }
+
+  get isOpen(): boolean {
+    return this.ws?.readyState === WebSocket.OPEN;
+  }
+
+  connect() {
+    const params = new URLSearchParams();
+    if (this.conversationId) params.set("conversation_id", this.conversationId);
+    if (this.triageName) params.set("triage_name", this.triageName);
+    const ws = new WebSocket(`${chatSocketUrl()}?${params.toString()}`);
+    this.ws = ws;
+    ws.onmessage = (ev) => {
+      let frame: ChatSocketFrame;
+      try {
+        frame = JSON.parse(ev.data);
+      } catch {
+        return;
+      }
+      switch (frame.type) {
+        case "ping":
+          ws.send(JSON.stringify({ type: "pong" }));
+          break;
+        case "pong":
+          break;
+        case "session":
+          this.retries = 0;
+          this.conversationId = frame.conversation_id;
+          this.handlers.onSession?.(frame);
+          break;
+        case "event":
+          this.handlers.onEvent?.(frame.event);
+          break;
+        case "message":
+          this.handlers.onMessage?.(frame.message);
+          break;
+        case "turn_complete":
+          this.handlers.onTurnComplete?.(frame);
+          break;
+        case "error":
+          this.handlers.onError?.(frame);
+          break;
+        default:
+          this.handlers.onPush?.(frame);
+      }
+    };
+    ws.onclose = () => {
+      if (this.ws !== ws) return;
+      this.ws = null;
+      this.handlers.onClose?.();
+      if (this.stopped) return;
+      const delay = Math.min(1000 * 2 ** this.retries, 30000);
+      this.retries += 1;
+      setTimeout(() => {
+        if (!this.stopped) this.connect();
+      }, delay);
+    };
+  }
+
+  send(message: string): boolean {
+    if (!this.ws || !this.isOpen) return false;
+    this.ws.send(JSON.stringify({ type: "message", message }));
+    return true;
+  }
+
+  close() {
+    this.stopped = true;
+    this.ws?.close();
+    this.ws = null;
+  }
+}
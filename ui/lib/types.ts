@@ -46,3 +46,18 @@ export interface GuardrailCheck {
   timestamp: Date
 }
 
+
+/** Server occupancy for one flight; bit i of `occupied` (base64, little-endian) is the i-th seat of the layout */
+export interface SeatMapSnapshot {
+  flight_number: string
+  layout: string
+  version: number
+  seats: number
+  available: number
+  occupied: string
+  seat_layout?: {
+    name: string
+    cabins: Array<{ name: string, first_row: number, last_row: number, letters: string }>
+    exit_rows: number[]
+  }
+}
@@ -8,6 +8,10 @@ const nextConfig = {
         source: "/chat",
         destination: "http://127.0.0.1:8000/chat",
       },
+      {
+        source: "/seats/:path*",
+        destination: "http://127.0.0.1:8000/seats/:path*",
+      },
       {
         source: "/admin/:path*",
         destination: "http://127.0.0.1:8000/admin/:path*",